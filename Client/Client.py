@@ -1,25 +1,312 @@
+import argparse
+import json
+import queue
 import socket
 import os
-import sys
+import ssl
+import stat
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from planner import PlanError, load_plan
 
 """A simple client that communicates with a server using HTTP-like GET and POST requests."""
 
+VALIDATORS_FILE = ".validators.json"  # ETag/Last-Modified of previously downloaded files
+RECV_BUFFER_SIZE = 1024 * 1024  # recv_into size while streaming response bodies
+UPLOAD_CHUNK_SIZE = 256 * 1024  # File bytes sent per chunk in chunked uploads
+SEGMENT_MIN_SIZE = 4 * 1024 * 1024  # Smallest byte range given its own connection in segmented downloads
+SEGMENT_STATE_INTERVAL = 1.0  # Seconds between saves of a segmented download's progress
+SEGMENT_RETRIES = 3  # Reconnections per byte range before a segmented download gives up
+# Failures of a connection itself, worth a retry on a new one; other OSErrors are local file errors
+CONNECTION_ERRORS = (ConnectionError, socket.timeout, ssl.SSLEOFError, ssl.SSLZeroReturnError)
+
+
+def parse_response_head(response):
+    """
+    Parses the status line and headers at the start of a response.
+
+    Args:
+        response (bytes): The response as received.
+
+    Returns:
+        tuple: (status code, headers dict with lower-cased names, offset of the body).
+    """
+    headers_end = response.find(b"\r\n\r\n")
+    if headers_end == -1:
+        headers_end = len(response)
+    lines = response[:headers_end].decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split(" ")[1])
+    except (IndexError, ValueError):
+        status = 0
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, headers_end + 4
+
+
+class ConnectionPool:
+    """A bounded set of reusable keep-alive connections to one server."""
+
+    def __init__(self, ip, port, size, connect=None):
+        """
+        Attributes:
+            address (tuple): The server's (IP, port).
+            size (int): Maximum number of connections open to the server at once.
+            connect (callable): Opens a connection to an address; defaults to
+                socket.create_connection.
+        """
+        self.address = (ip, port)
+        self.size = size
+        self.connect = connect or socket.create_connection
+        self.idle = queue.LifoQueue()  # Most recently used first, least likely to have timed out
+        self.slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        """Returns an idle connection, or opens a new one if none is idle."""
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self.connect(self.address)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, sock, reusable=True):
+        """Returns a connection to the pool, closing it if it can't be reused."""
+        if reusable:
+            self.idle.put(sock)
+        else:
+            sock.close()
+        self.slots.release()
+
+    def close(self):
+        """Closes every idle connection."""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ResponseReader:
+    """
+    Reads Content-Length or chunked framed responses from one connection in order.
+
+    Bytes received past the end of one response are kept for the next, which is
+    what makes reading pipelined responses possible. Bodies are streamed with
+    recv_into into one reusable buffer, so memory use does not depend on their size.
+    """
+
+    def __init__(self, sock):
+        """
+        Attributes:
+            sock (socket): The connection responses are read from.
+            buffer (bytearray): Bytes received but not yet consumed.
+            head (str): Status line and headers of the last response read.
+        """
+        self.sock = sock
+        self.buffer = bytearray()
+        self.head = ""
+        self.chunk = None  # Allocated on the first body too large for the buffer
+
+    def _fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Server closed the connection")
+        self.buffer += chunk
+
+    def _read_line(self):
+        """Consumes and returns one CRLF-terminated line from the connection, without the CRLF."""
+        while True:
+            end = self.buffer.find(b"\r\n")
+            if end != -1:
+                break
+            if len(self.buffer) > 65536:
+                raise ValueError("Chunk size line too long")
+            self._fill()
+        line = bytes(self.buffer[:end])
+        del self.buffer[:end + 2]
+        return line
+
+    def read_head(self):
+        """
+        Reads the next response's status line and headers.
+
+        Returns:
+            tuple: (status code, headers dict with lower-cased names).
+        """
+        while True:
+            headers_end = self.buffer.find(b"\r\n\r\n")
+            if headers_end != -1:
+                break
+            self._fill()
+        head = bytes(self.buffer[:headers_end + 4])
+        del self.buffer[:headers_end + 4]
+        self.head = head[:headers_end].decode("latin-1")
+        status, headers, _ = parse_response_head(head)
+        return status, headers
+
+    def read_body_into(self, file, status, headers):
+        """
+        Streams the body that follows a head returned by read_head().
+
+        Args:
+            file (file): Binary file to write the body to, or None to discard it.
+            status (int): Status code of the response.
+            headers (dict): Headers of the response.
+
+        Returns:
+            int: Number of body bytes read.
+        """
+        if status in (204, 304) or 100 <= status < 200:
+            return 0
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return self._read_chunked_into(file)
+        length = int(headers.get("content-length", 0))
+        self._copy_into(file, length)
+        return length
+
+    def _read_chunked_into(self, file):
+        """Decodes a chunked body into file (or discards it) and returns its length."""
+        total = 0
+        while True:
+            size_field = self._read_line().split(b";", 1)[0].strip()
+            try:
+                size = int(size_field, 16)
+            except ValueError:
+                raise ValueError(f"Invalid chunk size: {size_field!r}") from None
+            if size == 0:
+                while self._read_line():  # Skip trailer fields up to the blank line
+                    pass
+                return total
+            self._copy_into(file, size)
+            if self._read_line():
+                raise ValueError("Missing CRLF after chunk data")
+            total += size
+
+    def _copy_into(self, file, length):
+        """Moves exactly length bytes from the connection into file, or discards them."""
+        take = min(len(self.buffer), length)
+        if take:
+            if file is not None:
+                file.write(self.buffer[:take])
+            del self.buffer[:take]
+        remaining = length - take
+        if remaining and self.chunk is None:
+            self.chunk = memoryview(bytearray(RECV_BUFFER_SIZE))
+        while remaining:
+            received = self.sock.recv_into(self.chunk, min(remaining, RECV_BUFFER_SIZE))
+            if not received:
+                raise ConnectionError("Server closed the connection during the response body")
+            if file is not None:
+                file.write(self.chunk[:received])
+            remaining -= received
+
+
+class _SegmentWriter:
+    """
+    File-like target writing one byte range of a segmented download in place.
+
+    The segment is the [next offset, last offset] pair of the range; the next
+    offset advances with every write, so progress can be saved and resumed.
+    """
+
+    def __init__(self, fd, segment):
+        self.fd = fd
+        self.segment = segment
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.fd, view, self.segment[0])
+            self.segment[0] += written
+            view = view[written:]
+
 
 class Client:
-    def __init__(self, ip, port):
+    def __init__(self, ip, port, connect=True, chunked=False, tls=False, cafile=None, insecure=False,
+                 segments=0):
 
         """
                 Initializes the client by creating a socket attribute for server communication.
+                With connect=False no connection is opened up front (batch mode opens its own).
+                With chunked=True POST bodies are always sent with Transfer-Encoding: chunked.
+                With tls=True every connection is made over TLS, verified against cafile
+                (or the system's CAs), or not verified at all with insecure=True.
+                With segments=N, GETs are downloaded as up to N byte ranges in parallel
+                (see download_segmented()).
         """
         self.client_socket = None
+        self.chunked = chunked
+        self.segments = segments
         self.ip = ip
         self.port = port
-        # Create a new socket connection at the start of the session
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # Connect to the server once before starting the requests
-        self.client_socket.connect((ip, port))  # Replace with actual server IP and port
+        self.validators = self.load_validators()
+        self.validators_lock = threading.Lock()
+        self.tls_context = None
+        if tls:
+            self.tls_context = ssl.create_default_context(cafile=cafile)
+            if insecure:
+                self.tls_context.check_hostname = False
+                self.tls_context.verify_mode = ssl.CERT_NONE
+        self.tls_sessions = {}  # Latest resumable TLS session per server address
+        self.tls_lock = threading.Lock()
+        self.segmented_locks = {}  # Per local path, so one segmented download owns its resume state
+        self.segmented_locks_lock = threading.Lock()
+        if connect:
+            # Connect to the server once before starting the requests
+            self.client_socket = self.connect((ip, port))
 
-    def handle_post(self, file_path, method, server_ip, server_port):
+    def connect(self, address):
+        """
+        Opens a connection to a server, over TLS when the client was created with tls=True.
+
+        Args:
+            address (tuple): The server's (IP, port).
+
+        Returns:
+            socket: The connected socket.
+
+        A TLS connection offers the last session saved for the server by
+        remember_session(), so reconnecting resumes it with an abbreviated
+        handshake instead of a full one.
+        """
+        sock = socket.create_connection(address)
+        if self.tls_context is None:
+            return sock
+        with self.tls_lock:
+            session = self.tls_sessions.get(sock.getpeername()[:2])
+        try:
+            return self.tls_context.wrap_socket(sock, server_hostname=address[0], session=session)
+        except BaseException:
+            sock.close()
+            raise
+
+    def remember_session(self, sock):
+        """
+        Saves the TLS session of a connection for later connections to the same server.
+
+        Called after a response has been read: TLS 1.3 servers send their session
+        tickets after the handshake, so the session only becomes resumable once
+        the client has read from the connection.
+        """
+        session = getattr(sock, "session", None)
+        if session is None or not (session.has_ticket or session.id):
+            return
+        with self.tls_lock:
+            self.tls_sessions[sock.getpeername()[:2]] = session
+
+    def handle_post(self, file_path, method, server_ip, server_port, sock=None, extra="", body=None,
+                    source=None):
         """
         Handles a POST request by sending the file content to the server.
 
@@ -28,17 +315,48 @@ class Client:
             method (str): HTTP method to be used (POST).
             server_ip (str): IP address of the server.
             server_port (int): Port number of the server.
+            sock (socket): Connection to use instead of the client's own.
+            extra (str): Additional header lines, each terminated by CRLF.
+            body (bytes): Body to send instead of the file's content.
+            source (str): Local file to send instead of the one at file_path.
+
+        Returns:
+            int: The response status code.
         
-        Reads the file content, constructs the request, and sends it to the server.
+        Sends the request headers with the file's Content-Length, then streams the
+        file content to the server with sendfile(). Sources without a known size
+        (pipes, FIFOs), or every file when the client was created with chunked=True,
+        are sent with Transfer-Encoding: chunked as they are read instead, so the
+        upload starts right away and only one chunk is held in memory.
         """
-        with open(file_path, 'rb') as file:
-            file_content = file.read()
-        request = f"{method} {file_path} HTTP/1.1\r\n\r\n"
+        sock = sock or self.client_socket
         print(f"Connecting to server POST {server_ip}:{server_port}")
-        self.client_socket.send(request.encode("utf-8") + file_content)
-        self.receive_response()
+        if body is not None:
+            request = f"{method} {file_path} HTTP/1.1\r\n{extra}Content-Length: {len(body)}\r\n\r\n"
+            sock.sendall(request.encode("utf-8") + body)
+            status, _ = self.receive_response(sock)
+            self.remember_session(sock)
+            return status
+        with open(source or file_path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            if self.chunked or not stat.S_ISREG(st.st_mode):
+                request = f"{method} {file_path} HTTP/1.1\r\n{extra}Transfer-Encoding: chunked\r\n\r\n"
+                sock.sendall(request.encode("utf-8"))
+                while True:
+                    data = file.read(UPLOAD_CHUNK_SIZE)
+                    if not data:
+                        break
+                    sock.sendall(b"%x\r\n%b\r\n" % (len(data), data))
+                sock.sendall(b"0\r\n\r\n")
+            else:
+                request = f"{method} {file_path} HTTP/1.1\r\n{extra}Content-Length: {st.st_size}\r\n\r\n"
+                sock.sendall(request.encode("utf-8"))
+                sock.sendfile(file)
+        status, _ = self.receive_response(sock)
+        self.remember_session(sock)
+        return status
 
-    def handle_get(self, file_path, method, server_ip, server_port):
+    def handle_get(self, file_path, method, server_ip, server_port, sock=None, extra=""):
         """
         Handles a GET request by requesting a file from the server and saving it locally.
 
@@ -47,47 +365,318 @@ class Client:
             method (str): HTTP method to be used (GET).
             server_ip (str): IP address of the server.
             server_port (int): Port number of the server.
+            sock (socket): Connection to use instead of the client's own.
+            extra (str): Additional header lines, each terminated by CRLF.
+
+        Returns:
+            int: The response status code.
         
         Sends the request to the server and saves the received file content.
+        If a local copy exists and its validators are known, the request is made
+        conditional; a 304 Not Modified response leaves the local file untouched.
+        With segments set, the file is downloaded by download_segmented() instead.
         """
-        request = f"{method} {file_path} HTTP/1.1\r\n\r\n"
-        self.client_socket.send(request.encode("utf-8"))
-        response = self.receive_response()
-        headers_end = response.find(b"\r\n\r\n")  # Locate end of headers
-        body = response[headers_end + 4:]  # Extract the body
+        sock = sock or self.client_socket
+        if self.segments:
+            status = self.download_segmented(file_path, method, server_ip, server_port, sock, extra)
+            self.remember_session(sock)
+            return status
+        sock.send(self.get_request(file_path, method, server_ip, server_port, extra))
+        status = self.download(ResponseReader(sock), file_path, server_ip, server_port)
+        self.remember_session(sock)
+        return status
+
+    def get_request(self, file_path, method, server_ip, server_port, extra=""):
+        """
+        Builds a GET request, made conditional when a validated local copy exists.
+
+        Args:
+            extra (str): Additional header lines, each terminated by CRLF.
+
+        Returns:
+            bytes: The encoded request.
+        """
+        key = f"{server_ip}:{server_port}/{file_path}"
+        conditions = ""
+        with self.validators_lock:
+            validators = self.validators.get(key)
+        if validators and os.path.exists(file_path):
+            if validators.get("etag"):
+                conditions += f"If-None-Match: {validators['etag']}\r\n"
+            if validators.get("last_modified"):
+                conditions += f"If-Modified-Since: {validators['last_modified']}\r\n"
+        return f"{method} {file_path} HTTP/1.1\r\n{conditions}{extra}\r\n".encode("utf-8")
+
+    def download(self, reader, file_path, server_ip, server_port):
+        """
+        Reads a GET response and stores its outcome.
+
+        Args:
+            reader (ResponseReader): Reader for the connection the GET was sent on.
+            file_path (str): Local path of the downloaded file.
+            server_ip (str): IP address of the server.
+            server_port (int): Port number of the server.
+
+        Only the response headers are printed. A 200 body is streamed into a
+        temporary ".part" file of its own next to file_path, synced and renamed
+        over the local file once complete, and the file's validators are
+        remembered; on 304 the local copy is kept.
+
+        Returns:
+            int: The response status code.
+        """
+        status, headers = reader.read_head()
+        print(reader.head)
+        return self.save_response(reader, status, headers, file_path, server_ip, server_port)
+
+    def save_response(self, reader, status, headers, file_path, server_ip, server_port):
+        """
+        Stores the body of a GET response whose head has already been read.
+
+        Returns:
+            int: The response status code.
+        """
+        if status == 304:
+            reader.read_body_into(None, status, headers)
+            print(f"{file_path} not modified, keeping the local copy")
+            return status
+        if status != 200:
+            reader.read_body_into(None, status, headers)
+            return status
+        # Unique per download: the same path may be fetched concurrently in a batch
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".",
+                                         prefix=f".{os.path.basename(file_path)}.", suffix=".part")
         # Write the file content to a local file
-        with open(file_path, 'wb') as file:
-            file.write(body)  # Write binary data to file
-            file.flush()
-            os.fsync(file.fileno())
+        try:
+            with open(fd, 'wb') as file:
+                reader.read_body_into(file, status, headers)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        os.chmod(temp_path, 0o644)  # mkstemp creates it private
+        os.replace(temp_path, file_path)
+        self.remember_validators(file_path, server_ip, server_port, headers)
+        return status
+
+    def remember_validators(self, file_path, server_ip, server_port, headers):
+        """Saves a downloaded file's ETag and Last-Modified for later conditional requests."""
+        if "etag" in headers or "last-modified" in headers:
+            with self.validators_lock:
+                self.validators[f"{server_ip}:{server_port}/{file_path}"] = {
+                    "etag": headers.get("etag"),
+                    "last_modified": headers.get("last-modified"),
+                }
+                self.save_validators()
+
+    def download_segmented(self, file_path, method, server_ip, server_port, sock, extra=""):
+        """
+        Downloads a file as byte ranges fetched in parallel over separate connections.
+
+        Args:
+            file_path (str): The path of the file to download.
+            method (str): HTTP method to be used (GET).
+            server_ip (str): IP address of the server.
+            server_port (int): Port number of the server.
+            sock (socket): Connection the file's size is requested on; the ranges
+                are fetched from the same server.
+            extra (str): Additional header lines sent with every request.
+
+        Returns:
+            int: The status code of the first response.
+
+        A first request for the file's first byte, conditional like handle_get(),
+        returns its size and validators. The file is then split into up to
+        self.segments ranges of at least SEGMENT_MIN_SIZE bytes, each fetched on
+        its own connection and written in place into "<file_path>.part",
+        preallocated to the full size. Progress is saved to "<file_path>.part.json"
+        every SEGMENT_STATE_INTERVAL seconds, so after a failure or an interrupted
+        run the same request resumes every range where it stopped, as long as the
+        server still has the same version of the file. Every range request carries
+        If-Range, so a file replaced mid-download is never stitched together from
+        two versions. Servers that ignore Range get a plain download.
+
+        Concurrent segmented downloads of the same path in one client take turns,
+        since they share the ".part" file and its progress; a later one is then
+        usually answered 304 Not Modified.
+        """
+        with self.segmented_locks_lock:
+            lock = self.segmented_locks.setdefault(os.path.abspath(file_path), threading.Lock())
+        with lock:
+            return self._download_segmented(file_path, method, server_ip, server_port, sock, extra)
+
+    def _download_segmented(self, file_path, method, server_ip, server_port, sock, extra):
+        started = time.perf_counter()
+        sock.send(self.get_request(file_path, method, server_ip, server_port,
+                                   extra + "Range: bytes=0-0\r\n"))
+        reader = ResponseReader(sock)
+        status, headers = reader.read_head()
+        print(reader.head)
+        if status == 416:
+            # An empty file has no first byte; fetch it as a whole
+            reader.read_body_into(None, status, headers)
+            sock.send(self.get_request(file_path, method, server_ip, server_port, extra))
+            return self.download(reader, file_path, server_ip, server_port)
+        if status != 206:
+            return self.save_response(reader, status, headers, file_path, server_ip, server_port)
+        reader.read_body_into(None, status, headers)
+        size = int(headers.get("content-range", "").rpartition("/")[2])
+        validator = headers.get("etag") or headers.get("last-modified")
+
+        temp_path = file_path + ".part"
+        state_path = temp_path + ".json"
+        state = self.load_segments(state_path)
+        identity = {"size": size, "etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+        if validator is None or state is None or any(state.get(k) != v for k, v in identity.items()):
+            count = max(1, min(self.segments, size // SEGMENT_MIN_SIZE))
+            step = -(-size // count)
+            state = dict(identity, segments=[[first, min(first + step, size) - 1]
+                                             for first in range(0, size, step)])
+        pending = [segment for segment in state["segments"] if segment[0] <= segment[1]]
+        resumed = size - sum(last - first + 1 for first, last in pending)
+
+        address = sock.getpeername()[:2]
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+                if hasattr(os, "posix_fallocate") and size:
+                    os.posix_fallocate(fd, 0, size)  # Reserve the blocks up front
+            if pending:
+                with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                    futures = [executor.submit(self.fetch_segment, address, file_path, fd, segment,
+                                               validator, size, extra)
+                               for segment in pending]
+                    while wait(futures, timeout=SEGMENT_STATE_INTERVAL).not_done:
+                        self.save_segments(state_path, state)
+                self.save_segments(state_path, state)
+                for future in futures:
+                    future.result()  # Re-raises the first range that failed
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp_path, file_path)
+        try:
+            os.remove(state_path)
+        except FileNotFoundError:
+            pass  # Resumed with every range already complete
+        self.remember_validators(file_path, server_ip, server_port, headers)
+
+        elapsed = time.perf_counter() - started
+        fetched = size - resumed
+        print(f"{file_path}: {size} bytes in {len(state['segments'])} segments, {resumed} resumed, "
+              f"{elapsed:.3f}s ({fetched / elapsed / (1024 * 1024):.1f} MB/s)")
+        return status
+
+    def fetch_segment(self, address, file_path, fd, segment, validator, size, extra=""):
+        """
+        Fetches the rest of one byte range into the download file.
+
+        Args:
+            address (tuple): The server's (IP, port).
+            file_path (str): The path of the file being downloaded.
+            fd (int): Descriptor of the preallocated "<file_path>.part".
+            segment (list): [next offset, last offset] of the range, advanced as
+                data is written.
+            validator (str): ETag or Last-Modified of the version being downloaded.
+            size (int): Full size of that version.
+            extra (str): Additional header lines, each terminated by CRLF.
+
+        A dropped connection is retried up to SEGMENT_RETRIES times from the first
+        byte not yet written; local errors, such as a full disk, fail the download
+        right away. Any response other than the requested range of the same
+        version raises ValueError.
+        """
+        failures = 0
+        while segment[0] <= segment[1]:
+            sock = None
+            try:
+                sock = self.connect(address)
+                sock.sendall((
+                    f"GET {file_path} HTTP/1.1\r\n"
+                    f"Range: bytes={segment[0]}-{segment[1]}\r\n"
+                    f"If-Range: {validator}\r\n"
+                    f"{extra}Connection: close\r\n\r\n"
+                ).encode("utf-8"))
+                reader = ResponseReader(sock)
+                status, headers = reader.read_head()
+                if status != 206 or headers.get("content-range") != f"bytes {segment[0]}-{segment[1]}/{size}":
+                    raise ValueError(f"Range {segment[0]}-{segment[1]} of {file_path} answered with "
+                                     f"{reader.head.splitlines()[0]!r}; the file may have changed")
+                reader.read_body_into(_SegmentWriter(fd, segment), status, headers)
+                self.remember_session(sock)
+            except CONNECTION_ERRORS as e:
+                failures += 1
+                if failures > SEGMENT_RETRIES:
+                    raise
+                print(f"Range of {file_path} failed ({e}), resuming from byte {segment[0]}")
+            finally:
+                if sock is not None:
+                    sock.close()
+
+    @staticmethod
+    def load_segments(state_path):
+        """
+        Loads the saved progress of an interrupted segmented download.
+
+        Returns:
+            dict: Size, validators and [next offset, last offset] ranges of the
+            download, or None if there is none.
+        """
+        try:
+            with open(state_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def save_segments(state_path, state):
+        """Writes the progress of a segmented download so it can be resumed."""
+        temp_path = state_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(temp_path, state_path)
+
+    def load_validators(self):
+        """
+        Loads the validators of previously downloaded files.
+
+        Returns:
+            dict: Maps "ip:port/path" to the file's ETag and Last-Modified values.
+        """
+        try:
+            with open(VALIDATORS_FILE, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
 
-    def receive_response(self):
+    def save_validators(self):
+        """Writes the validator store so conditional requests survive restarts."""
+        temp_path = VALIDATORS_FILE + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.validators, file)
+        os.replace(temp_path, VALIDATORS_FILE)
+
+    def receive_response(self, sock=None):
         """
         Receives the response from the server.
 
+        Args:
+            sock (socket): Connection to read from instead of the client's own.
+
         Returns:
-            bytes: The complete response from the server.
-        
-        Reads data in chunks and stops when no more data is available.
+            tuple: (status code, headers dict with lower-cased names).
+
+        Prints the status line and headers; the body is read according to
+        Content-Length or its chunked framing and discarded. Raises ConnectionError if the server closed
+        the connection before the response was complete.
         """
-        response = b""
-        while True:
-            chunk = self.client_socket.recv(1024)
-            if not chunk:
-                break
-            response += chunk
-            if len(chunk) < 1024:
-                break
-        response_str = response.decode("utf-8", errors="ignore")
-        print(response_str)
-        # header_end_index = response_str.find("\r\n\r\n")
-        # if header_end_index != -1:
-        #     headers = response_str[:header_end_index]
-        #     print(headers)
-        # else:
-        #     # In case there's no \r\n\r\n, print the whole response
-        #     print(f"Received: {response_str}")
-        return response
+        reader = ResponseReader(sock or self.client_socket)
+        status, headers = reader.read_head()
+        print(reader.head)
+        reader.read_body_into(None, status, headers)
+        return status, headers
 
     def parse_request(self, request):
         """
@@ -140,6 +729,333 @@ class Client:
         except Exception as e:
             print(f"Error sending request: {e}")
 
+    def execute(self, pool, request_parts, **options):
+        """
+        Performs one request on a pooled connection, reconnecting if it has died.
+
+        Args:
+            pool (ConnectionPool): Pool of connections to the request's server.
+            request_parts (dict): Details of the request (method, path, IP, port).
+            options: Passed on to handle_get() or handle_post(), e.g. extra headers.
+
+        Returns:
+            int: The response status code, or None if the request failed.
+
+        A pooled connection the server has already closed fails on first use; the
+        request is then retried once on a freshly opened connection. Only
+        connection failures are retried: a local file error, such as a full disk
+        or a missing upload, is reported and the request fails.
+        """
+        method = request_parts["method"]
+        handler = self.handle_post if method == "POST" else self.handle_get
+        server_ip, server_port = pool.address
+        for attempt in range(2):
+            try:
+                sock = pool.acquire()
+            except OSError as e:
+                print(f"Error connecting to {server_ip}:{server_port}: {e}")
+                return None
+            try:
+                status = handler(request_parts["path"], method, server_ip, server_port, sock, **options)
+            except CONNECTION_ERRORS as e:
+                pool.release(sock, reusable=False)
+                if attempt:
+                    print(f"Error sending request: {e}")
+            except Exception as e:
+                pool.release(sock, reusable=False)
+                print(f"Error sending request: {e}")
+                return None
+            else:
+                pool.release(sock)
+                return status
+        return None
+
+    def load_requests(self, input_file_path):
+        """
+        Parses every valid request line of an input file.
+
+        Returns:
+            list: Parsed request details, in file order; None if the file can't
+            be read, which has been reported.
+        """
+        requests = []
+        try:
+            with open(input_file_path, "r") as input_file:
+                lines = input_file.read().splitlines()
+        except FileNotFoundError:
+            print(f"Error: The file '{input_file_path}' was not found. Please enter a valid file path.")
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return None
+        for line in lines:
+            try:
+                request_parts = self.parse_request(line.strip())
+                if request_parts is not None:
+                    int(request_parts["port_number"])
+            except (IndexError, ValueError):
+                request_parts = None
+            if request_parts is not None:
+                requests.append(request_parts)
+        return requests
+
+    def run_batch(self, input_file_path, concurrency=8, pool_size=4):
+        """
+        Runs every request in an input file concurrently and reports the throughput.
+
+        Args:
+            input_file_path (str): File with one "client_get|client_post path ip port" per line.
+            concurrency (int): Maximum number of requests in flight at once.
+            pool_size (int): Maximum keep-alive connections kept open per server.
+
+        Requests are grouped by the server named on their line, each server gets its
+        own ConnectionPool, and a thread pool runs them up to the concurrency limit.
+        """
+        requests = self.load_requests(input_file_path)
+        if requests is None:
+            return 0
+        pools = {}
+        for request_parts in requests:
+            address = (request_parts["server_ip"], int(request_parts["port_number"]))
+            if address not in pools:
+                pools[address] = ConnectionPool(*address, pool_size, self.connect)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(self.execute,
+                                pools[(r["server_ip"], int(r["port_number"]))], r)
+                for r in requests
+            ]
+            completed = sum(1 for future in futures if future.result() is not None)
+        total_time = time.perf_counter() - start_time
+        for pool in pools.values():
+            pool.close()
+
+        throughput = len(requests) / total_time if total_time > 0 else 0.0
+        print(f"Batch: {len(requests)} requests to {len(pools)} servers in {total_time:.3f}s "
+              f"({throughput:.1f} req/s), {len(requests) - completed} failed")
+        return completed
+
+    def run_plan(self, input_file_path, concurrency=8, pool_size=4, timings_path=None, dry_run=False):
+        """
+        Plans a batch file with the planner and runs the plan, timing every request.
+
+        Args:
+            input_file_path (str): JSON Lines batch file (see planner.py); lines in
+                the "client_get|client_post path ip port" form are accepted too.
+            concurrency (int): Maximum number of requests in flight at once.
+            pool_size (int): Maximum keep-alive connections kept open per server.
+            timings_path (str): File the per-request timings are written to as JSON Lines.
+            dry_run (bool): Only plan the file and print the plan's summary.
+
+        Returns:
+            int: Number of requests completed.
+
+        The file is streamed into a Plan: duplicate GETs are dropped, requests are
+        grouped by server, and each server's requests are split into stages that
+        preserve the order of uploads and the GETs depending on them. Every server
+        runs its stages one after the other over its own ConnectionPool, all
+        servers at once, sharing the thread pool. Each stage is submitted in the
+        order chosen by the planner, which spreads large transfers between small
+        ones. Timings are measured from the start of the run.
+        """
+        try:
+            plan = load_plan(input_file_path, (self.ip, self.port))
+        except PlanError as e:
+            print(f"Error: {input_file_path}, {e}")
+            return 0
+        print(plan.summary())
+        if dry_run:
+            return 0
+        pools = {address: ConnectionPool(*address, pool_size, self.connect) for address in plan.servers}
+        timings = []
+        next_stage = dict.fromkeys(plan.servers, 0)
+        finished_stages = queue.Queue()
+        lock = threading.Lock()
+
+        def submit_stage(executor, address):
+            stage = plan.servers[address][next_stage[address]]
+            next_stage[address] += 1
+            left = [len(stage)]
+
+            def done(future):
+                with lock:
+                    left[0] -= 1
+                    last = not left[0]
+                if last:
+                    finished_stages.put(address)
+
+            for request in stage:
+                executor.submit(self.run_planned, pools[address], request, start_time,
+                                timings).add_done_callback(done)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for address in plan.servers:
+                submit_stage(executor, address)
+            running = len(plan.servers)
+            while running:
+                address = finished_stages.get()
+                if next_stage[address] < len(plan.servers[address]):
+                    submit_stage(executor, address)
+                else:
+                    running -= 1
+        total_time = time.perf_counter() - start_time
+        for pool in pools.values():
+            pool.close()
+
+        completed = sum(1 for timing in timings if timing["status"] is not None)
+        durations = sorted(timing["duration_ms"] for timing in timings)
+        throughput = len(timings) / total_time if total_time > 0 else 0.0
+        print(f"Plan run: {len(timings)} requests to {len(pools)} servers in {total_time:.3f}s "
+              f"({throughput:.1f} req/s), {len(timings) - completed} failed")
+        if durations:
+            slowest = max(timings, key=lambda timing: timing["duration_ms"])
+            print(f"Request time: p50={durations[len(durations) // 2]:.2f}ms "
+                  f"p99={durations[min(len(durations) - 1, len(durations) * 99 // 100)]:.2f}ms "
+                  f"max={durations[-1]:.2f}ms ({slowest['method']} {slowest['path']}, "
+                  f"id {slowest['id']})")
+        if timings_path:
+            with open(timings_path, "w") as file:
+                for timing in sorted(timings, key=lambda timing: timing["start_ms"]):
+                    file.write(json.dumps(timing) + "\n")
+            print(f"Timings written to {timings_path}")
+        return completed
+
+    def run_planned(self, pool, request, start_time, timings):
+        """
+        Performs a PlannedRequest with execute(), once per repeat, appending their timings.
+
+        A timing holds the request's id, method, server, path and status (None if
+        it failed), and its start and duration in milliseconds. Repeats run one
+        after the other, so they never write the same local file at once.
+        """
+        options = {"extra": request.headers}
+        if request.method == "POST":
+            options.update(body=request.body, source=request.source)
+        for _ in range(request.repeat):
+            started = time.perf_counter()
+            status = self.execute(pool, {"method": request.method, "path": request.path}, **options)
+            finished = time.perf_counter()
+            timings.append({
+                "id": request.id,
+                "method": request.method,
+                "server": f"{request.address[0]}:{request.address[1]}",
+                "path": request.path,
+                "status": status,
+                "start_ms": round((started - start_time) * 1000, 3),
+                "duration_ms": round((finished - started) * 1000, 3),
+            })
+
+    def run_pipelined(self, input_file_path, window=16, retries=3):
+        """
+        Runs an input file with GET requests pipelined over one connection per server.
+
+        Args:
+            input_file_path (str): File with one "client_get|client_post path ip port" per line.
+            window (int): Number of GET requests written back to back before their
+                responses are read.
+            retries (int): Reconnection attempts per server after a connection fails.
+
+        Over a high-latency link this costs about one round trip per window instead
+        of one per file. Prints the total time and throughput like run_batch().
+        """
+        requests = self.load_requests(input_file_path)
+        if requests is None:
+            return 0
+        servers = {}
+        for request_parts in requests:
+            address = (request_parts["server_ip"], int(request_parts["port_number"]))
+            servers.setdefault(address, []).append(request_parts)
+        count = sum(len(requests) for requests in servers.values())
+
+        start_time = time.perf_counter()
+        completed = 0
+        for address, requests in servers.items():
+            completed += self.pipeline(address, requests, window, retries)
+        total_time = time.perf_counter() - start_time
+
+        throughput = count / total_time if total_time > 0 else 0.0
+        print(f"Pipelined: {count} requests to {len(servers)} servers in {total_time:.3f}s "
+              f"({throughput:.1f} req/s), {count - completed} failed")
+        return completed
+
+    def pipeline(self, address, requests, window, retries):
+        """
+        Sends one server's requests, pipelining consecutive GETs in windows.
+
+        Args:
+            address (tuple): The server's (IP, port).
+            requests (list): Parsed requests for this server, in file order.
+            window (int): Maximum GET requests in flight on the connection.
+            retries (int): Reconnection attempts after a connection fails.
+
+        Returns:
+            int: Number of requests completed.
+
+        Responses are read in request order and framed by Content-Length or chunked
+        transfer coding. If the
+        connection fails, requests that have not been answered yet are sent again
+        on a fresh connection. A local file error, such as a missing upload or a
+        full disk, fails only its own request; a malformed response gives up on
+        the server. POST requests are sent on their own, in file order.
+        """
+        server_ip, server_port = address
+        pending = deque(requests)
+        completed = 0
+        failures = 0
+        sock = None
+        while pending:
+            try:
+                if sock is None:
+                    sock = self.connect(address)
+                    reader = ResponseReader(sock)
+                if pending[0]["method"] != "GET":
+                    self.handle_post(pending[0]["path"], pending[0]["method"], server_ip, server_port, sock)
+                    pending.popleft()
+                    completed += 1
+                    continue
+                batch = []
+                for request_parts in pending:
+                    if request_parts["method"] != "GET" or len(batch) == window:
+                        break
+                    batch.append(request_parts)
+                sock.sendall(b"".join(
+                    self.get_request(r["path"], r["method"], server_ip, server_port) for r in batch))
+                for request_parts in batch:
+                    self.download(reader, request_parts["path"], server_ip, server_port)
+                    pending.popleft()
+                    completed += 1
+                self.remember_session(sock)
+                failures = 0
+            except CONNECTION_ERRORS as e:
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                failures += 1
+                if failures > retries:
+                    print(f"Error: giving up on {server_ip}:{server_port} with "
+                          f"{len(pending)} requests unanswered: {e}")
+                    break
+                print(f"Connection to {server_ip}:{server_port} failed ({e}), "
+                      f"retrying {len(pending)} requests on a new connection")
+            except OSError as e:
+                # A local file error fails only its own request, the oldest unanswered one.
+                # It may have left a request or response half sent, so start over on a new connection.
+                if sock is not None:
+                    sock.close()
+                    sock = None
+                request_parts = pending.popleft()
+                print(f"Error: {request_parts['method']} {request_parts['path']} failed: {e}")
+            except ValueError as e:
+                print(f"Error: malformed response from {server_ip}:{server_port}, giving up with "
+                      f"{len(pending)} requests unanswered: {e}")
+                break
+        if sock is not None:
+            sock.close()
+        return completed
+
     def run(self):
         """
         Runs the client, enabling it to connect to the server and process requests from a file.
@@ -155,8 +1071,7 @@ class Client:
                     break
                 if input_file_path.lower() == 'r':
                     print("Reconnecting...")
-                    self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.client_socket.connect((self.ip, self.port))  # Replace with actual server IP and port
+                    self.client_socket = self.connect((self.ip, self.port))
                     continue
                 try:
                     # Read requests from the specified file
@@ -189,9 +1104,8 @@ class Client:
         """
         try:
             # Create a new socket connection at the start of the session
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             # Connect to the server once before starting the requests
-            self.client_socket.connect(("127.0.0.1", 8000))  # Replace with actual server IP and port
+            self.client_socket = self.connect(("127.0.0.1", 8000))  # Replace with actual server IP and port
             input_file_path = "input.txt"
             try:
                 # Read requests from the specified file
@@ -219,15 +1133,47 @@ class Client:
 
 # Instantiate and run the client
 if __name__ == "__main__":
-    try:
-        ip = sys.argv[1]
-    except Exception as e:
-        print("No ip found, using default ip")
-        ip = "127.0.0.1"
-    try:
-        port = int(sys.argv[2])
-    except Exception as e:
-        print("No port found, using default port 80")
-        port = 80
-    client = Client(ip, port)
-    client.run()
+    parser = argparse.ArgumentParser(description="Simple HTTP file client.")
+    parser.add_argument("ip", nargs="?", default="127.0.0.1", help="server IP (default: 127.0.0.1)")
+    parser.add_argument("port", nargs="?", type=int, default=80, help="server port (default: 80)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run every request in FILE concurrently instead of prompting")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="requests in flight at once in batch and plan mode")
+    parser.add_argument("--pool-size", type=int, default=4,
+                        help="keep-alive connections per server in batch and plan mode")
+    parser.add_argument("--plan", metavar="FILE",
+                        help="plan a JSON Lines batch FILE (deduplicated, grouped by server, large "
+                             "transfers spread out) and run it with per-request timing")
+    parser.add_argument("--timings", metavar="FILE",
+                        help="with --plan, write every request's timing to FILE as JSON Lines")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --plan, only plan the file and print the plan's summary")
+    parser.add_argument("--pipeline", type=int, metavar="WINDOW",
+                        help="with --batch, pipeline up to WINDOW GETs on one connection per server")
+    parser.add_argument("--chunked", action="store_true",
+                        help="send POST bodies with Transfer-Encoding: chunked")
+    parser.add_argument("--tls", action="store_true", help="connect over TLS (HTTPS)")
+    parser.add_argument("--cafile", metavar="PEM",
+                        help="with --tls, CA certificates to verify the server against "
+                             "(e.g. its self-signed certificate)")
+    parser.add_argument("--insecure", action="store_true",
+                        help="with --tls, don't verify the server's certificate")
+    parser.add_argument("--segments", type=int, default=0, metavar="N",
+                        help="download GETs as up to N byte ranges in parallel, resuming "
+                             "interrupted downloads (not with --pipeline)")
+    args = parser.parse_args()
+    options = dict(chunked=args.chunked, tls=args.tls, cafile=args.cafile, insecure=args.insecure,
+                   segments=args.segments)
+    if args.plan:
+        client = Client(args.ip, args.port, connect=False, **options)
+        client.run_plan(args.plan, args.concurrency, args.pool_size, args.timings, args.dry_run)
+    elif args.batch and args.pipeline:
+        client = Client(args.ip, args.port, connect=False, **options)
+        client.run_pipelined(args.batch, args.pipeline)
+    elif args.batch:
+        client = Client(args.ip, args.port, connect=False, **options)
+        client.run_batch(args.batch, args.concurrency, args.pool_size)
+    else:
+        client = Client(args.ip, args.port, **options)
+        client.run()
@@ -0,0 +1,329 @@
+"""
+Plans batch request files for the client.
+
+A batch file holds one request per line, either as a JSON object (JSON Lines):
+
+    {"method": "GET", "path": "big.iso", "server": "10.0.0.2:8000", "size": 700000000}
+    {"method": "POST", "path": "notes.txt", "body": "hello", "headers": {"X-Tag": "a"}}
+    {"method": "GET", "path": "index.html", "repeat": 10, "priority": 1}
+
+or in the original "client_get|client_post path ip port" form. Fields:
+
+    method    GET or POST.
+    path      File to fetch or upload to.
+    server    "ip:port"; defaults to the client's own server.
+    headers   Extra request headers.
+    body      POST body given inline instead of the contents of the local file.
+    file      Local file to upload, if not the one at path.
+    repeat    Times the request is sent (default 1).
+    priority  Higher priorities run earlier (default 0).
+    size      Expected transfer size in bytes, used for ordering. Uploads of
+              local files default to the file's size, downloads to 0 (small).
+    id        Name reported with the request's timing; defaults to its line number.
+"""
+
+import json
+import os
+import time
+
+LARGE_TRANSFER_SIZE = 1024 * 1024  # Transfers at least this big are spread out between small ones
+
+_decode = json.JSONDecoder().raw_decode
+
+
+class PlanError(ValueError):
+    """Raised for a batch file line that is not a valid request."""
+
+    def __init__(self, line_number, message):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+class PlannedRequest:
+    """One request of a plan, with everything needed to send and schedule it."""
+
+    __slots__ = ("id", "method", "path", "address", "headers", "body", "source", "repeat",
+                 "priority", "size")
+
+    def __init__(self, id, method, path, address, headers="", body=None, source=None, repeat=1,
+                 priority=0, size=0):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.address = address
+        self.headers = headers  # Extra header lines, each terminated by CRLF
+        self.body = body
+        self.source = source
+        self.repeat = repeat
+        self.priority = priority
+        self.size = size
+
+
+class Plan:
+    """
+    Requests grouped by server, each server's requests split into stages.
+
+    A stage holds requests that may run concurrently and in any order: a request
+    for a path the current stage already uses, such as a GET of a file uploaded
+    earlier in the file, starts a new stage, and a server's stages run one after
+    the other. The repeats of a request run one after the other too. Different
+    servers are independent.
+
+    Attributes:
+        servers (dict): Maps (ip, port) to the server's list of stages, each a
+            list of PlannedRequest in the order they are submitted.
+        lines (int): Request lines read.
+        requests (int): Requests planned, before repeats.
+        duplicates (int): GET lines dropped because an identical GET was planned.
+        seconds (float): Time spent reading and planning the file.
+    """
+
+    def __init__(self):
+        self.servers = {}
+        self.lines = 0
+        self.requests = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+
+    @property
+    def executions(self):
+        """Number of requests sent when the plan runs, counting repeats."""
+        return sum(request.repeat for stages in self.servers.values()
+                   for stage in stages for request in stage)
+
+    def summary(self):
+        stages = sum(len(stages) for stages in self.servers.values())
+        return (f"Plan: {self.lines} lines, {self.requests} requests "
+                f"({self.duplicates} duplicate GETs removed) to {len(self.servers)} servers "
+                f"in {stages} stages, planned in {self.seconds:.3f}s")
+
+
+class _ServerPlanner:
+    """Builds the stages of one server while its requests stream in."""
+
+    __slots__ = ("stages", "stage", "touched", "gets")
+
+    def __init__(self):
+        self.stages = []
+        self.stage = []
+        self.touched = set()  # Paths used by the current stage
+        self.gets = {}  # Maps path to {headers: planned GET} for duplicate removal
+
+    def add(self, request):
+        """
+        Plans a request, or merges it into an identical GET.
+
+        Returns:
+            bool: False if the request was a duplicate.
+        """
+        path = request.path
+        if request.method == "GET":
+            variants = self.gets.get(path)
+            if variants is None:
+                variants = self.gets[path] = {}
+            planned = variants.get(request.headers)
+            if planned is not None:
+                planned.priority = max(planned.priority, request.priority)
+                planned.repeat = max(planned.repeat, request.repeat)
+                planned.size = max(planned.size, request.size)
+                return False
+            variants[request.headers] = request
+        else:
+            # Later GETs must fetch what this upload stored
+            self.gets.pop(path, None)
+        if path in self.touched:
+            self._next_stage()
+        self.touched.add(path)
+        self.stage.append(request)
+        return True
+
+    def _next_stage(self):
+        self.stages.append(self.stage)
+        self.stage = []
+        self.touched = set()
+
+    def finish(self, large_size):
+        if self.stage:
+            self.stages.append(self.stage)
+        return [order_stage(stage, large_size) for stage in self.stages]
+
+
+def order_stage(requests, large_size=LARGE_TRANSFER_SIZE):
+    """
+    Orders the requests of one stage for submission.
+
+    Higher priorities come first. Within a priority, transfers of at least
+    large_size bytes are spread evenly between the small ones, largest first,
+    so the large ones start early and run alongside small ones instead of all
+    taking up the connections at once, at the start or at the end.
+    """
+    if any(request.priority for request in requests):
+        requests = sorted(requests, key=lambda request: -request.priority)
+    ordered = []
+    start = 0
+    while start < len(requests):
+        end = start
+        priority = requests[start].priority
+        while end < len(requests) and requests[end].priority == priority:
+            end += 1
+        group = requests[start:end]
+        large = sorted((r for r in group if r.size >= large_size), key=lambda r: -r.size)
+        if not large:
+            ordered += group
+        else:
+            small = [r for r in group if r.size < large_size]
+            step = len(small) / len(large)
+            taken = 0
+            for index, request in enumerate(large):
+                ordered.append(request)
+                until = round((index + 1) * step)
+                ordered += small[taken:until]
+                taken = until
+        start = end
+    return ordered
+
+
+def parse_line(line, line_number, default_address, addresses=None):
+    """
+    Parses one batch file line.
+
+    Args:
+        line (str): The line.
+        line_number (int): Its number, the request's id unless it names one.
+        default_address (tuple): (ip, port) of requests that don't name a server.
+        addresses (dict): Cache of parsed "ip:port" strings shared between lines.
+
+    Returns:
+        PlannedRequest: The request, or None for blank lines and comments.
+
+    Raises:
+        PlanError: If the line is not a valid request.
+    """
+    line = line.strip()
+    if not line or line[0] == "#":
+        return None
+    if line[0] != "{":
+        parts = line.split()
+        if len(parts) < 4 or parts[0] not in ("client_get", "client_post"):
+            raise PlanError(line_number, "expected 'client_get|client_post path ip port'")
+        try:
+            address = (parts[2], int(parts[3]))
+        except ValueError:
+            raise PlanError(line_number, f"invalid port {parts[3]!r}") from None
+        if parts[0] == "client_get":
+            return PlannedRequest(line_number, "GET", parts[1], address)
+        return PlannedRequest(line_number, "POST", parts[1], address, size=_local_size(parts[1]))
+    try:
+        fields, end = _decode(line)
+    except ValueError as e:
+        raise PlanError(line_number, f"invalid request object: {e}") from None
+    if end != len(line):
+        raise PlanError(line_number, "invalid request object: extra data after the object")
+    if not isinstance(fields, dict):
+        raise PlanError(line_number, "expected a JSON object")
+    get = fields.get
+    method = get("method")
+    path = get("path")
+    if not isinstance(method, str) or not isinstance(path, str) or not path:
+        raise PlanError(line_number, "method and path must be non-empty strings")
+    method = method.upper()
+    if method not in ("GET", "POST"):
+        raise PlanError(line_number, f"unsupported method {method}")
+    address = default_address
+    server = get("server")
+    if server is not None and not isinstance(server, str):
+        raise PlanError(line_number, "server must be an \"ip:port\" string")
+    if server:
+        address = addresses.get(server) if addresses is not None else None
+        if address is None:
+            host, _, port = server.rpartition(":")
+            try:
+                address = (host, int(port))
+            except ValueError:
+                raise PlanError(line_number, f"invalid server {server!r}") from None
+            if addresses is not None:
+                addresses[server] = address
+    headers = get("headers")
+    if headers is not None and not (isinstance(headers, dict)
+                                    and all(isinstance(value, (str, int, float))
+                                            for value in headers.values())):
+        raise PlanError(line_number, "headers must be an object of header names to values")
+    headers = "".join(f"{name}: {value}\r\n" for name, value in headers.items()) if headers else ""
+    body = get("body")
+    if body is not None:
+        if not isinstance(body, str):
+            raise PlanError(line_number, "body must be a string")
+        body = body.encode("utf-8")
+    source = get("file")
+    if source is not None and not isinstance(source, str):
+        raise PlanError(line_number, "file must be a string")
+    repeat = get("repeat", 1)
+    priority = get("priority", 0)
+    if (not isinstance(repeat, int) or isinstance(repeat, bool) or repeat < 1
+            or not isinstance(priority, (int, float)) or isinstance(priority, bool)):
+        raise PlanError(line_number, "repeat must be a positive integer and priority a number")
+    size = get("size")
+    if size is None:
+        if body is not None:
+            size = len(body)
+        else:
+            size = _local_size(source or path) if method == "POST" else 0
+    elif not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise PlanError(line_number, "size must be a non-negative integer")
+    request_id = get("id", line_number)
+    if not isinstance(request_id, (str, int)):
+        raise PlanError(line_number, "id must be a string or an integer")
+    return PlannedRequest(request_id, method, path, address, headers, body,
+                          source, repeat, priority, size)
+
+
+def _local_size(path):
+    """Size of a local file to upload; 0 if there is none (the upload will fail)."""
+    try:
+        return os.stat(path).st_size
+    except (OSError, ValueError):
+        return 0
+
+
+def plan_requests(lines, default_address, large_size=LARGE_TRANSFER_SIZE):
+    """
+    Plans a stream of batch file lines.
+
+    Args:
+        lines (iterable): The lines, read one at a time.
+        default_address (tuple): (ip, port) of requests that don't name a server.
+        large_size (int): Transfers at least this big are spread between small ones.
+
+    Returns:
+        Plan: The requests grouped by server and split into ordered stages.
+
+    Only the planned requests are kept, never the file itself, and each line is
+    looked at once: duplicates are found through a dictionary per server and
+    stage boundaries through the paths the current stage has used.
+    """
+    started = time.perf_counter()
+    plan = Plan()
+    planners = {}
+    addresses = {}
+    for line_number, line in enumerate(lines, 1):
+        request = parse_line(line, line_number, default_address, addresses)
+        if request is None:
+            continue
+        plan.lines += 1
+        planner = planners.get(request.address)
+        if planner is None:
+            planner = planners[request.address] = _ServerPlanner()
+        if planner.add(request):
+            plan.requests += 1
+        else:
+            plan.duplicates += 1
+    for address, planner in planners.items():
+        plan.servers[address] = planner.finish(large_size)
+    plan.seconds = time.perf_counter() - started
+    return plan
+
+
+def load_plan(path, default_address, large_size=LARGE_TRANSFER_SIZE):
+    """Plans the batch file at path, reading it line by line."""
+    with open(path, "r", encoding="utf-8") as file:
+        return plan_requests(file, default_address, large_size)
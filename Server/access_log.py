@@ -0,0 +1,135 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+# Characters escaped in logged values so a request can't forge or break up log lines
+_ESCAPES = {code: f"\\x{code:02x}" for code in (*range(0x20), *range(0x7f, 0xa0))}
+_ESCAPES.update({ord("\\"): "\\\\", ord('"'): '\\"'})
+_FIELD_ESCAPES = {**_ESCAPES, ord(" "): "\\x20"}  # Unquoted fields end at a space
+
+
+class AccessLog:
+    """
+    Structured access log written by a background thread.
+
+    Request threads only append a tuple to a bounded queue; formatting, writing
+    and flushing happen on the writer thread every flush_interval seconds. When the
+    queue is full entries are dropped and counted rather than blocking requests.
+    A file log is rotated once it would grow past max_bytes.
+    """
+
+    def __init__(self, path=None, flush_interval=1.0, queue_size=10000,
+                 max_bytes=100 * 1024 * 1024, backups=5, log_connections=False):
+        """
+        Attributes:
+            path (str): Log file, or None to write to standard output.
+            flush_interval (float): Seconds between writer passes.
+            max_bytes (int): Size at which the log file is rotated.
+            backups (int): Rotated files kept as path.1 .. path.N.
+            log_connections (bool): Also log connection lifecycle events.
+            dropped (int): Entries discarded because the queue was full.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.log_connections = log_connections
+        self.entries = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.file = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Opens the log and starts the writer thread."""
+        if self.path is not None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, status, bytes_out, duration):
+        """Queues one access log line for a completed request."""
+        self._put((time.time(), method, path, status, bytes_out, duration))
+
+    def event(self, message, verbose=True):
+        """
+        Queues a free-form message.
+
+        Args:
+            message (str): The message.
+            verbose (bool): Connection lifecycle noise, only kept when
+                log_connections is set. Errors pass verbose=False.
+        """
+        if verbose and not self.log_connections:
+            return
+        self._put((time.time(), message))
+
+    def _put(self, entry):
+        try:
+            self.entries.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1  # Racy increments only under overload; an estimate is enough
+
+    def _run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        """Formats and writes everything queued so far."""
+        lines = []
+        while True:
+            try:
+                entry = self.entries.get_nowait()
+            except queue.Empty:
+                break
+            lines.append(self._format(entry))
+        if not lines:
+            return
+        data = "".join(lines)
+        if self.file is None:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+        else:
+            if self.file.tell() + len(data) > self.max_bytes:
+                self._rotate()
+            self.file.write(data)
+            self.file.flush()
+        self.written += len(lines)
+
+    @staticmethod
+    def _format(entry):
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(entry[0]))
+        stamp += f".{int(entry[0] % 1 * 1000):03d}Z"
+        if len(entry) == 2:
+            return f"time={stamp} msg=\"{entry[1].translate(_ESCAPES)}\"\n"
+        _, method, path, status, bytes_out, duration = entry
+        method = method.translate(_FIELD_ESCAPES)
+        path = path.translate(_FIELD_ESCAPES)
+        return (f"time={stamp} method={method} path={path} status={status} "
+                f"bytes={bytes_out} duration_ms={duration * 1000:.3f}\n")
+
+    def _rotate(self):
+        """Shifts path.N-1 .. path.1 up by one and starts a fresh log file."""
+        self.file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        """Writes out everything still queued and stops the writer thread."""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join()
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+MEMORY_LIMIT = 1024 * 1024  # Body bytes held in memory before an upload spills to a temporary file
+
+
+class BlobWriter:
+    """
+    Receives one upload body, hashing it as it arrives.
+
+    Bodies up to memory_limit bytes stay in memory, so an identical re-upload of
+    a small file never touches the disk. Larger bodies spill to a temporary file
+    in the store that is not synced; if the blob turns out to exist already, the
+    file is deleted, usually before the kernel has written any of it back.
+    """
+
+    def __init__(self, directory, memory_limit=MEMORY_LIMIT):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.buffer = bytearray()
+        self.file = None
+        self.temp_path = None
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self.buffer += data
+        if len(self.buffer) > self.memory_limit:
+            self.spill()
+
+    def spill(self):
+        """Moves the buffered bytes into a temporary file that receives the rest."""
+        fd, self.temp_path = tempfile.mkstemp(dir=self.directory, prefix=".upload-")
+        self.file = open(fd, 'wb')
+        self.file.write(self.buffer)
+        self.buffer = None
+
+    def discard(self):
+        """Drops the received body."""
+        self.buffer = None
+        if self.file is not None:
+            self.file.close()
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Every distinct body is stored once, as "<root>/<2 hex digits>/<sha256>", and
+    uploaded paths are hard links to their blob. The file system is the index: a
+    digest is looked up by its file name, so the store survives restarts without
+    any state of its own, and GETs keep serving the uploaded paths as ordinary
+    files. Uploading the same bytes again skips the write and fsync of the body;
+    uploading them to the path that already holds them changes nothing at all,
+    so the file keeps its ETag.
+
+    Hard links only work within one file system, so the store must live on the
+    same one as the served files.
+    """
+
+    def __init__(self, root=".blobs", memory_limit=MEMORY_LIMIT):
+        """
+        Creates the store directory if needed.
+
+        Attributes:
+            root (str): Directory holding the blobs.
+            memory_limit (int): Body bytes kept in memory before spilling to disk.
+            stored (int): New blobs written.
+            deduplicated (int): Uploads whose body was already stored.
+            bytes_written (int): Body bytes written to new blobs.
+            bytes_saved (int): Body bytes not written because they were already stored.
+            collected (int): Unreferenced blobs removed by collect().
+        """
+        self.root = root
+        self.memory_limit = memory_limit
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+        self.collected = 0
+
+    def owns(self, path):
+        """Returns True if path lies inside the store, where uploads must not go."""
+        root = os.path.realpath(self.root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def writer(self):
+        """Returns a BlobWriter for a new upload body."""
+        return BlobWriter(self.root, self.memory_limit)
+
+    def commit(self, writer, path, durability, done=None):
+        """
+        Stores a completely received body and makes path refer to it.
+
+        Args:
+            writer (BlobWriter): The received body.
+            path (str): Destination of the upload.
+            durability (Durability): Syncs a new blob before it is renamed into the
+                store, then the directories that gained entries.
+            done (callable): Acknowledgement passed on to durability.commit().
+
+        The destination is replaced atomically with a hard link to the blob,
+        unless it already is one. An existing blob gets its modification time
+        bumped when it is linked anew, since every path linking to it shares it:
+        otherwise the new path's Last-Modified could go back to the blob's
+        original upload and If-Modified-Since would wrongly answer 304.
+        """
+        blob = self.blob_path(writer.hash.hexdigest())
+        try:
+            blob_st = os.stat(blob)
+        except FileNotFoundError:
+            blob_st = None
+        new = blob_st is None or blob_st.st_size != writer.size
+        linked = False
+        if new:
+            if writer.file is None:
+                writer.spill()  # Only now does a small new body reach the disk
+            directories = [os.path.dirname(blob)]
+            if not os.path.isdir(directories[0]):
+                os.makedirs(directories[0], exist_ok=True)
+                directories.append(self.root)
+            directories.append(os.path.dirname(path))
+        else:
+            writer.discard()
+            try:
+                linked = os.path.samestat(os.stat(path), blob_st)
+            except OSError:
+                pass
+            directories = [] if linked else [os.path.dirname(path)]
+        with self.lock:
+            if new:
+                self.stored += 1
+                self.bytes_written += writer.size
+            else:
+                self.deduplicated += 1
+                self.bytes_saved += writer.size
+
+        def publish():
+            if new:
+                os.chmod(writer.temp_path, 0o644)
+                os.replace(writer.temp_path, blob)
+            if linked:
+                return
+            # Link under a temporary name first so readers never see the path missing
+            link = os.path.join(os.path.dirname(path) or ".",
+                                f".link-{os.getpid()}-{threading.get_ident()}-{os.path.basename(blob)[:16]}")
+            try:
+                os.remove(link)
+            except FileNotFoundError:
+                pass
+            os.link(blob, link)
+            os.replace(link, path)
+            if not new:
+                os.utime(path)
+
+        durability.commit(writer.file if new else None, publish, directories, done)
+
+    def collect(self):
+        """
+        Removes blobs no uploaded path links to any more, and leftover temporary files.
+
+        Must only run while no uploads are in progress, since a blob is briefly
+        unreferenced between being stored and linked.
+
+        Returns:
+            int: Files removed.
+        """
+        removed = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if name.startswith(".upload-") or os.stat(path).st_nlink == 1:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        with self.lock:
+            self.collected += removed
+        return removed
+
+    def stats(self):
+        """
+        Returns a snapshot of the store's counters.
+
+        Returns:
+            dict: New blobs stored, deduplicated uploads, body bytes written and
+            saved, and unreferenced blobs collected.
+        """
+        with self.lock:
+            return {
+                "blobs_stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "bytes_written": self.bytes_written,
+                "bytes_saved": self.bytes_saved,
+                "blobs_collected": self.collected,
+            }
@@ -0,0 +1,166 @@
+import gzip
+import threading
+import time
+import zlib
+
+from response_cache import ResponseCache
+
+STREAM_READ_SIZE = 256 * 1024  # File bytes read per step when compressing as a stream
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
+SUPPORTED_ENCODINGS = ("gzip", "deflate")  # In order of preference
+
+
+def is_compressible(content_type):
+    """Returns True for MIME types that usually shrink when compressed."""
+    if content_type is None:
+        return False
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding):
+    """
+    Picks a content coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The header value, e.g. "gzip;q=1.0, deflate".
+
+    Returns:
+        str: "gzip" or "deflate", or None if the client accepts neither.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    def weight(coding):
+        return weights.get(coding, weights.get("*", 0.0))
+
+    best = max(SUPPORTED_ENCODINGS, key=weight)  # Ties go to the preferred coding
+    return best if weight(best) > 0 else None
+
+
+class Compressor:
+    """
+    Compresses responses for clients that accept gzip or deflate.
+
+    Serialized compressed responses are kept in their own ResponseCache keyed by
+    (path, encoding), so each file version is compressed once and later requests
+    are served from memory. Counters record the CPU spent compressing and the
+    bytes saved on the wire.
+    """
+
+    def __init__(self, min_size=1024, max_size=8 * 1024 * 1024, level=6,
+                 cache_size=32 * 1024 * 1024):
+        """
+        Attributes:
+            min_size (int): Smallest file worth compressing.
+            max_size (int): Largest file compressed on the fly; bigger files are sent
+                as they are unless a precompressed .gz sibling exists.
+            level (int): zlib compression level.
+            cache (ResponseCache): Compressed responses keyed by (path, encoding).
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.level = level
+        self.cache = ResponseCache(cache_size, max_size)
+        self.lock = threading.Lock()
+        self.compressions = 0
+        self.cpu_seconds = 0.0
+        self.responses = 0
+        self.bytes_original = 0
+        self.bytes_sent = 0
+
+    def wants(self, size, content_type):
+        """Returns True if a file of this size and type should be compressed."""
+        return size >= self.min_size and is_compressible(content_type)
+
+    def compress(self, data, encoding):
+        """Compresses a body with the given coding and records the CPU time spent."""
+        start = time.process_time()
+        if encoding == "gzip":
+            compressed = gzip.compress(data, self.level, mtime=0)
+        else:
+            compressed = zlib.compress(data, self.level)
+        elapsed = time.process_time() - start
+        with self.lock:
+            self.compressions += 1
+            self.cpu_seconds += elapsed
+        return compressed
+
+    def stream(self, path, encoding):
+        """
+        Compresses a file piece by piece as it is read.
+
+        Args:
+            path (str): File to compress.
+            encoding (str): "gzip" or "deflate".
+
+        Yields:
+            bytes: Compressed output, some pieces possibly empty; the output equals
+            what compress() returns for the whole file.
+
+        The CPU time and sizes are recorded once the file has been compressed
+        completely; an abandoned stream is not counted.
+        """
+        # wbits 31 writes a gzip container, 15 the zlib container compress() uses
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+        original = sent = 0
+        cpu = 0.0
+        with open(path, 'rb') as file:
+            while True:
+                data = file.read(STREAM_READ_SIZE)
+                start = time.process_time()
+                piece = compressor.compress(data) if data else compressor.flush()
+                cpu += time.process_time() - start
+                original += len(data)
+                sent += len(piece)
+                yield piece
+                if not data:
+                    break
+        with self.lock:
+            self.compressions += 1
+            self.cpu_seconds += cpu
+        self.record(original, sent)
+
+    def record(self, original_size, sent_size):
+        """Records one compressed response for the bytes-saved statistics."""
+        with self.lock:
+            self.responses += 1
+            self.bytes_original += original_size
+            self.bytes_sent += sent_size
+
+    def invalidate(self, path):
+        """Drops every cached compressed variant of a path."""
+        for encoding in SUPPORTED_ENCODINGS:
+            self.cache.invalidate((path, encoding))
+
+    def stats(self):
+        """
+        Returns a snapshot of the compression counters.
+
+        Returns:
+            dict: Compressed responses sent, original and on-wire body bytes, bytes
+            saved, number of compressions performed and their CPU time in seconds.
+        """
+        with self.lock:
+            return {
+                "responses": self.responses,
+                "bytes_original": self.bytes_original,
+                "bytes_sent": self.bytes_sent,
+                "bytes_saved": self.bytes_original - self.bytes_sent,
+                "compressions": self.compressions,
+                "cpu_seconds": self.cpu_seconds,
+            }
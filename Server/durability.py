@@ -0,0 +1,222 @@
+import os
+import queue
+import threading
+import time
+
+DURABILITY_MODES = ("fsync-per-request", "group-commit", "none")
+
+
+def fsync_directory(path):
+    """
+    Syncs a directory, making the creation, rename or removal of its entries durable.
+
+    Syncing a file only persists its data; until its directory is synced too, a
+    crash can still lose the name it was just renamed to.
+    """
+    if os.name == "nt":
+        return  # Directories can't be opened for syncing on Windows
+    fd = os.open(path or ".", os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Commit:
+    """One upload waiting for the group-commit syncer."""
+
+    __slots__ = ("file", "publish", "directories", "done", "error")
+
+    def __init__(self, file, publish, directories, done):
+        self.file = file
+        self.publish = publish
+        self.directories = directories
+        self.done = done
+        self.error = None
+
+
+class Durability:
+    """
+    Makes completed uploads durable according to the selected mode.
+
+    A commit has three steps: the file's data is synced, publish() makes it visible
+    under its final name (a rename or link), and the directories whose entries
+    changed are synced.
+
+    - "fsync-per-request" runs all three on the caller's thread for every upload.
+    - "group-commit" hands uploads to one syncer thread. While it syncs one batch,
+      newly completed uploads queue up and are synced together in the next, each
+      directory once per batch, and then acknowledged together. An idle syncer
+      starts right away, so a lone upload waits no longer than with per-request
+      syncing; window adds a fixed wait to gather bigger batches.
+    - "none" only publishes; data reaches the disk whenever the kernel writes it back.
+    """
+
+    def __init__(self, mode="fsync-per-request", window=0.0, max_batch=256):
+        """
+        Attributes:
+            mode (str): One of DURABILITY_MODES.
+            window (float): Seconds the group-commit syncer waits for more uploads
+                after the first of a batch.
+            max_batch (int): Most uploads synced in one group commit.
+            batches (int): Commits performed; a group commit counts once.
+            files (int): Files synced.
+            directories (int): Directory syncs performed.
+            sync_seconds (float): Time spent syncing.
+            largest_batch (int): Most uploads acknowledged by one group commit.
+        """
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.mode = mode
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.files = 0
+        self.directories = 0
+        self.sync_seconds = 0.0
+        self.largest_batch = 0
+
+    def start(self):
+        """Starts the group-commit syncer; threads don't survive a prefork."""
+        if self.mode == "group-commit":
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    @property
+    def asynchronous(self):
+        """True if commit() can acknowledge through a callback instead of blocking."""
+        return self.thread is not None
+
+    def commit(self, file, publish, directories, done=None):
+        """
+        Makes an upload durable and visible.
+
+        Args:
+            file (file): Open file holding the data, closed once it is synced; None
+                if no new data was written.
+            publish (callable): Makes the synced data visible under its final name.
+            directories (list): Directories whose entries publish() changes.
+            done (callable): With group commit, called from the syncer thread with
+                None or the exception once the upload is durable, and commit()
+                returns right away. Without it commit() blocks until then and
+                raises any error.
+        """
+        if self.mode == "group-commit" and self.thread is not None:
+            if done is not None:
+                self.pending.put(_Commit(file, publish, directories, done))
+                return
+            finished = threading.Event()
+            result = []
+
+            def wake(error):
+                result.append(error)
+                finished.set()
+
+            self.pending.put(_Commit(file, publish, directories, wake))
+            finished.wait()
+            if result[0] is not None:
+                raise result[0]
+            return
+        try:
+            self._sync([_Commit(file, publish, directories, None)], sync=self.mode != "none")
+        except BaseException as e:
+            if done is None:
+                raise
+            done(e)
+            return
+        if done is not None:
+            done(None)
+
+    def _run(self):
+        """Syncs queued uploads in batches for the lifetime of the server."""
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    if timeout > 0:
+                        batch.append(self.pending.get(timeout=timeout))
+                    else:
+                        batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._sync(batch, sync=True)
+            except Exception as e:
+                for item in batch:
+                    item.error = item.error or e
+            for item in batch:
+                try:
+                    item.done(item.error)
+                except Exception:
+                    pass  # A failing acknowledgement must not stop the syncer
+
+    def _sync(self, batch, sync):
+        """
+        Commits a batch: syncs every file, publishes them, then syncs each directory once.
+
+        Errors are recorded on the upload they belong to, which is then left out of
+        the later steps; with a single upload the error is raised instead.
+        """
+        started = time.perf_counter()
+        files = 0
+        for item in batch:
+            if item.file is None:
+                continue
+            try:
+                item.file.flush()
+                if sync:
+                    os.fsync(item.file.fileno())
+                    files += 1
+                item.file.close()
+            except OSError as e:
+                item.file.close()
+                item.error = e
+        directories = {}
+        for item in batch:
+            if item.error is not None:
+                continue
+            try:
+                item.publish()
+            except OSError as e:
+                item.error = e
+                continue
+            for directory in item.directories:
+                directories.setdefault(directory or ".", []).append(item)
+        if sync:
+            for directory, items in directories.items():
+                try:
+                    fsync_directory(directory)
+                except OSError as e:
+                    for item in items:
+                        item.error = item.error or e
+        if sync:
+            with self.lock:
+                self.batches += 1
+                self.files += files
+                self.directories += len(directories)
+                self.sync_seconds += time.perf_counter() - started
+                self.largest_batch = max(self.largest_batch, len(batch))
+        if len(batch) == 1 and batch[0].done is None and batch[0].error is not None:
+            raise batch[0].error
+
+    def stats(self):
+        """
+        Returns a snapshot of the syncing counters.
+
+        Returns:
+            dict: Commits (batches), files and directories synced, seconds spent
+            syncing and the largest group commit.
+        """
+        with self.lock:
+            return {
+                "batches": self.batches,
+                "files": self.files,
+                "directories": self.directories,
+                "sync_seconds": self.sync_seconds,
+                "largest_batch": self.largest_batch,
+            }
@@ -0,0 +1,326 @@
+MAX_HEAD_SIZE = 64 * 1024  # Largest request line plus headers accepted
+MAX_CHUNK_LINE = 1024  # Longest chunk-size line (with extensions) or trailer section accepted
+COMPACT_THRESHOLD = 64 * 1024  # Consumed bytes kept before the buffer is compacted
+HEX_DIGITS = b"0123456789abcdefABCDEF"  # The only characters of a chunk size
+
+
+class ParseError(ValueError):
+    """
+    Raised when the bytes received do not form a valid HTTP request.
+
+    Attributes:
+        status (int): Status code of the error response, 400 unless a more
+            specific one applies.
+        reason (str): Reason phrase of the error response.
+    """
+
+    def __init__(self, message, status=400, reason="Bad Request"):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when no range of a Range header overlaps the selected representation."""
+
+
+def parse_range(value, size):
+    """
+    Parses a single-range Range header (RFC 9110, section 14.2) against a size.
+
+    Args:
+        value (str): The Range header value, e.g. "bytes=0-499" or "bytes=-500".
+        size (int): Length of the representation in bytes.
+
+    Returns:
+        tuple: (first, last) byte positions, inclusive and clamped to the
+        representation, or None if the header must be ignored and the whole
+        representation sent: another unit, invalid syntax or several ranges.
+
+    Raises:
+        RangeNotSatisfiable: The range starts past the end of the representation,
+            or is an empty suffix.
+    """
+    unit, separator, spec = value.partition("=")
+    if not separator or unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    digits = first + last
+    if not separator or not (digits.isascii() and digits.isdigit()):  # int() rejects e.g. "\xb2"
+        return None
+    if not first:  # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable(value)
+        return max(0, size - suffix), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable(value)
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+class Request:
+    """The request line and headers of one parsed HTTP request."""
+
+    __slots__ = ("method", "path", "version", "headers", "content_length", "head_size")
+
+    def __init__(self, method, path, version, headers, content_length, head_size=0):
+        """
+        Attributes:
+            method (str): Request method, e.g. "GET".
+            path (str): Request target as sent by the client.
+            version (str): HTTP version from the request line.
+            headers (dict): Header values keyed by lower-cased header name.
+            content_length (int): Length of the request body in bytes, or None for a
+                chunked body until it has been received completely.
+            head_size (int): Size of the request line and headers in bytes.
+        """
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.content_length = content_length
+        self.head_size = head_size
+
+    @property
+    def keep_alive(self):
+        """True if the connection should stay open after this request."""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def chunked(self):
+        """True if the body is sent with Transfer-Encoding: chunked."""
+        return "transfer-encoding" in self.headers
+
+
+class RequestParser:
+    """
+    Incremental HTTP/1.1 request parser for one connection.
+
+    Received bytes are appended to a single bytearray with feed(); next_request()
+    returns each request as soon as its headers are complete, so several pipelined
+    requests arriving in one read are returned one after another. The parser tracks
+    how much of the current request's body is still outstanding and never mistakes
+    body bytes for the next request line. Bodies sent with Transfer-Encoding:
+    chunked are decoded by take(), so callers see only the data.
+    """
+
+    def __init__(self, max_head_size=MAX_HEAD_SIZE):
+        """
+        Attributes:
+            buffer (bytearray): Received bytes not yet compacted away.
+            pos (int): Offset of the first unconsumed byte in buffer.
+            body_remaining (int): Body bytes of the current request not yet consumed.
+            chunked (bool): The current request's body is chunked and its last chunk
+                has not been consumed yet.
+        """
+        self.max_head_size = max_head_size
+        self.buffer = bytearray()
+        self.pos = 0
+        self.scan = 0  # Where the search for the end of the headers resumes
+        self.body_remaining = 0
+        self.chunked = False
+        self.chunk_remaining = 0  # Data bytes left in the current chunk
+        self.chunk_crlf = False  # The CRLF closing the current chunk is still due
+
+    @property
+    def buffered(self):
+        """Number of received bytes not yet consumed."""
+        return len(self.buffer) - self.pos
+
+    @property
+    def body_pending(self):
+        """True while part of the current request's body has not been consumed."""
+        return self.chunked or self.body_remaining > 0
+
+    def feed(self, data):
+        """Appends bytes received from the connection."""
+        self.buffer += data
+
+    def next_request(self):
+        """
+        Parses the next request head from the buffer.
+
+        Returns:
+            Request: The next complete request, or None if more data is needed.
+
+        Any body bytes of the previous request that were not consumed are skipped
+        first. Raises ParseError for malformed or oversized request heads, and
+        for a POST whose body length is not given (status 411).
+        """
+        if self.chunked:
+            while self.chunked and self._take_chunked(COMPACT_THRESHOLD):
+                pass
+            if self.chunked:
+                self._compact()
+                return None
+        if self.body_remaining:
+            skip = min(self.body_remaining, self.buffered)
+            self.pos += skip
+            self.body_remaining -= skip
+            if self.body_remaining:
+                self._compact()
+                return None
+        end = self.buffer.find(b"\r\n\r\n", max(self.scan, self.pos))
+        if end == -1:
+            if self.buffered > self.max_head_size:
+                raise ParseError("Request headers too large")
+            # Resume the search where it stopped, allowing for a split terminator
+            self.scan = max(self.pos, len(self.buffer) - 3)
+            self._compact()
+            return None
+        if end - self.pos > self.max_head_size:
+            raise ParseError("Request headers too large")
+        request = self._parse_head(bytes(self.buffer[self.pos:end]))
+        request.head_size = end + 4 - self.pos
+        self.pos = end + 4
+        self.scan = self.pos
+        if request.chunked:
+            self.chunked = True
+            self.chunk_remaining = 0
+            self.chunk_crlf = False
+            self.body_remaining = 0
+            self._compact()
+            return request
+        if request.content_length is None:
+            if request.method == "POST":
+                # Where the body ends can't be known; guessing would truncate it
+                raise ParseError("POST without Content-Length or Transfer-Encoding",
+                                 411, "Length Required")
+            request.content_length = 0
+        self.body_remaining = request.content_length
+        self._compact()
+        return request
+
+    def take(self, limit):
+        """
+        Consumes buffered body bytes of the current request.
+
+        Args:
+            limit (int): Maximum number of bytes to return.
+
+        Returns:
+            bytes: Up to limit bytes of the body already in the buffer; for a
+            chunked body, the decoded data.
+        """
+        if self.chunked:
+            data = self._take_chunked(limit)
+            self._compact()
+            return data
+        count = min(limit, self.body_remaining, self.buffered)
+        if not count:
+            return b""
+        data = bytes(self.buffer[self.pos:self.pos + count])
+        self.pos += count
+        self.body_remaining -= count
+        self._compact()
+        return data
+
+    def _take_chunked(self, limit):
+        """
+        Decodes up to limit data bytes of a chunked body from the buffer.
+
+        Chunk-size lines, the CRLF after each chunk and the trailer section are
+        consumed along the way; chunked is cleared once the last chunk is read.
+        Raises ParseError for malformed framing.
+        """
+        pieces = []
+        taken = 0
+        while self.chunked and taken < limit:
+            if self.chunk_remaining:
+                count = min(limit - taken, self.chunk_remaining, self.buffered)
+                if not count:
+                    break
+                pieces.append(bytes(self.buffer[self.pos:self.pos + count]))
+                self.pos += count
+                self.chunk_remaining -= count
+                taken += count
+                continue
+            if self.chunk_crlf:
+                if self.buffered < 2:
+                    break
+                if self.buffer[self.pos:self.pos + 2] != b"\r\n":
+                    raise ParseError("Missing CRLF after chunk data")
+                self.pos += 2
+                self.chunk_crlf = False
+            end = self.buffer.find(b"\r\n", self.pos, self.pos + MAX_CHUNK_LINE)
+            if end == -1:
+                if self.buffered >= MAX_CHUNK_LINE:
+                    raise ParseError("Chunk size line too long")
+                break
+            # Whitespace may only precede chunk extensions (RFC 9112, section 7.1.1)
+            size_field = bytes(self.buffer[self.pos:end]).split(b";", 1)[0].rstrip(b" \t")
+            if not size_field or size_field.strip(HEX_DIGITS):  # int() allows "+a", "0x1", "1_0"
+                raise ParseError(f"Invalid chunk size: {size_field!r}")
+            size = int(size_field, 16)
+            if size == 0:
+                # The last chunk; the trailer section (usually empty) ends with a blank line
+                trailers_end = self.buffer.find(b"\r\n\r\n", end, end + MAX_CHUNK_LINE)
+                if trailers_end == -1:
+                    if len(self.buffer) - end >= MAX_CHUNK_LINE:
+                        raise ParseError("Chunked trailer section too large")
+                    break
+                self.pos = trailers_end + 4
+                self.scan = self.pos
+                self.chunked = False
+                break
+            self.pos = end + 2
+            self.chunk_remaining = size
+            self.chunk_crlf = True
+        return b"".join(pieces)
+
+    def consumed(self, count):
+        """Records body bytes the caller read directly from the socket."""
+        self.body_remaining -= count
+
+    def _compact(self):
+        """Drops consumed bytes once they make up a large part of the buffer."""
+        if self.pos == len(self.buffer):
+            self.buffer.clear()
+        elif self.pos < COMPACT_THRESHOLD and self.pos * 2 < len(self.buffer):
+            return
+        else:
+            del self.buffer[:self.pos]
+        self.scan = max(0, self.scan - self.pos)
+        self.pos = 0
+
+    @staticmethod
+    def _parse_head(head):
+        """Parses a request line and header block into a Request."""
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ParseError(f"Malformed request line: {lines[0]!r}")
+        method, path, version = parts
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if not separator or not name.strip():
+                raise ParseError(f"Malformed header line: {line!r}")
+            name = name.strip().lower()
+            value = value.strip()
+            if name in headers:
+                if name == "content-length":
+                    # Two framings of one body: a proxy might pick the other (RFC 9112, section 6.3)
+                    raise ParseError("Repeated Content-Length header")
+                if name == "transfer-encoding":
+                    value = f"{headers[name]}, {value}"  # Every coding must be checked
+            headers[name] = value
+        content_length = None
+        if "transfer-encoding" in headers:
+            # Only chunked is understood; Content-Length is then ignored (RFC 9112)
+            codings = [c.strip().lower() for c in headers["transfer-encoding"].split(",")]
+            if codings != ["chunked"]:
+                raise ParseError(f"Unsupported Transfer-Encoding: {headers['transfer-encoding']!r}")
+            headers.pop("content-length", None)
+        elif "content-length" in headers:
+            value = headers["content-length"]
+            if not (value.isascii() and value.isdigit()):  # int() allows "+5", "1_0", "\xb2"
+                raise ParseError(f"Invalid Content-Length: {value!r}")
+            content_length = int(value)
+        return Request(method, path, version, headers, content_length)
@@ -0,0 +1,319 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+PHASES = ("first_byte", "parse", "io", "send")
+SEND_METHODS = ("send", "sendall", "sendfile", "sendstream")
+SLOW_HISTORY = 50  # Slow requests kept for the control endpoint
+TRACEMALLOC_FRAMES = 10  # Stack depth recorded per allocation while tracemalloc runs
+TRACEMALLOC_TOP = 10  # Allocation sites listed per snapshot
+TRACEMALLOC_KEEP = 10  # Snapshot files kept per process; older ones are removed
+
+
+class RequestTrace:
+    """
+    Phase timings of one request, in seconds.
+
+    first_byte runs from accepting the connection to its first byte (first
+    request of a connection only), parse from the request's first byte to its
+    parsed head, io is the handler's own work (stat, open, read, compression,
+    storing an upload) and send the time spent handing the response to the socket.
+    """
+
+    __slots__ = ("method", "path", "started", "first_byte", "parse", "io", "send", "status",
+                 "profile")
+
+    def __init__(self, method, path, started, first_byte, parse):
+        self.method = method
+        self.path = path
+        self.started = started
+        self.first_byte = first_byte
+        self.parse = parse
+        self.io = 0.0
+        self.send = 0.0
+        self.status = None
+        self.profile = None  # cProfile.Profile while this request is being profiled
+
+
+class _TimedSocket:
+    """Wraps a client socket, adding the time spent in its send calls to a trace."""
+
+    __slots__ = ("sock", "trace")
+
+    def __init__(self, sock, trace):
+        self.sock = sock
+        self.trace = trace
+
+    def __getattr__(self, name):
+        attribute = getattr(self.sock, name)  # Missing methods stay missing, e.g. sendstream
+        if name not in SEND_METHODS:
+            return attribute
+        trace = self.trace
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                trace.send += time.perf_counter() - started
+
+        return timed
+
+
+class Profiler:
+    """
+    Opt-in request instrumentation, switched on and off while the server runs.
+
+    While nothing is switched on, active is False and the server doesn't create
+    traces at all, so the only cost on the request path is reading that flag.
+    When on:
+
+    - every request is traced through its phases (see RequestTrace), the totals
+      are exported as metrics and requests slower than slow_threshold are logged
+      with their breakdown;
+    - the next profile_remaining requests are run under cProfile, one at a time,
+      and the combined statistics are written to directory once they are done;
+    - every tracemalloc_interval seconds a tracemalloc snapshot is dumped to
+      directory, keeping the last max_snapshots, and the allocation sites that grew
+      the most are logged.
+    """
+
+    def __init__(self, directory=".", log=print, max_snapshots=TRACEMALLOC_KEEP):
+        """
+        Attributes:
+            directory (str): Where profiles and tracemalloc snapshots are written.
+            log (callable): Receives slow-request and profiler messages; the server
+                points it at its access log.
+            max_snapshots (int): Most recent tracemalloc snapshot files kept.
+            phases (bool): Trace every request even without a slow threshold.
+            slow_threshold (float): Seconds above which a request is logged, or None.
+            profile_remaining (int): Requests still to be captured by cProfile.
+            tracemalloc_interval (float): Seconds between snapshots; 0 disables them.
+            active (bool): Whether requests are traced at all.
+        """
+        self.directory = directory
+        self.log = log
+        self.max_snapshots = max_snapshots
+        self.phases = False
+        self.slow_threshold = None
+        self.profile_remaining = 0
+        self.tracemalloc_interval = 0.0
+        self.active = False
+        self.lock = threading.Lock()
+        self.profile_lock = threading.Lock()  # cProfile can only follow one request at a time
+        self.profile_stats = None
+        self.profiled = 0
+        self.traced = 0
+        self.slow = 0
+        self.phase_totals = dict.fromkeys(PHASES, 0.0)
+        self.slow_requests = deque(maxlen=SLOW_HISTORY)
+        self.sampler = None
+        self.sampler_wakeup = threading.Event()
+        self.serving = False
+
+    def configure(self, phases=None, slow_ms=None, profile_requests=None, tracemalloc_interval=None):
+        """
+        Changes what is instrumented; arguments left as None keep their setting.
+
+        Args:
+            phases (bool): Trace every request.
+            slow_ms (float): Slow-request threshold in milliseconds; negative disables it.
+            profile_requests (int): Run the next N requests under cProfile; 0 cancels.
+            tracemalloc_interval (float): Seconds between snapshots; 0 stops tracemalloc.
+        """
+        with self.lock:
+            if phases is not None:
+                self.phases = phases
+            if slow_ms is not None:
+                self.slow_threshold = slow_ms / 1000 if slow_ms >= 0 else None
+            if profile_requests is not None:
+                self.profile_remaining = max(0, profile_requests)
+            if tracemalloc_interval is not None:
+                self.tracemalloc_interval = max(0.0, tracemalloc_interval)
+            self.active = (self.phases or self.slow_threshold is not None
+                           or self.profile_remaining > 0)
+        if tracemalloc_interval is not None and self.serving:
+            self._start_sampler()
+
+    def start(self):
+        """Starts the tracemalloc sampler if configured; threads don't survive a prefork."""
+        self.serving = True
+        self._start_sampler()
+
+    def begin(self, method, path, started, first_byte=None):
+        """
+        Starts tracing a request whose head has just been parsed.
+
+        Args:
+            method (str): Request method.
+            path (str): Request target.
+            started (float): perf_counter() when the request's first byte arrived,
+                or None if it was already buffered.
+            first_byte (float): Seconds from accept to the connection's first byte,
+                for the first request of a connection.
+
+        Returns:
+            RequestTrace: The trace to pass to finish().
+        """
+        now = time.perf_counter()
+        trace = RequestTrace(method, path, now if started is None else started, first_byte,
+                             0.0 if started is None else now - started)
+        if self.profile_remaining > 0 and self.profile_lock.acquire(blocking=False):
+            trace.profile = cProfile.Profile()
+            trace.profile.enable()
+        return trace
+
+    def wrap(self, sock, trace):
+        """Returns sock with its send calls timed into trace."""
+        return _TimedSocket(sock, trace)
+
+    def finish(self, trace, io_end=None):
+        """
+        Completes a trace: records its phases and logs it if it was slow.
+
+        Args:
+            trace (RequestTrace): The request's trace.
+            io_end (float): perf_counter() when the handler returned; the time
+                since the head was parsed, minus trace.send, becomes trace.io.
+                None if trace.io was measured by the caller.
+        """
+        now = time.perf_counter()
+        if trace.profile is not None:
+            self._end_profile(trace.profile)
+            trace.profile = None
+        parsed = trace.started + trace.parse
+        if io_end is not None:
+            trace.io = max(0.0, io_end - parsed - trace.send)
+        total = (trace.first_byte or 0.0) + (now - trace.started)
+        with self.lock:
+            self.traced += 1
+            if trace.first_byte is not None:
+                self.phase_totals["first_byte"] += trace.first_byte
+            self.phase_totals["parse"] += trace.parse
+            self.phase_totals["io"] += trace.io
+            self.phase_totals["send"] += trace.send
+            slow = self.slow_threshold is not None and total >= self.slow_threshold
+            if slow:
+                self.slow += 1
+                entry = {
+                    "time": time.time(),
+                    "method": trace.method,
+                    "path": trace.path,
+                    "status": trace.status,
+                    "total_ms": round(total * 1000, 3),
+                }
+                for phase in PHASES:
+                    value = getattr(trace, phase)
+                    entry[f"{phase}_ms"] = None if value is None else round(value * 1000, 3)
+                self.slow_requests.append(entry)
+        if slow:
+            phases = " ".join(f"{phase}={entry[phase + '_ms']}ms" for phase in PHASES
+                              if entry[phase + "_ms"] is not None)
+            self.log(f"Slow request: {trace.method} {trace.path} {trace.status} took "
+                     f"{entry['total_ms']:.1f}ms ({phases})")
+
+    def _end_profile(self, profile):
+        """Adds a finished request's profile to the capture, writing it out after the last one."""
+        profile.disable()
+        with self.lock:
+            if self.profile_stats is None:
+                self.profile_stats = pstats.Stats(profile)
+            else:
+                self.profile_stats.add(profile)
+            self.profiled += 1
+            self.profile_remaining -= 1
+            done = self.profile_remaining <= 0
+            if done:
+                stats, count = self.profile_stats, self.profiled
+                self.profile_stats = None
+                self.profiled = 0
+                self.profile_remaining = 0
+                self.active = self.phases or self.slow_threshold is not None
+        self.profile_lock.release()
+        if done:
+            # Off the request's thread (or the event loop): dumping and sorting take a while
+            threading.Thread(target=self._write_profile, args=(stats, count), daemon=True).start()
+
+    def _write_profile(self, stats, count):
+        """Writes a capture as a .pstats file and a text report sorted by cumulative time."""
+        base = os.path.join(self.directory, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}")
+        stats.dump_stats(base + ".pstats")
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w") as file:
+            file.write(report.getvalue())
+        self.log(f"Profile of {count} requests written to {base}.pstats and {base}.txt")
+
+    def _start_sampler(self):
+        with self.lock:
+            if self.tracemalloc_interval > 0 and self.sampler is None:
+                self.sampler_wakeup.clear()
+                self.sampler = threading.Thread(target=self._sample_memory, daemon=True)
+                self.sampler.start()
+            else:
+                self.sampler_wakeup.set()  # Apply the new interval, or stop
+
+    def _sample_memory(self):
+        """Takes tracemalloc snapshots every tracemalloc_interval seconds until disabled."""
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        previous = None
+        count = 0
+        written = deque()
+        try:
+            while True:
+                self.sampler_wakeup.wait(self.tracemalloc_interval)
+                self.sampler_wakeup.clear()
+                with self.lock:
+                    if self.tracemalloc_interval <= 0:
+                        self.sampler = None
+                        return
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    [tracemalloc.Filter(False, tracemalloc.__file__)])
+                count += 1
+                path = os.path.join(self.directory, f"tracemalloc-{os.getpid()}-{count}.snapshot")
+                snapshot.dump(path)
+                written.append(path)
+                while len(written) > self.max_snapshots:
+                    try:
+                        os.remove(written.popleft())
+                    except OSError:
+                        pass  # Already removed or moved away by the operator
+                current, peak = tracemalloc.get_traced_memory()
+                lines = [f"Memory: {current / (1024 * 1024):.1f}MB traced, peak "
+                         f"{peak / (1024 * 1024):.1f}MB, snapshot {path}"]
+                if previous is not None:
+                    top = snapshot.compare_to(previous, "lineno")[:TRACEMALLOC_TOP]
+                else:
+                    top = snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+                lines += [f"  {stat}" for stat in top]
+                for line in lines:
+                    self.log(line)
+                previous = snapshot
+        finally:
+            tracemalloc.stop()
+
+    def status(self):
+        """
+        Returns the current settings and counters, as served by the control endpoint.
+
+        Returns:
+            dict: Settings, requests traced, slow and being profiled, total seconds
+            per phase and the most recent slow requests.
+        """
+        with self.lock:
+            return {
+                "phases": self.phases,
+                "slow_ms": None if self.slow_threshold is None else self.slow_threshold * 1000,
+                "profile_remaining": self.profile_remaining,
+                "tracemalloc_interval": self.tracemalloc_interval,
+                "traced": self.traced,
+                "slow": self.slow,
+                "phase_seconds": dict(self.phase_totals),
+                "slow_requests": list(self.slow_requests),
+            }
@@ -0,0 +1,190 @@
+import heapq
+import threading
+import time
+
+
+class _Entry:
+    """What the reaper knows about one connection."""
+
+    __slots__ = ("seq", "created", "last_active", "requests", "in_request", "busy", "retire")
+
+    def __init__(self, seq, now):
+        self.seq = seq
+        self.created = now
+        self.last_active = now
+        self.requests = 0
+        self.in_request = False
+        self.busy = False  # In a request whose transfer doesn't report activity
+        self.retire = False  # Past max_age mid-request; close once the request is done
+
+
+class ConnectionReaper:
+    """
+    Tracks the last activity of every connection and decides which to close.
+
+    Connections sit in two heaps, one ordered by last activity and one by creation
+    time. Recording activity only updates the connection's entry; a heap item is
+    refreshed lazily when it reaches the top, so touch() is O(1) and sweep() only
+    looks at connections that might actually have expired. Because every
+    connection shares the same idle timeout at any moment, ordering by last
+    activity is ordering by idle deadline, even as the timeout tightens with load.
+
+    Keys are any hashable connection handle; the caller closes what sweep() returns.
+    """
+
+    def __init__(self, max_idle_timeout=20.0, min_idle_timeout=5.0, busy_connections=15,
+                 max_requests=0, max_age=0.0):
+        """
+        Attributes:
+            max_idle_timeout (float): Idle timeout in seconds when no other connections are open.
+            min_idle_timeout (float): Idle timeout once busy_connections are open.
+            busy_connections (int): Open connections at which the idle timeout has
+                shrunk linearly down to min_idle_timeout.
+            max_requests (int): Requests served on a connection before it is closed;
+                0 for no limit.
+            max_age (float): Seconds a connection may stay open; 0 for no limit.
+            reaped_idle (int): Connections closed for being idle too long.
+            reaped_age (int): Connections closed for exceeding max_age.
+            closed_max_requests (int): Connections closed after max_requests.
+        """
+        self.max_idle_timeout = max_idle_timeout
+        self.min_idle_timeout = min_idle_timeout
+        self.busy_connections = busy_connections
+        self.max_requests = max_requests
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.idle_heap = []  # (last_active when pushed, seq, key)
+        self.age_heap = []  # (created, seq, key)
+        self.seq = 0
+        self.reaped_idle = 0
+        self.reaped_age = 0
+        self.closed_max_requests = 0
+
+    def idle_timeout(self):
+        """Returns the idle timeout in seconds for the number of connections open now."""
+        load = min(1.0, len(self.entries) / self.busy_connections) if self.busy_connections > 0 else 1.0
+        return self.max_idle_timeout - (self.max_idle_timeout - self.min_idle_timeout) * load
+
+    def register(self, key):
+        """Starts tracking a newly accepted connection."""
+        now = time.monotonic()
+        with self.lock:
+            self.seq += 1
+            self.entries[key] = _Entry(self.seq, now)
+            heapq.heappush(self.idle_heap, (now, self.seq, key))
+            if self.max_age > 0:
+                heapq.heappush(self.age_heap, (now, self.seq, key))
+
+    def unregister(self, key):
+        """Stops tracking a closed connection; its heap items are dropped when they surface."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def touch(self, key):
+        """Records activity on a connection."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.last_active = time.monotonic()
+
+    def request_started(self, key, busy=False):
+        """
+        Records the start of a request.
+
+        Args:
+            key: The connection.
+            busy (bool): Exclude the connection from idle reaping until
+                request_finished(), for engines that don't report activity while a
+                body is being transferred.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry.requests += 1
+            entry.in_request = True
+            entry.busy = busy
+            entry.last_active = time.monotonic()
+
+    def request_finished(self, key):
+        """
+        Records the end of a request.
+
+        Returns:
+            bool: True if the connection has served max_requests or outlived
+            max_age and must be closed now instead of waiting for another request.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False
+            entry.in_request = False
+            entry.busy = False
+            entry.last_active = now
+            if self.max_requests and entry.requests >= self.max_requests:
+                self.closed_max_requests += 1
+            elif entry.retire or (self.max_age > 0 and now - entry.created >= self.max_age):
+                self.reaped_age += 1
+            else:
+                return False
+            del self.entries[key]
+            return True
+
+    def sweep(self):
+        """
+        Finds connections to close: idle past the current idle timeout, or between
+        requests and older than max_age. Returned connections are no longer tracked.
+
+        Returns:
+            list: (key, reason) pairs, reason being "idle" or "age".
+        """
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            deadline = now - self.idle_timeout()
+            heap = self.idle_heap
+            while heap and heap[0][0] <= deadline:
+                stamp, seq, key = heapq.heappop(heap)
+                entry = self.entries.get(key)
+                if entry is None or entry.seq != seq:
+                    continue  # Already closed
+                if entry.busy or entry.last_active > stamp:
+                    # Active since this item was pushed; requeue at its real position
+                    heapq.heappush(heap, (now if entry.busy else entry.last_active, seq, key))
+                    continue
+                del self.entries[key]
+                self.reaped_idle += 1
+                expired.append((key, "idle"))
+            if self.max_age > 0:
+                heap = self.age_heap
+                deadline = now - self.max_age
+                while heap and heap[0][0] <= deadline:
+                    _, seq, key = heapq.heappop(heap)
+                    entry = self.entries.get(key)
+                    if entry is None or entry.seq != seq:
+                        continue
+                    if entry.in_request:
+                        entry.retire = True  # request_finished() closes it
+                        continue
+                    del self.entries[key]
+                    self.reaped_age += 1
+                    expired.append((key, "age"))
+        return expired
+
+    def stats(self):
+        """
+        Returns a snapshot of the reaper's counters.
+
+        Returns:
+            dict: Tracked connections, the current idle timeout in seconds, and the
+            connections closed for idleness, age and the request limit.
+        """
+        with self.lock:
+            return {
+                "tracked": len(self.entries),
+                "idle_timeout_seconds": self.idle_timeout(),
+                "reaped_idle": self.reaped_idle,
+                "reaped_age": self.reaped_age,
+                "closed_max_requests": self.closed_max_requests,
+            }
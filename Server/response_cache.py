@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache of fully serialized GET responses for small files.
+
+    Each entry holds the header and body bytes ready to be sent, together with
+    the file's modification time and size when it was read. A lookup whose
+    stat() no longer matches drops the entry, so edits made behind the server's
+    back are never served stale.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_object_size=1024 * 1024):
+        """
+        Initializes an empty cache.
+
+        Attributes:
+            max_bytes (int): Total budget for cached responses, headers included.
+            max_object_size (int): Largest file body that will be cached.
+            hits (int): Lookups answered from the cache.
+            misses (int): Lookups that had to go to disk.
+            evictions (int): Entries dropped to stay within max_bytes.
+            invalidations (int): Entries dropped because the file changed.
+        """
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.entries = OrderedDict()  # path -> (mtime_ns, size, response)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def cacheable(self, size):
+        """Returns True if a file body of this size may be cached."""
+        return size <= self.max_object_size
+
+    def get(self, path, stat):
+        """
+        Looks up the cached response for a path.
+
+        Args:
+            path (str): Normalized request path.
+            stat (os.stat_result): Current metadata of the file on disk.
+
+        Returns:
+            bytes: The serialized response, or None on a miss or a stale entry.
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                mtime_ns, size, response = entry
+                if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                    self.entries.move_to_end(path)
+                    self.hits += 1
+                    return response
+                self._remove(path)
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def put(self, path, stat, response):
+        """
+        Stores a serialized response, evicting least recently used entries as needed.
+
+        Args:
+            path (str): Normalized request path.
+            stat (os.stat_result): Metadata of the file the response was built from.
+            response (bytes): Headers and body exactly as sent to the client.
+        """
+        if len(response) > self.max_bytes:
+            return
+        with self.lock:
+            if path in self.entries:
+                self._remove(path)
+            self.entries[path] = (stat.st_mtime_ns, stat.st_size, response)
+            self.size += len(response)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, path):
+        """Drops the entry for a path, e.g. after it has been overwritten by a POST."""
+        with self.lock:
+            if path in self.entries:
+                self._remove(path)
+                self.invalidations += 1
+
+    def _remove(self, path):
+        _, _, response = self.entries.pop(path)
+        self.size -= len(response)
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters.
+
+        Returns:
+            dict: Entry count, bytes used, hits, misses, evictions and invalidations.
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -1,14 +1,304 @@
+import argparse
+import email.utils
+import errno
+import html
+import json
 import mimetypes
+import selectors
+import signal
 import socket
+import ssl
 import sys
+import tempfile
 import threading
 import os
+import queue
 import time
+from collections import deque
+from stat import S_ISDIR, S_ISREG
+from urllib.parse import parse_qs, quote
+
+from access_log import AccessLog
+from blob_store import BlobStore
+from compression import SUPPORTED_ENCODINGS, Compressor, negotiate
+from durability import DURABILITY_MODES, Durability
+from http_parser import ParseError, RangeNotSatisfiable, RequestParser, parse_range
+from metrics import Metrics
+from profiling import PHASES, Profiler
+from reaper import ConnectionReaper
+from response_cache import ResponseCache
+from tls import close_notify, create_server_context, session_stats
+
+SERVER_MODES = ("threaded", "pool", "selectors")
+METRICS_PATH = "__metrics"  # Reserved GET path serving the metrics exposition
+PROFILE_PATH = "__profile"  # Reserved GET path controlling the profiler, when enabled
+FILE_CHUNK_SIZE = 256 * 1024  # Read size when os.sendfile is unavailable
+BODY_CHUNK_SIZE = 256 * 1024  # recv_into size while streaming request bodies
+REAP_INTERVAL = 0.5  # Seconds between idle/age sweeps
+STALL_TIMEOUT = 60  # Seconds a blocking send or recv may make no progress mid-request
+LISTING_PIECE_SIZE = 16 * 1024  # Directory listing bytes sent per chunk
+LAST_CHUNK = b"0\r\n\r\n"  # Ends a chunked body, without trailers
+# Errors meaning a non-blocking socket can't make progress now; TLS sockets raise
+# the SSLWant* errors, also when a write needs to read a record first
+OUTPUT_HIGH_WATER = 1024 * 1024  # Queued response bytes at which a connection stops reading requests
+OUTPUT_LOW_WATER = 256 * 1024  # Queued response bytes below which it reads requests again
+OUTPUT_MAX_CHUNKS = 64  # Queued response pieces (a file holds a descriptor) that pause it too
+ACCEPT_BACKOFF = 0.1  # Seconds accepting pauses after running out of descriptors or buffers
+# accept() failures that leave the listening socket usable; the rest are fatal
+ACCEPT_ERRORS = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM, errno.ECONNABORTED,
+                 errno.EPROTO, errno.EPERM)
+WOULD_BLOCK = (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError)
+
+
+def _chunked(pieces):
+    """Frames each non-empty byte string as one chunk and ends with the last chunk."""
+    for piece in pieces:
+        if piece:
+            yield b"%x\r\n%b\r\n" % (len(piece), piece)
+    yield LAST_CHUNK
+
+
+class _FileChunk:
+    """A byte range of an open file queued for sending by the event loop."""
+
+    __slots__ = ("fd", "offset", "remaining")
+
+    def __init__(self, fd, offset, count):
+        self.fd = fd
+        self.offset = offset
+        self.remaining = count
+
+    def send(self, sock):
+        """Sends part of the range without blocking and returns the bytes sent."""
+        # TLS has to encrypt in user space, so sendfile() can't bypass it
+        if hasattr(os, "sendfile") and not isinstance(sock, ssl.SSLSocket):
+            sent = os.sendfile(sock.fileno(), self.fd, self.offset, self.remaining)
+        else:
+            data = os.pread(self.fd, min(self.remaining, FILE_CHUNK_SIZE), self.offset)
+            sent = sock.send(data) if data else 0
+        if not sent:
+            raise OSError("File ended before its advertised length was sent")
+        self.offset += sent
+        self.remaining -= sent
+        return sent
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Stream:
+    """A body of unknown length queued for the event loop as an iterator of byte strings."""
+
+    __slots__ = ("pieces",)
+
+    def __init__(self, pieces):
+        self.pieces = iter(pieces)
+
+    def next(self):
+        """Produces the next piece, or None once the body is complete."""
+        return next(self.pieces, None)
+
+    def close(self):
+        close = getattr(self.pieces, "close", None)
+        if close is not None:
+            close()
+
+
+class _BufferedWriter:
+    """
+    Socket stand-in handed to the request handlers in event-loop mode.
+
+    Handlers call send() exactly as they would on a blocking socket; the data is
+    queued here and drained by the event loop whenever the real socket is writable.
+    """
+
+    def __init__(self):
+        self.chunks = deque()
+        self.pending = 0
+
+    def send(self, data):
+        if data:
+            self.chunks.append(memoryview(data))
+            self.pending += len(data)
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def sendfile(self, file, offset=0, count=None):
+        """
+        Queues a byte range of a file to be streamed with os.sendfile.
+
+        Mirrors socket.sendfile(); the file descriptor is duplicated so the caller
+        can close the file as soon as this returns.
+        """
+        if count is None:
+            count = os.fstat(file.fileno()).st_size - offset
+        if count > 0:
+            self.chunks.append(_FileChunk(os.dup(file.fileno()), offset, count))
+            self.pending += count
+        return count
+
+    def sendstream(self, pieces):
+        """
+        Queues a body produced piece by piece.
+
+        Each piece is pulled only once the previous one has been written, so a
+        large generated body never sits in memory as a whole.
+        """
+        self.chunks.append(_Stream(pieces))
+
+    def close(self):
+        """Releases any file descriptors and streams still queued."""
+        for chunk in self.chunks:
+            if isinstance(chunk, (_FileChunk, _Stream)):
+                chunk.close()
+        self.chunks.clear()
+        self.pending = 0
+
+    def flush(self, sock):
+        """
+        Writes as much queued data as the socket accepts without blocking.
+
+        Returns:
+            bool: True when everything queued has been sent.
+        """
+        while self.chunks:
+            chunk = self.chunks[0]
+            if isinstance(chunk, _FileChunk):
+                try:
+                    self.pending -= chunk.send(sock)
+                except WOULD_BLOCK:
+                    return False
+                if chunk.remaining:
+                    continue
+                chunk.close()
+                self.chunks.popleft()
+                continue
+            if isinstance(chunk, _Stream):
+                piece = chunk.next()
+                if piece is None:
+                    self.chunks.popleft()
+                elif piece:
+                    self.chunks.appendleft(memoryview(piece))
+                    self.pending += len(piece)
+                continue
+            try:
+                sent = sock.send(chunk)
+            except WOULD_BLOCK:
+                return False
+            self.pending -= sent
+            if sent < len(chunk):
+                self.chunks[0] = chunk[sent:]
+                return False
+            self.chunks.popleft()
+        return True
+
+
+class _Connection:
+    """Per-connection state kept by the event loop."""
+
+    __slots__ = ("sock", "addr", "parser", "writer", "events", "upload", "keep_alive", "closing",
+                 "handshaking", "committing", "paused", "accepted", "received", "trace")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.parser = RequestParser()
+        self.writer = _BufferedWriter()
+        self.events = selectors.EVENT_READ
+        self.upload = None  # POST body currently being received
+        self.keep_alive = True  # Whether the request being received allows more
+        self.closing = False  # Close once the queued response has been sent
+        self.handshaking = isinstance(sock, ssl.SSLSocket)  # TLS handshake not completed yet
+        self.committing = False  # Upload waiting for a group commit; later requests wait too
+        self.paused = False  # Too much output queued; requests aren't read until it drains
+        self.accepted = None  # perf_counter() at accept, until the first request (profiling only)
+        self.received = None  # perf_counter() when the next request's first byte arrived
+        self.trace = None  # RequestTrace of the last request until its response is sent
+
+
+class RequestRejected(Exception):
+    """Raised after an error response that leaves the connection unusable was sent."""
+
+    def __init__(self, message, status=413):
+        super().__init__(message)
+        self.status = status  # Status code of the response that was sent
+
+
+class _Upload:
+    """
+    A POST body being streamed into a temporary file next to its destination.
+
+    The temporary file is renamed over the destination only once the whole body
+    has arrived, so readers never see a partially written file. A chunked body
+    has no length up front; remaining is then None. With a BlobStore the body is
+    hashed as it arrives instead and stored by its digest on commit. How the
+    commit is made durable is up to the Durability it is given.
+    """
+
+    def __init__(self, path, length, store=None, durability=None):
+        self.path = path
+        self.remaining = length
+        self.received = 0
+        self.request = None  # Set by dispatch() for the metrics of the completed POST
+        self.started = 0.0
+        self.store = store
+        self.durability = durability if durability is not None else Durability()
+        if store is not None:
+            self.file = store.writer()
+        else:
+            fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".upload-")
+            self.file = open(fd, 'wb')
+
+    def write(self, data):
+        self.file.write(data)
+        self.received += len(data)
+        if self.remaining is not None:
+            self.remaining -= len(data)
+
+    def commit(self, done=None):
+        """
+        Syncs the temporary file to disk and atomically moves it into place.
+
+        Args:
+            done (callable): With group commit, called with None or the error once
+                the upload is durable instead of waiting for it here.
+        """
+        if self.store is not None:
+            self.store.commit(self.file, self.path, self.durability, done)
+            return
+        temp_path, path = self.temp_path, self.path
+
+        def publish():
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+
+        self.durability.commit(self.file, publish, [os.path.dirname(path)], done)
+
+    def abort(self):
+        """Discards a body that was not received completely."""
+        if self.store is not None:
+            self.file.discard()
+            return
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
 
 class Server:
     """A simple multithreaded HTTP server that handles basic GET and POST requests."""
 
-    def __init__(self, host="127.0.0.1", port=8000):
+    def __init__(self, host="127.0.0.1", port=8000, mode="threaded", backlog=128,
+                 pool_size=32, queue_size=64, retry_after=1, stats_interval=0,
+                 cache_size=64 * 1024 * 1024, cache_max_object=1024 * 1024,
+                 max_upload_size=1024 * 1024 * 1024, compress_min_size=1024, access_log=None,
+                 listings=False, idle_timeout=20.0, min_idle_timeout=5.0, busy_connections=15,
+                 max_requests_per_connection=0, max_connection_age=0.0, tls_cert=None,
+                 tls_key=None, tls_tickets=2, tls_session_cache=False, dedup_dir=None,
+                 durability="fsync-per-request", group_commit_window=0.0, profiler=None):
         """
         Initializes the server with a host and port.
         Creates a TCP socket and initializes a counter for active connections.
@@ -16,66 +306,596 @@ class Server:
         Attributes:
             host (str): IP address the server will bind to.
             port (int): Port number the server will bind to.
+            mode (str): Serving engine, "threaded" (thread per connection), "pool"
+                (fixed worker pool with admission control) or "selectors" (single
+                non-blocking event loop).
+            backlog (int): Listen backlog passed to listen().
+            pool_size (int): Number of worker threads in pool mode.
+            queue_size (int): Accepted connections that may wait for a worker in pool
+                mode before new ones are shed with 503.
+            retry_after (int): Seconds advertised in Retry-After on a 503.
+            stats_interval (float): Seconds between statistics printouts; 0 disables them.
+            cache_size (int): Byte budget of the GET response cache; 0 disables it.
+            cache_max_object (int): Largest file, in bytes, kept in the response cache.
+            max_upload_size (int): Largest POST body accepted; bigger ones get 413.
+            compress_min_size (int): Smallest compressible file sent gzip/deflate
+                encoded; a negative value disables compression.
+            response_cache (ResponseCache): Cache of serialized responses for small files.
+            access_log (AccessLog): Background access log, or None to disable logging.
+            listings (bool): Answer GETs for directories with a generated HTML listing
+                instead of 404.
+            idle_timeout (float): Keep-alive idle timeout in seconds while the server
+                is quiet.
+            min_idle_timeout (float): Idle timeout once busy_connections are open; in
+                between it shrinks linearly with the number of open connections.
+            busy_connections (int): Open connections at which the idle timeout
+                reaches min_idle_timeout.
+            max_requests_per_connection (int): Requests served before a keep-alive
+                connection is closed; 0 for no limit.
+            max_connection_age (float): Seconds after which a connection is closed
+                once its current request is done; 0 for no limit.
+            reaper (ConnectionReaper): Tracks connection activity and enforces the
+                idle, request and age limits for every engine.
+            tls_cert (str): PEM certificate chain; serves HTTPS instead of HTTP when set.
+            tls_key (str): PEM private key, if not included in tls_cert.
+            tls_tickets (int): TLS 1.3 session tickets issued per handshake; 0
+                disables TLS 1.3 resumption.
+            tls_session_cache (bool): Keep TLS sessions in the server's session cache
+                instead of in stateless tickets held by the clients.
+            tls_context (ssl.SSLContext): Context shared by every TLS connection, or
+                None for plain HTTP.
+            dedup_dir (str): Directory of a content-addressed store that uploads are
+                deduplicated into; None stores every upload separately.
+            blob_store (BlobStore): The upload store, or None.
+            durability (Durability): How completed uploads reach the disk before they
+                are acknowledged: "fsync-per-request", "group-commit" or "none".
+            group_commit_window (float): Seconds the group-commit syncer waits for
+                more uploads before syncing a batch.
+            profiler (Profiler): Request instrumentation that GET /__profile can
+                switch on and off, or None to leave the request path uninstrumented.
+            compressor (Compressor): Negotiated response compression and its cache.
             server_socket (socket): Server's main listening socket.
-            active_connections (int): Count of currently active client connections.
+            active_connections (int): Count of currently active client connections,
+                guarded by connections_lock.
+            metrics (Metrics): Request, byte and latency counters served at /__metrics.
         """
         self.host = host
         self.port = port
+        self.mode = mode
+        self.backlog = backlog
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.stats_interval = stats_interval
+        self.connection_queue = None
+        self.pool_lock = threading.Lock()
+        self.shed_count = 0
+        self.queued_total = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.max_upload_size = max_upload_size
+        self.response_cache = ResponseCache(cache_size, cache_max_object) if cache_size > 0 else None
+        self.access_log = access_log
+        self.listings = listings
+        self.reaper = ConnectionReaper(idle_timeout, min_idle_timeout, busy_connections,
+                                       max_requests_per_connection, max_connection_age)
+        self.compressor = Compressor(min_size=compress_min_size) if compress_min_size >= 0 else None
+        # Created before any prefork so every worker shares the session ticket keys
+        self.tls_context = None
+        if tls_cert:
+            self.tls_context = create_server_context(tls_cert, tls_key, tls_tickets, tls_session_cache)
+        self.blob_store = None
+        if dedup_dir:
+            self.blob_store = BlobStore(dedup_dir)
+            self.blob_store.collect()  # Before serving (and forking), while no upload is linking
+        self.durability = Durability(durability, group_commit_window)
+        self.completions = deque()  # Group commits finished for the event loop, with its wakeup
+        self.wakeup = None
+        self.resumed = deque()  # Event-loop connections whose output drained while paused
+        self.profiler = profiler
+        if profiler is not None:
+            # Reports of slow requests are written by the access log's writer, off the request path
+            profiler.log = lambda message: self.log(message, verbose=False)
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.active_connections = 0  # Decrement active connections count
+        self.active_connections = 0
+        self.connections_lock = threading.Lock()
+        self.metrics = Metrics()
+
+    def response_head(self, length, content_type, extra="", status="200 OK"):
+        """
+        Serializes the status line and headers of a successful response.
+
+        Args:
+            length (int): Content-Length of the body, or None for a body sent with
+                Transfer-Encoding: chunked.
+            content_type (str): MIME type of the body.
+            extra (str): Additional header lines, each terminated by CRLF.
+            status (str): Status code and reason phrase.
+
+        Returns:
+            bytes: The response head including the blank line that ends it.
+        """
+        framing = "Transfer-Encoding: chunked" if length is None else f"Content-Length: {length}"
+        return (
+            f"HTTP/1.1 {status}\r\n"
+            f"{framing}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"{extra}\r\n"
+        ).encode("utf-8")
+
+    @staticmethod
+    def send_stream(client_socket, head, pieces):
+        """
+        Sends a response head followed by a body produced piece by piece.
+
+        Args:
+            client_socket (socket): The client socket (or event-loop writer).
+            head (bytes): The response head.
+            pieces (iterable): Byte strings making up the framed body.
 
-    def handle_get(self, client_socket, path):
+        Returns:
+            int: Bytes sent. The event-loop writer pulls pieces lazily as the socket
+            drains, so only the head is counted there.
+        """
+        client_socket.sendall(head)
+        stream = getattr(client_socket, "sendstream", None)
+        if stream is not None:
+            stream(pieces)
+            return len(head)
+        sent = len(head)
+        for piece in pieces:
+            client_socket.sendall(piece)
+            sent += len(piece)
+        return sent
+
+    @staticmethod
+    def entity_tag(st, encoding=None):
+        """
+        Builds a strong ETag from a file's modification time and size.
+
+        Args:
+            st (os.stat_result): Metadata of the file.
+            encoding (str): Content coding of the representation, if any; each
+                coding gets its own tag.
+        """
+        tag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+        return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+    def validator_headers(self, st, encoding=None):
+        """Returns the ETag and Last-Modified header lines for a file."""
+        return (
+            f"ETag: {self.entity_tag(st, encoding)}\r\n"
+            f"Last-Modified: {email.utils.formatdate(st.st_mtime, usegmt=True)}\r\n"
+        )
+
+    def not_modified(self, headers, st):
+        """
+        Evaluates a conditional GET against a file's current metadata.
+
+        Args:
+            headers (dict): Request headers with lower-cased names.
+            st (os.stat_result): Current metadata of the file.
+
+        Returns:
+            str: The entity tag to echo in a 304 response, or None if the full
+            response must be sent.
+
+        If-None-Match takes precedence; If-Modified-Since is only consulted when it
+        is absent, as required by RFC 9110.
+        """
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            current = [self.entity_tag(st)] + [self.entity_tag(st, e) for e in SUPPORTED_ENCODINGS]
+            for tag in if_none_match.split(","):
+                tag = tag.strip()
+                if tag.startswith("W/"):
+                    tag = tag[2:]
+                if tag == "*":
+                    return current[0]
+                if tag in current:
+                    return tag
+            return None
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return None
+            if int(st.st_mtime) <= since:
+                return self.entity_tag(st)
+        return None
+
+    def range_applies(self, headers, st):
+        """
+        Evaluates If-Range, which makes a Range request conditional.
+
+        Args:
+            headers (dict): Request headers with lower-cased names.
+            st (os.stat_result): Current metadata of the file.
+
+        Returns:
+            bool: True if the Range header should be honoured: there is no If-Range,
+            or it names the current entity tag or exact modification date. A client
+            resuming a download of a file that has since changed gets it whole.
+        """
+        if_range = headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == self.entity_tag(st)  # Weak tags never match
+        if if_range.startswith("W/"):
+            return False
+        try:
+            return email.utils.parsedate_to_datetime(if_range).timestamp() == int(st.st_mtime)
+        except (TypeError, ValueError):
+            return False
+
+    def send_range(self, client_socket, path, content_type, value):
+        """
+        Sends one byte range of a file as 206 Partial Content.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+            path (str): Path of the file.
+            content_type (str): MIME type of the file.
+            value (str): The request's Range header.
+
+        Returns:
+            tuple: (status code, bytes sent), or None if the Range header is to be
+            ignored and the whole file sent instead.
+
+        The range is resolved against the opened file and streamed with sendfile()
+        from its offset. A range starting past the end of the file gets 416 Range
+        Not Satisfiable with the file's current length.
+        """
+        with open(path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            try:
+                byte_range = parse_range(value, st.st_size)
+            except RangeNotSatisfiable:
+                response = (
+                    "HTTP/1.1 416 Range Not Satisfiable\r\n"
+                    f"Content-Range: bytes */{st.st_size}\r\n"
+                    "Content-Length: 0\r\n\r\n"
+                ).encode("utf-8")
+                client_socket.send(response)
+                return 416, len(response)
+            if byte_range is None:
+                return None
+            first, last = byte_range
+            length = last - first + 1
+            extra = f"Content-Range: bytes {first}-{last}/{st.st_size}\r\nAccept-Ranges: bytes\r\n"
+            head = self.response_head(length, content_type, extra + self.validator_headers(st),
+                                      status="206 Partial Content")
+            client_socket.sendall(head)
+            client_socket.sendfile(file, first, length)
+        return 206, len(head) + length
+
+    def handle_get(self, client_socket, path, headers=None, chunked=False):
         """
         Handles GET requests by serving files from the server's filesystem.
 
         Args:
             client_socket (socket): The client socket to send responses.
             path (str): Requested file path.
+            headers (dict): Request headers with lower-cased names.
+            chunked (bool): The client understands Transfer-Encoding: chunked
+                (HTTP/1.1), so bodies of unknown length can be streamed.
+
+        Returns:
+            tuple: (status code, bytes sent).
 
-        If the file exists, reads and sends it back in the HTTP response.
+        Responses carry ETag and Last-Modified validators, and a conditional request
+        whose validators still match is answered with a bodyless 304 Not Modified.
+        A single-range Range request is answered with 206 Partial Content (see
+        send_range()); the range always refers to the unencoded file.
+        Compressible files are sent gzip or deflate encoded when the client's
+        Accept-Encoding allows it (see send_compressed()).
+        Small files are answered from the response cache when their modification
+        time and size are unchanged, and are cached after being read otherwise.
+        Larger files get their headers sent and are then streamed with sendfile(),
+        so the body is never copied into Python memory.
+        With listings enabled, a directory is answered with a generated listing.
         If the file doesn't exist, responds with 404 Not Found.
         """
         # Remove leading slash if present
         if path.startswith('/'):
             path = path[1:]
 
-        if os.path.exists(path):
-            with open(path, 'rb') as file:
-                data = file.read()
-                content_type, _ = mimetypes.guess_type(path)
+        try:
+            st = os.stat(path or ".")
+        except OSError:
+            st = None
+        if st is not None and self.listings and S_ISDIR(st.st_mode):
+            return self.send_listing(client_socket, path, chunked)
+        if st is None or not S_ISREG(st.st_mode):
+            return self.handle_error(client_socket, 404, "NOT FOUND")
 
+        if headers:
+            tag = self.not_modified(headers, st)
+            if tag is not None:
                 response = (
-                    "HTTP/1.1 200 OK\r\n"
-                    f"Content-Length: {len(data)}\r\n"
-                    f"Content-Type: {content_type}\r\n\r\n"
-                ).encode("utf-8") + data + b"\r\n"
+                    "HTTP/1.1 304 Not Modified\r\n"
+                    f"ETag: {tag}\r\n"
+                    f"Last-Modified: {email.utils.formatdate(st.st_mtime, usegmt=True)}\r\n\r\n"
+                ).encode("utf-8")
                 client_socket.send(response)
-        else:
-            client_socket.send("HTTP/1.1 404 NOT FOUND\r\n".encode("utf-8"))
+                return 304, len(response)
+
+        content_type, _ = mimetypes.guess_type(path)
+        if headers and "range" in headers and self.range_applies(headers, st):
+            result = self.send_range(client_socket, path, content_type, headers["range"])
+            if result is not None:
+                return result
+
+        extra = ""
+        if self.compressor is not None and self.compressor.wants(st.st_size, content_type):
+            encoding = negotiate(headers.get("accept-encoding", "")) if headers else None
+            if encoding:
+                sent = self.send_compressed(client_socket, path, st, content_type, encoding, chunked)
+                if sent:
+                    return 200, sent
+            extra = "Vary: Accept-Encoding\r\n"
+
+        cache = self.response_cache
+        if cache is not None:
+            response = cache.get(path, st)
+            if response is not None:
+                client_socket.sendall(response)
+                return 200, len(response)
+
+        with open(path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            size = st.st_size
+            extra += "Accept-Ranges: bytes\r\n"
+            head = self.response_head(size, content_type, extra + self.validator_headers(st))
+            if cache is not None and cache.cacheable(size):
+                data = file.read(size)
+                if len(data) == size:
+                    cache.put(path, st, head + data)
+                client_socket.sendall(head + data)
+            else:
+                client_socket.sendall(head)
+                # os.sendfile where supported, otherwise a chunked send loop
+                client_socket.sendfile(file, 0, size)
+        return 200, len(head) + size
+
+    def send_compressed(self, client_socket, path, st, content_type, encoding, chunked=False):
+        """
+        Sends a file with a gzip or deflate content coding.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+            path (str): Path of the file to send.
+            st (os.stat_result): Current metadata of the file.
+            content_type (str): MIME type of the file.
+            encoding (str): Negotiated content coding, "gzip" or "deflate".
+            chunked (bool): The client accepts Transfer-Encoding: chunked.
+
+        Returns:
+            int: Bytes sent, or 0 if the file is too large to compress in memory,
+            has no precompressed copy and the client can't take a chunked response,
+            in which case nothing was sent.
+
+        A cached compressed response is used while the file is unchanged. For gzip,
+        a sibling "<path>.gz" at least as new as the file is sent as is. Files up to
+        the compressor's max_size are compressed once and the response cached for
+        later requests; larger ones are compressed as they are read and sent in
+        chunks, so the first bytes leave right away and memory use stays bounded.
+        """
+        compressor = self.compressor
+        extra = f"Content-Encoding: {encoding}\r\nVary: Accept-Encoding\r\n"
+        response = compressor.cache.get((path, encoding), st)
+        if response is not None:
+            client_socket.sendall(response)
+            compressor.record(st.st_size, len(response) - response.find(b"\r\n\r\n") - 4)
+            return len(response)
+        if encoding == "gzip":
+            try:
+                gz_st = os.stat(path + ".gz")
+            except OSError:
+                gz_st = None
+            if gz_st is not None and S_ISREG(gz_st.st_mode) and gz_st.st_mtime_ns >= st.st_mtime_ns:
+                with open(path + ".gz", 'rb') as file:
+                    size = os.fstat(file.fileno()).st_size
+                    head = self.response_head(size, content_type, extra + self.validator_headers(st, encoding))
+                    client_socket.sendall(head)
+                    client_socket.sendfile(file, 0, size)
+                compressor.record(st.st_size, size)
+                return len(head) + size
+        if st.st_size > compressor.max_size:
+            if not chunked:
+                return 0
+            head = self.response_head(None, content_type, extra + self.validator_headers(st, encoding))
+            return self.send_stream(client_socket, head, _chunked(compressor.stream(path, encoding)))
+        with open(path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            data = file.read(st.st_size)
+        body = compressor.compress(data, encoding)
+        response = self.response_head(
+            len(body), content_type, extra + self.validator_headers(st, encoding)) + body
+        if len(data) == st.st_size:
+            compressor.cache.put((path, encoding), st, response)
+        client_socket.sendall(response)
+        compressor.record(len(data), len(body))
+        return len(response)
+
+    def send_listing(self, client_socket, path, chunked):
+        """
+        Sends an HTML listing of a directory.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+            path (str): Directory path, "" for the served root.
+            chunked (bool): The client accepts Transfer-Encoding: chunked.
+
+        Returns:
+            tuple: (status code, bytes sent).
+
+        The listing is generated while the directory is scanned and streamed in
+        chunks, so the first entries are sent before the scan finishes. Clients
+        without chunked support get the whole listing with a Content-Length.
+        """
+        pieces = self._listing_pieces(path)
+        if chunked:
+            return 200, self.send_stream(client_socket, self.response_head(None, "text/html"),
+                                         _chunked(pieces))
+        body = b"".join(pieces)
+        response = self.response_head(len(body), "text/html") + body
+        client_socket.sendall(response)
+        return 200, len(response)
+
+    @staticmethod
+    def _listing_pieces(path):
+        """Yields a directory listing as HTML in pieces of about LISTING_PIECE_SIZE bytes."""
+        prefix = "/" + path.rstrip("/") + "/" if path else "/"
+        title = html.escape(prefix)
+        lines = [f"<!DOCTYPE html>\n<html><head><title>Index of {title}</title></head>\n"
+                 f"<body><h1>Index of {title}</h1><ul>\n"]
+        size = len(lines[0])
+        with os.scandir(path or ".") as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                name = entry.name + ("/" if entry.is_dir() else "")
+                line = f'<li><a href="{quote(prefix + name)}">{html.escape(name)}</a></li>\n'
+                lines.append(line)
+                size += len(line)
+                if size >= LISTING_PIECE_SIZE:
+                    yield "".join(lines).encode("utf-8")
+                    lines.clear()
+                    size = 0
+        lines.append("</ul></body></html>\n")
+        yield "".join(lines).encode("utf-8")
+
+    def handle_post(self, client_socket, request):
+        """
+        Starts receiving a POST request body destined for a file.
 
-    def handle_post(self, client_socket, request, path):
+        Args:
+            client_socket (socket): The client socket to send responses.
+            request (Request): The parsed request; its path is the destination file.
+
+        Returns:
+            _Upload: The upload the caller streams the body into before calling
+            finish_post().
+
+        Bodies over max_upload_size are refused with 413 Payload Too Large and
+        RequestRejected is raised, since the unread body leaves the connection
+        unusable. Chunked bodies have no length up front and are checked by
+        check_upload_size() as they arrive. With deduplication enabled, uploads
+        into the blob store itself are refused with 403 Forbidden.
+        """
+        length = request.content_length
+        if length is not None and length > self.max_upload_size:
+            self.refuse_upload(client_socket, length)
+        # The store is checked against the very path the upload is written to
+        path = request.path.lstrip('/')
+        if self.blob_store is not None and self.blob_store.owns(path):
+            client_socket.send((
+                "HTTP/1.1 403 Forbidden\r\n"
+                "Content-Length: 0\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("utf-8"))
+            raise RequestRejected(f"Upload into the blob store: {request.path}", status=403)
+        return _Upload(path, length, self.blob_store, self.durability)
+
+    def refuse_upload(self, client_socket, length):
+        """Sends 413 Payload Too Large and raises RequestRejected."""
+        client_socket.send((
+            "HTTP/1.1 413 Payload Too Large\r\n"
+            "Content-Length: 0\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("utf-8"))
+        raise RequestRejected(f"Upload of {length} bytes exceeds the {self.max_upload_size} byte limit")
+
+    def check_upload_size(self, client_socket, upload):
+        """Refuses a chunked upload once it has grown past max_upload_size."""
+        if upload.received > self.max_upload_size:
+            if upload.request is not None:
+                self.record(upload.request, upload.request.path.lstrip('/'), 413, 0, None)
+            self.refuse_upload(client_socket, f"at least {upload.received}")
+
+    def finish_post(self, client_socket, upload):
+        """
+        Completes a POST once its whole body has been received.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+            upload (_Upload): The fully received upload.
+
+        Moves the file into place durably, then acknowledges it with
+        acknowledge_post().
+
+        Returns:
+            tuple: (status code, bytes sent).
         """
-        Handles POST requests by saving the body of the request to a file.
+        upload.commit()
+        return self.acknowledge_post(client_socket, upload)
+
+    def acknowledge_post(self, client_socket, upload):
+        """
+        Invalidates any cached copy of a committed upload and sends a success response.
 
         Args:
             client_socket (socket): The client socket to send responses.
-            request (bytes): The full HTTP request.
-            path (str): Destination file path.
-
-        Parses the request to find the body and writes it to the specified path.
-        Sends a success response to the client after completion.
-        """
-        headers_end = request.find(b"\r\n\r\n")  # Find the end of headers
-        body = request[headers_end + 4:]  # Get the body after headers
-        file_path = path
-        # Write the file content in binary mode
-        with open(file_path, 'wb') as file:
-            file.write(body)  # Write binary data directly to file
-            file.flush()
-            os.fsync(file.fileno())
+            upload (_Upload): The committed upload.
+
+        Returns:
+            tuple: (status code, bytes sent).
+        """
+        if upload.request is not None and upload.request.content_length is None:
+            upload.request.content_length = upload.received  # A chunked body, now complete
+        if self.response_cache is not None:
+            self.response_cache.invalidate(upload.path.lstrip('/'))
+        if self.compressor is not None:
+            self.compressor.invalidate(upload.path.lstrip('/'))
         # Send success response
-        response = "HTTP/1.1 200 OK\r\n\r\n"
-        client_socket.send(response.encode("utf-8"))
+        response = "HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n".encode("utf-8")
+        client_socket.send(response)
+        if upload.request is not None:
+            request = upload.request
+            self.record(request, request.path.lstrip('/'), 200, len(response),
+                        time.perf_counter() - upload.started)
+        return 200, len(response)
+
+    def receive_body(self, client_socket, parser, upload):
+        """
+        Streams a POST body from a blocking socket into its upload.
+
+        Args:
+            client_socket (socket): The client socket the body arrives on.
+            parser (RequestParser): The connection's parser; body bytes it already
+                buffered are used first.
+            upload (_Upload): The upload to write into.
+
+        The rest is read with recv_into into one reusable buffer, so memory use
+        does not depend on the size of the body. Chunked bodies are passed through
+        the parser, which strips the chunk framing.
+        """
+        if upload.remaining is None:
+            while True:
+                data = parser.take(BODY_CHUNK_SIZE)
+                if data:
+                    upload.write(data)
+                    self.check_upload_size(client_socket, upload)
+                    continue
+                if not parser.body_pending:
+                    return
+                data = client_socket.recv(BODY_CHUNK_SIZE)
+                if not data:
+                    raise ConnectionError("Client closed the connection during the upload")
+                parser.feed(data)
+        data = parser.take(upload.remaining)
+        if data:
+            upload.write(data)
+        chunk = memoryview(bytearray(BODY_CHUNK_SIZE))
+        while upload.remaining:
+            received = client_socket.recv_into(chunk, min(upload.remaining, BODY_CHUNK_SIZE))
+            if not received:
+                raise ConnectionError("Client closed the connection during the upload")
+            parser.consumed(received)
+            upload.write(chunk[:received])
 
     def handle_error(self, client_socket, status_code, message):
         """
@@ -85,8 +905,257 @@ class Server:
             client_socket (socket): The client socket to send responses.
             status_code (int): HTTP error status code.
             message (str): Error message for the response.
+
+        Returns:
+            tuple: (status code, bytes sent).
+        """
+        response = f"HTTP/1.1 {status_code} {message}\r\nContent-Length: 0\r\n\r\n".encode("utf-8")
+        client_socket.send(response)
+        return status_code, len(response)
+
+    def handle_metrics(self, client_socket):
+        """
+        Serves the metrics of this process in the Prometheus text format.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+
+        Returns:
+            tuple: (status code, bytes sent).
+
+        Besides the request metrics, reports active connections and the pool,
+        response cache and compression statistics.
+        """
+        with self.connections_lock:
+            active = self.active_connections
+        lines = self.metrics.render()
+        lines += ["# TYPE active_connections gauge", f"active_connections {active}"]
+        if self.mode == "pool":
+            stats = self.pool_stats()
+            lines += [
+                "# TYPE pool_queue_depth gauge", f"pool_queue_depth {stats['queue_depth']}",
+                "# TYPE pool_shed_total counter", f"pool_shed_total {stats['shed']}",
+            ]
+        if self.response_cache is not None:
+            for name, value in self.response_cache.stats().items():
+                lines.append(f"response_cache_{name} {value}")
+        if self.compressor is not None:
+            for name, value in self.compressor.stats().items():
+                lines.append(f"compression_{name} {value}")
+        reaper = self.reaper.stats()
+        lines += [
+            "# TYPE connections_reaped_total counter",
+            f'connections_reaped_total{{reason="idle"}} {reaper["reaped_idle"]}',
+            f'connections_reaped_total{{reason="age"}} {reaper["reaped_age"]}',
+            f'connections_reaped_total{{reason="max_requests"}} {reaper["closed_max_requests"]}',
+            "# TYPE idle_timeout_seconds gauge",
+            f"idle_timeout_seconds {reaper['idle_timeout_seconds']:.3f}",
+        ]
+        if self.blob_store is not None:
+            stats = self.blob_store.stats()
+            lines += [
+                "# TYPE upload_blobs_stored_total counter",
+                f"upload_blobs_stored_total {stats['blobs_stored']}",
+                "# TYPE upload_deduplicated_total counter",
+                f"upload_deduplicated_total {stats['deduplicated']}",
+                "# TYPE upload_bytes_written_total counter",
+                f"upload_bytes_written_total {stats['bytes_written']}",
+                "# TYPE upload_bytes_saved_total counter",
+                f"upload_bytes_saved_total {stats['bytes_saved']}",
+            ]
+        if self.durability.mode != "none":
+            stats = self.durability.stats()
+            lines += [
+                "# TYPE durability_commits_total counter",
+                f"durability_commits_total {stats['batches']}",
+                "# TYPE durability_files_synced_total counter",
+                f"durability_files_synced_total {stats['files']}",
+                "# TYPE durability_directories_synced_total counter",
+                f"durability_directories_synced_total {stats['directories']}",
+                "# TYPE durability_sync_seconds_total counter",
+                f"durability_sync_seconds_total {stats['sync_seconds']:.6f}",
+                "# TYPE durability_largest_batch gauge",
+                f"durability_largest_batch {stats['largest_batch']}",
+            ]
+        if self.tls_context is not None:
+            stats = session_stats(self.tls_context)
+            lines += [
+                "# TYPE tls_handshakes_total counter",
+                f'tls_handshakes_total{{result="completed"}} {stats["accept_good"]}',
+                f'tls_handshakes_total{{result="failed"}} {stats["accept"] - stats["accept_good"]}',
+                "# TYPE tls_sessions_resumed_total counter",
+                f"tls_sessions_resumed_total {stats['hits']}",
+                "# TYPE tls_session_cache_misses_total counter",
+                f"tls_session_cache_misses_total {stats['misses'] + stats['timeouts']}",
+                "# TYPE tls_session_cache_entries gauge",
+                f"tls_session_cache_entries {stats['number']}",
+            ]
+        if self.profiler is not None:
+            status = self.profiler.status()
+            lines.append("# TYPE request_phase_seconds_total counter")
+            lines += [f'request_phase_seconds_total{{phase="{phase}"}} '
+                      f'{status["phase_seconds"][phase]:.6f}' for phase in PHASES]
+            lines += [
+                "# TYPE requests_traced_total counter", f"requests_traced_total {status['traced']}",
+                "# TYPE slow_requests_total counter", f"slow_requests_total {status['slow']}",
+            ]
+        if self.access_log is not None:
+            lines.append(f"access_log_dropped_total {self.access_log.dropped}")
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Content-Type: text/plain; version=0.0.4\r\n\r\n"
+        ).encode("utf-8")
+        client_socket.sendall(head + body)
+        return 200, len(head) + len(body)
+
+    def handle_profile(self, client_socket, query):
+        """
+        Changes the profiler's settings from a query string and reports its state.
+
+        Args:
+            client_socket (socket): The client socket to send responses.
+            query (str): Settings to change, e.g. "phases=1&slow_ms=50&cprofile=100"
+                or "tracemalloc=30"; an empty query only reports.
+
+        Returns:
+            tuple: (status code, bytes sent).
+        """
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        try:
+            self.profiler.configure(
+                phases=params["phases"] not in ("0", "false", "off") if "phases" in params else None,
+                slow_ms=float(params["slow_ms"]) if "slow_ms" in params else None,
+                profile_requests=int(params["cprofile"]) if "cprofile" in params else None,
+                tracemalloc_interval=(float(params["tracemalloc"])
+                                      if "tracemalloc" in params else None))
+        except ValueError:
+            return self.handle_error(client_socket, 400, "Bad Request")
+        body = json.dumps(self.profiler.status(), indent=2).encode("utf-8")
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Content-Type: application/json\r\n\r\n"
+        ).encode("utf-8")
+        client_socket.sendall(head + body)
+        return 200, len(head) + len(body)
+
+    def record(self, request, route, status, sent, duration):
+        """
+        Records a completed request in the metrics and the access log.
+
+        Args:
+            request (Request): The parsed request.
+            route (str): Request path without its leading slash.
+            status (int): Response status code.
+            sent (int): Response bytes sent.
+            duration (float): Seconds spent on the request, or None if not timed.
+        """
+        # Refused uploads leave their body unread
+        bytes_in = request.head_size + ((request.content_length or 0) if status not in (403, 413) else 0)
+        self.metrics.observe_request(request.method, route, status, bytes_in, sent, duration)
+        if self.access_log is not None:
+            self.access_log.request(request.method, request.path, status, sent, duration or 0.0)
+
+    def log(self, message, verbose=True):
+        """
+        Sends a message to the access log's background writer.
+
+        Args:
+            message (str): The message.
+            verbose (bool): True for connection lifecycle events, which are only
+                written with log_connections enabled; errors pass False.
+        """
+        if self.access_log is not None:
+            self.access_log.event(message, verbose)
+
+    def idle_timeout(self):
+        """Returns the keep-alive idle timeout in seconds for the current load."""
+        return self.reaper.idle_timeout()
+
+    def _reap_blocking(self):
+        """
+        Closes expired connections for the threaded and pool engines.
+
+        Shutting a socket down wakes the thread blocked in recv() on it, which then
+        sees end-of-stream and releases the connection. TLS sockets are shut down at
+        the TCP level: SSLSocket.shutdown() would also drop the TLS state under the
+        thread still reading from it.
+        """
+        while True:
+            time.sleep(REAP_INTERVAL)
+            for client_socket, reason in self.reaper.sweep():
+                self.log(f"Closing connection: {reason} limit reached.")
+                try:
+                    socket.socket.shutdown(client_socket, socket.SHUT_RDWR)
+                except OSError:
+                    pass  # Closed by its handler in the meantime
+
+    def dispatch(self, client_socket, request, trace=None):
+        """
+        Routes a parsed request to the matching handler.
+
+        Args:
+            client_socket (socket): The client socket (or event-loop writer) to respond on.
+            request (Request): The parsed request line and headers.
+            trace (RequestTrace): The request's trace while profiling, which gets
+                its status; None otherwise.
+
+        Returns:
+            _Upload: For POST, the upload the caller must stream the body into;
+            otherwise None.
         """
-        client_socket.send(f"HTTP/1.1 {status_code} {message}\r\n".encode("utf-8"))
+        started = time.perf_counter()
+        route = request.path.lstrip('/')
+        # Handle the request based on the method
+        if request.method == 'GET':
+            if route == METRICS_PATH:
+                status, sent = self.handle_metrics(client_socket)
+            elif self.profiler is not None and route.partition("?")[0] == PROFILE_PATH:
+                route, _, query = route.partition("?")  # Keep settings out of the metric labels
+                status, sent = self.handle_profile(client_socket, query)
+            else:
+                status, sent = self.handle_get(client_socket, request.path, request.headers,
+                                               request.version != "HTTP/1.0")
+        elif request.method == 'POST':
+            try:
+                upload = self.handle_post(client_socket, request)
+            except RequestRejected as e:
+                self.record(request, route, e.status, 0, None)
+                if trace is not None:
+                    trace.status = e.status
+                raise
+            upload.request = request
+            upload.started = started
+            return upload
+        else:
+            status, sent = self.handle_error(client_socket, 405, "Method Not Allowed")
+        self.record(request, route, status, sent, time.perf_counter() - started)
+        if trace is not None:
+            trace.status = status
+        return None
+
+    def serve_request(self, client_socket, parser, request, trace=None):
+        """
+        Handles one request on a blocking connection, including any upload body.
+
+        Args:
+            client_socket (socket): The client socket, or its timed wrapper while profiling.
+            parser (RequestParser): The connection's parser, holding buffered body bytes.
+            request (Request): The parsed request.
+            trace (RequestTrace): The request's trace while profiling, or None.
+        """
+        upload = self.dispatch(client_socket, request, trace)
+        if upload is not None:
+            try:
+                self.receive_body(client_socket, parser, upload)
+            except BaseException:
+                upload.abort()
+                raise
+            status, _ = self.finish_post(client_socket, upload)
+            if trace is not None:
+                trace.status = status
 
     def handle_client(self, client_socket, addr):
         """
@@ -98,80 +1167,834 @@ class Server:
 
         Increments active connections count upon start, and decrements on exit.
         Handles GET and POST methods, and responds with errors for unsupported methods.
-        Uses a timeout that dynamically adjusts based on active connections.
+        Idle keep-alive connections are closed by the reaper, whose timeout adapts
+        to the number of open connections; the socket timeout only guards against
+        transfers that stall mid-request. With TLS enabled the handshake is done
+        here, on the connection's own thread, and may take up to the idle timeout.
         """
-        with threading.Lock():
+        with self.connections_lock:
             self.active_connections += 1
-        timeout = max(5, 20 - self.active_connections)
+        # Pipelined responses are written separately; don't let Nagle hold them back
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        parser = RequestParser()
+        profiler = self.profiler
+        connected = time.perf_counter() if profiler is not None else None
         try:
+            if self.tls_context is not None:
+                client_socket.settimeout(self.idle_timeout())
+                try:
+                    client_socket = self.tls_context.wrap_socket(client_socket, server_side=True)
+                except (ssl.SSLError, OSError) as e:
+                    # The failed handshake already closed the connection
+                    self.log(f"TLS handshake failed: {e}", verbose=False)
+                    return
+            client_socket.settimeout(STALL_TIMEOUT)
+            self.reaper.register(client_socket)
             while True:
-                client_socket.settimeout(timeout)  # Set timeout based on active connections
-                request = b""
-                while True:
+                received = None
+                request = parser.next_request()
+                while request is None:
                     try:
-                        chunk = client_socket.recv(1024)
-                        if not chunk:  # Client closed the connection
-                            print("Client closed the connection.")
-                            client_socket.close()
-                            return
-                        request += chunk
-                        if len(chunk) < 1024:  # No more data to receive
-                            break
+                        chunk = client_socket.recv(65536)
                     except socket.timeout:
-                        print("Client idle timeout reached. Closing connection.")
-                        client_socket.close()
+                        self.log("Client idle timeout reached. Closing connection.")
+                        return
+                    if not chunk:  # Client closed the connection, or the reaper shut it down
+                        self.log("Client closed the connection.")
                         return
-                # Decode and parse the request
-                request_str = request.decode("utf-8", errors="ignore")
-                request_lines = request_str.split('\r\n')
-                print(f"Received: {request_lines[0]}")
-                # Extract the method, path, and headers
-                method, path, _ = request_lines[0].split(' ')
-                # Handle the request based on the method
-                if method == 'GET':
-                    self.handle_get(client_socket, path)
-                elif method == 'POST':
-                    self.handle_post(client_socket, request, path)
+                    if profiler is not None and received is None:
+                        received = time.perf_counter()
+                    parser.feed(chunk)
+                    request = parser.next_request()
+                # Body transfers don't report activity here, so exempt them from idle reaping
+                self.reaper.request_started(client_socket, busy=True)
+                if profiler is not None and profiler.active:
+                    first_byte = received - connected if connected is not None and received else None
+                    trace = profiler.begin(request.method, request.path, received, first_byte)
+                    try:
+                        self.serve_request(profiler.wrap(client_socket, trace), parser, request, trace)
+                    finally:
+                        profiler.finish(trace, time.perf_counter())
                 else:
-                    self.handle_error(client_socket, 405, "Method Not Allowed")
+                    self.serve_request(client_socket, parser, request)
+                connected = None
+                if not request.keep_alive or self.reaper.request_finished(client_socket):
+                    return
 
+        except ParseError as e:
+            self.log(f"Bad request: {e}", verbose=False)
+            self.metrics.observe_request("-", "-", e.status, 0, 0, None)
+            self.handle_error(client_socket, e.status, e.reason)
+        except RequestRejected as e:
+            self.log(f"Rejected request: {e}", verbose=False)
         except Exception as e:
-            print(f"Error when handling client: {e}")
+            self.log(f"Error when handling client: {e}", verbose=False)
         finally:
+            self.reaper.unregister(client_socket)
+            if isinstance(client_socket, ssl.SSLSocket):
+                close_notify(client_socket)
             client_socket.close()
-            with threading.Lock():
+            with self.connections_lock:
                 self.active_connections -= 1  # Decrement active connections count
-            print(f"Connection closed for client {addr}. Active connections: {self.active_connections}")
+            self.log(f"Connection closed for client {addr}. Active connections: {self.active_connections}")
 
-    def run_server(self):
+    def run_threaded(self):
         """
-        Starts the server to accept incoming client connections.
+        Accepts client connections on the listening socket.
         For each client connection, starts a new thread to handle the client.
         """
+        while True:
+            # Accept a client connection
+            client_socket, addr = self.accept()
+            self.metrics.observe_accept()
+            self.log(f"Accepted connection from {addr[0]}:{addr[1]}")
+            # Start a new thread to handle the client
+            thread = threading.Thread(target=self.handle_client, args=(client_socket, addr))
+            thread.start()
+
+    def accept(self):
+        """
+        Accepts the next connection for the blocking engines.
+
+        Returns:
+            tuple: (client socket, address).
+
+        Failures that leave the listening socket usable are logged and retried,
+        after ACCEPT_BACKOFF seconds if the process ran out of descriptors or
+        buffers, so that running into the descriptor limit only delays new
+        clients instead of stopping the server.
+        """
+        while True:
+            try:
+                return self.server_socket.accept()
+            except OSError as e:
+                if e.errno not in ACCEPT_ERRORS:
+                    raise
+                self.log(f"Error accepting connection: {e}", verbose=False)
+                if e.errno != errno.ECONNABORTED:
+                    time.sleep(ACCEPT_BACKOFF)
+
+    def run_pool(self):
+        """
+        Accepts client connections and hands them to a fixed pool of worker threads.
+
+        Connections wait in a bounded queue until a worker is free. When the queue is
+        full the connection is refused immediately with 503 Service Unavailable and a
+        Retry-After header, so a burst is shed instead of slowing every client down.
+        """
+        self.connection_queue = queue.Queue(maxsize=self.queue_size)
+        for _ in range(self.pool_size):
+            threading.Thread(target=self._pool_worker, daemon=True).start()
+        while True:
+            client_socket, addr = self.accept()
+            self.metrics.observe_accept()
+            self.log(f"Accepted connection from {addr[0]}:{addr[1]}")
+            try:
+                self.connection_queue.put_nowait((client_socket, addr, time.monotonic()))
+            except queue.Full:
+                self._shed(client_socket)
+
+    def _pool_worker(self):
+        """Serves queued connections one at a time for the lifetime of the server."""
+        while True:
+            client_socket, addr, queued_at = self.connection_queue.get()
+            waited = time.monotonic() - queued_at
+            with self.pool_lock:
+                self.queued_total += 1
+                self.queue_wait_total += waited
+                self.queue_wait_max = max(self.queue_wait_max, waited)
+            self.metrics.observe_queue_wait(waited)
+            self.handle_client(client_socket, addr)
+
+    def _shed(self, client_socket):
+        """
+        Refuses a connection with 503 because the pool's queue is full.
+
+        A TLS connection is closed without a response, since answering would
+        first take a handshake on the accepting thread.
+        """
+        with self.pool_lock:
+            self.shed_count += 1
+        try:
+            if self.tls_context is not None:
+                return
+            client_socket.send((
+                "HTTP/1.1 503 Service Unavailable\r\n"
+                f"Retry-After: {self.retry_after}\r\n"
+                "Content-Length: 0\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("utf-8"))
+        except OSError:
+            pass
+        finally:
+            client_socket.close()
+
+    def _report_stats(self):
+        """Prints pool and cache statistics every stats_interval seconds."""
+        while True:
+            time.sleep(self.stats_interval)
+            if self.mode == "pool":
+                stats = self.pool_stats()
+                print(f"Pool: depth={stats['queue_depth']} served={stats['queued_total']} "
+                      f"wait_avg={stats['queue_wait_avg'] * 1000:.2f}ms "
+                      f"wait_max={stats['queue_wait_max'] * 1000:.2f}ms shed={stats['shed']}")
+            if self.response_cache is not None:
+                stats = self.response_cache.stats()
+                print(f"Cache: entries={stats['entries']} bytes={stats['bytes']} "
+                      f"hits={stats['hits']} misses={stats['misses']} "
+                      f"evictions={stats['evictions']} invalidations={stats['invalidations']}")
+            if self.compressor is not None:
+                stats = self.compressor.stats()
+                print(f"Compression: responses={stats['responses']} "
+                      f"original={stats['bytes_original']} sent={stats['bytes_sent']} "
+                      f"saved={stats['bytes_saved']} compressions={stats['compressions']} "
+                      f"cpu={stats['cpu_seconds'] * 1000:.1f}ms")
+            if self.blob_store is not None:
+                stats = self.blob_store.stats()
+                print(f"Uploads: stored={stats['blobs_stored']} "
+                      f"deduplicated={stats['deduplicated']} written={stats['bytes_written']} "
+                      f"saved={stats['bytes_saved']} collected={stats['blobs_collected']}")
+            if self.durability.mode != "none":
+                stats = self.durability.stats()
+                print(f"Durability: mode={self.durability.mode} commits={stats['batches']} "
+                      f"files={stats['files']} directories={stats['directories']} "
+                      f"sync={stats['sync_seconds'] * 1000:.1f}ms "
+                      f"largest_batch={stats['largest_batch']}")
+            if self.tls_context is not None:
+                stats = session_stats(self.tls_context)
+                print(f"TLS: handshakes={stats['accept_good']} "
+                      f"failed={stats['accept'] - stats['accept_good']} resumed={stats['hits']} "
+                      f"misses={stats['misses']} cached={stats['number']}")
+            if self.profiler is not None:
+                stats = self.profiler.status()
+                phases = " ".join(f"{phase}={stats['phase_seconds'][phase] * 1000:.1f}ms"
+                                  for phase in PHASES)
+                print(f"Profiling: traced={stats['traced']} slow={stats['slow']} {phases}")
+            stats = self.reaper.stats()
+            print(f"Reaper: tracked={stats['tracked']} "
+                  f"idle_timeout={stats['idle_timeout_seconds']:.1f}s "
+                  f"reaped_idle={stats['reaped_idle']} reaped_age={stats['reaped_age']} "
+                  f"max_requests={stats['closed_max_requests']}")
+
+    def pool_stats(self):
+        """
+        Returns a snapshot of the worker pool's admission statistics.
+
+        Returns:
+            dict: Queue depth, connections dequeued, average and maximum queue wait
+            in seconds, and the number of connections shed with 503.
+        """
+        with self.pool_lock:
+            served = self.queued_total
+            return {
+                "queue_depth": self.connection_queue.qsize() if self.connection_queue else 0,
+                "queued_total": served,
+                "queue_wait_avg": self.queue_wait_total / served if served else 0.0,
+                "queue_wait_max": self.queue_wait_max,
+                "shed": self.shed_count,
+            }
+
+    def run_event_loop(self):
+        """
+        Serves every connection from a single thread using a selectors event loop.
+
+        Sockets are non-blocking; requests are framed from per-connection buffers and
+        dispatched to the same handlers as the threaded mode, whose output is queued
+        and written back as the sockets become writable. Idle connections cost only
+        their buffers, so memory stays flat with thousands of keep-alive clients.
+        """
+        self.server_socket.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(self.server_socket, selectors.EVENT_READ, None)
+        if self.durability.asynchronous:
+            # The syncer thread wakes the loop when group commits have been acknowledged
+            self.wakeup = socket.socketpair()
+            for sock in self.wakeup:
+                sock.setblocking(False)
+            selector.register(self.wakeup[0], selectors.EVENT_READ, self.completions)
+        connections = {}
+        next_sweep = time.monotonic() + REAP_INTERVAL
+        accept_resume = None  # When accepting resumes after running out of descriptors
         try:
-            # Bind the socket to the host and port
-            self.server_socket.bind((self.host, self.port))
-            # Listen for incoming connections
-            self.server_socket.listen()
-            print(f"Listening on {self.host}:{self.port}")
             while True:
-                # Accept a client connection
+                while self.resumed:
+                    # Requests already buffered don't make the socket readable again
+                    conn = self.resumed.popleft()
+                    if connections.get(conn.sock.fileno()) is conn:
+                        self._handle_input(selector, connections, conn)
+                timeout = 1 if accept_resume is None else max(0.0, accept_resume - time.monotonic())
+                for key, mask in selector.select(timeout=min(1, timeout)):
+                    if key.data is None:
+                        if not self._accept_ready(selector, connections):
+                            # Stop watching the listening socket, or it stays readable and spins
+                            selector.unregister(self.server_socket)
+                            accept_resume = time.monotonic() + ACCEPT_BACKOFF
+                        continue
+                    if key.data is self.completions:
+                        self._commits_ready(selector, connections)
+                        continue
+                    conn = key.data
+                    if conn.handshaking:
+                        self._handshake_ready(selector, connections, conn)
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        self._read_ready(selector, connections, conn)
+                    if mask & selectors.EVENT_WRITE and conn.sock.fileno() != -1:
+                        self._write_ready(selector, connections, conn)
+                now = time.monotonic()
+                if accept_resume is not None and now >= accept_resume:
+                    selector.register(self.server_socket, selectors.EVENT_READ, None)
+                    accept_resume = None
+                if now >= next_sweep:
+                    # Close connections that have been idle or open for too long
+                    for conn, reason in self.reaper.sweep():
+                        self.log(f"Closing connection: {reason} limit reached.")
+                        if reason == "age" and (conn.writer.chunks or conn.committing):
+                            # Still finishing its last request; close once that is done
+                            conn.closing = True
+                            continue
+                        self._close_connection(selector, connections, conn)
+                    next_sweep = now + REAP_INTERVAL
+        finally:
+            for conn in list(connections.values()):
+                self._close_connection(selector, connections, conn)
+            selector.close()
+            if self.wakeup is not None:
+                for sock in self.wakeup:
+                    sock.close()
+
+    def _accept_ready(self, selector, connections):
+        """
+        Accepts every pending connection on the listening socket.
+
+        Returns:
+            bool: False if accepting must pause for ACCEPT_BACKOFF seconds because
+            the process ran out of descriptors or buffers.
+        """
+        while True:
+            try:
                 client_socket, addr = self.server_socket.accept()
-                print(f"Accepted connection from {addr[0]}:{addr[1]}")
-                # Start a new thread to handle the client
-                thread = threading.Thread(target=self.handle_client, args=(client_socket, addr))
-                thread.start()
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError as e:
+                if e.errno not in ACCEPT_ERRORS:
+                    raise
+                self.log(f"Error accepting connection: {e}", verbose=False)
+                if e.errno == errno.ECONNABORTED:
+                    continue  # That client is gone; the next may be waiting
+                return False
+            self.metrics.observe_accept()
+            self.log(f"Accepted connection from {addr[0]}:{addr[1]}")
+            client_socket.setblocking(False)
+            # Pipelined responses are written separately; don't let Nagle hold them back
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.tls_context is not None:
+                # The handshake is driven by _handshake_ready() as records arrive
+                client_socket = self.tls_context.wrap_socket(
+                    client_socket, server_side=True, do_handshake_on_connect=False)
+            conn = _Connection(client_socket, addr)
+            if self.profiler is not None:
+                conn.accepted = time.perf_counter()
+            connections[client_socket.fileno()] = conn
+            selector.register(client_socket, conn.events, conn)
+            self.reaper.register(conn)
+            with self.connections_lock:
+                self.active_connections += 1
+
+    def _handshake_ready(self, selector, connections, conn):
+        """
+        Advances the TLS handshake of a connection without blocking.
+
+        Interest follows what OpenSSL is waiting for. Once the handshake completes,
+        the request may already have arrived along with the client's last
+        handshake message, so it is read right away.
+        """
+        try:
+            conn.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            events = selectors.EVENT_READ
+        except ssl.SSLWantWriteError:
+            events = selectors.EVENT_WRITE
+        except OSError as e:
+            self.log(f"TLS handshake failed: {e}", verbose=False)
+            self._close_connection(selector, connections, conn)
+            return
+        else:
+            conn.handshaking = False
+            events = selectors.EVENT_READ
+        self.reaper.touch(conn)
+        if events != conn.events:
+            conn.events = events
+            selector.modify(conn.sock, events, conn)
+        if not conn.handshaking:
+            self._read_ready(selector, connections, conn)
+
+    def _read_ready(self, selector, connections, conn):
+        """Reads available bytes and dispatches every complete request in the buffer."""
+        try:
+            chunk = conn.sock.recv(65536)
+            if isinstance(conn.sock, ssl.SSLSocket) and conn.sock.pending():
+                # Decrypted bytes buffered by TLS don't make the socket readable again
+                chunks = [chunk]
+                while conn.sock.pending():
+                    chunks.append(conn.sock.recv(65536))
+                chunk = b"".join(chunks)
+        except WOULD_BLOCK:
+            return
+        except OSError as e:
+            self.log(f"Error when handling client: {e}", verbose=False)
+            self._close_connection(selector, connections, conn)
+            return
+        if not chunk:  # Client closed the connection
+            self.log("Client closed the connection.")
+            self._close_connection(selector, connections, conn)
+            return
+        self.reaper.touch(conn)
+        if self.profiler is not None and conn.received is None and conn.upload is None:
+            conn.received = time.perf_counter()
+        conn.parser.feed(chunk)
+        self._handle_input(selector, connections, conn)
+
+    def _handle_input(self, selector, connections, conn):
+        """Processes buffered input, turning errors into responses or a closed connection."""
+        try:
+            self._process_input(conn)
+        except ParseError as e:
+            self.log(f"Bad request: {e}", verbose=False)
+            self.metrics.observe_request("-", "-", e.status, 0, 0, None)
+            self.handle_error(conn.writer, e.status, e.reason)
+            conn.closing = True
+        except RequestRejected as e:
+            self.log(f"Rejected request: {e}", verbose=False)
+            conn.closing = True
+        except Exception as e:
+            self.log(f"Error when handling client: {e}", verbose=False)
+            self._close_connection(selector, connections, conn)
+            return
+        if conn.writer.chunks or conn.closing:
+            self._write_ready(selector, connections, conn)
+
+    def _process_input(self, conn):
+        """
+        Dispatches every complete request in order and feeds body bytes to uploads.
+
+        With group commit, a completed upload is handed to the syncer and the
+        following requests wait until it has been acknowledged, so responses stay
+        in order. Once OUTPUT_HIGH_WATER bytes or OUTPUT_MAX_CHUNKS pieces of output
+        are queued, the connection is paused: no more requests are dispatched or
+        read until _write_ready() has drained it below the low-water mark.
+        """
+        while not conn.closing and not conn.committing:
+            if conn.upload is None and (conn.writer.pending >= OUTPUT_HIGH_WATER
+                                        or len(conn.writer.chunks) >= OUTPUT_MAX_CHUNKS):
+                # A client pipelining without reading its responses; wait for them to drain
+                conn.paused = True
+                return
+            if conn.upload is not None:
+                data = conn.parser.take(BODY_CHUNK_SIZE)
+                while data:
+                    conn.upload.write(data)
+                    if conn.upload.remaining is None:
+                        self.check_upload_size(conn.writer, conn.upload)
+                    data = conn.parser.take(BODY_CHUNK_SIZE)
+                if conn.parser.body_pending:
+                    return
+                upload, conn.upload = conn.upload, None
+                if self.durability.asynchronous:
+                    conn.committing = True
+                    upload.commit(lambda error: self._commit_done(conn, upload, error))
+                    return
+                status, _ = self.finish_post(conn.writer, upload)
+                conn.closing = self._request_done(conn, status)
+                continue
+            request = conn.parser.next_request()
+            if request is None:
+                return
+            conn.keep_alive = request.keep_alive
+            self.reaper.request_started(conn)
+            if self.profiler is not None:
+                self._begin_trace(conn, request)
+            conn.upload = self.dispatch(conn.writer, request, conn.trace)
+            if conn.upload is None:
+                conn.closing = self._request_done(conn)
+
+    def _begin_trace(self, conn, request):
+        """Starts tracing a request of an event-loop connection if the profiler is on."""
+        if conn.trace is not None:
+            # A pipelined request follows before the previous response was flushed
+            self._finish_trace(conn)
+        if self.profiler.active:
+            first_byte = None
+            if conn.accepted is not None and conn.received is not None:
+                first_byte = conn.received - conn.accepted
+            conn.trace = self.profiler.begin(request.method, request.path, conn.received, first_byte)
+        conn.accepted = conn.received = None
+
+    def _request_done(self, conn, status=None):
+        """
+        Completes a request of an event-loop connection.
+
+        Args:
+            conn (_Connection): The connection.
+            status (int): The response status, if dispatch() didn't set it on the trace.
+
+        Returns:
+            bool: Whether the connection should close once its output is flushed.
+        """
+        trace = conn.trace
+        if trace is not None:
+            if status is not None:
+                trace.status = status
+            trace.io = max(0.0, time.perf_counter() - trace.started - trace.parse)
+        return not conn.keep_alive or self.reaper.request_finished(conn)
+
+    def _finish_trace(self, conn):
+        """Hands a connection's trace to the profiler once its response is out."""
+        trace, conn.trace = conn.trace, None
+        self.profiler.finish(trace)
+
+    def _commit_done(self, conn, upload, error):
+        """Passes a group commit's outcome from the syncer thread to the event loop."""
+        self.completions.append((conn, upload, error))
+        try:
+            self.wakeup[1].send(b"\0")
+        except OSError:
+            pass  # The socket buffer is full of wakeups already
+
+    def _commits_ready(self, selector, connections):
+        """Acknowledges uploads whose group commit finished and resumes their connections."""
+        try:
+            while self.wakeup[0].recv(4096):
+                pass
+        except OSError:
+            pass
+        while self.completions:
+            conn, upload, error = self.completions.popleft()
+            conn.committing = False
+            if connections.get(conn.sock.fileno()) is not conn:
+                continue  # Closed while its upload was being committed
+            if error is not None:
+                self.log(f"Error when handling client: {error}", verbose=False)
+                self._close_connection(selector, connections, conn)
+                continue
+            try:
+                status, _ = self.acknowledge_post(conn.writer, upload)
+                conn.closing = self._request_done(conn, status)
+            except Exception as e:
+                self.log(f"Error when handling client: {e}", verbose=False)
+                self._close_connection(selector, connections, conn)
+                continue
+            self._handle_input(selector, connections, conn)
+
+    def _write_ready(self, selector, connections, conn):
+        """Flushes queued response bytes and toggles write interest accordingly."""
+        trace = conn.trace
+        started = time.perf_counter() if trace is not None else None
+        try:
+            drained = conn.writer.flush(conn.sock)
+        except OSError as e:
+            self.log(f"Error when handling client: {e}", verbose=False)
+            self._close_connection(selector, connections, conn)
+            return
+        if trace is not None:
+            trace.send += time.perf_counter() - started
+            if drained and trace.status is not None:
+                self._finish_trace(conn)
+        self.reaper.touch(conn)
+        if drained and conn.closing:
+            self._close_connection(selector, connections, conn)
+            return
+        if conn.paused and (conn.writer.pending <= OUTPUT_LOW_WATER
+                            and len(conn.writer.chunks) <= OUTPUT_MAX_CHUNKS // 4):
+            conn.paused = False
+            self.resumed.append(conn)
+        # A paused connection isn't read from, so the kernel pushes back on the client
+        events = 0 if conn.paused else selectors.EVENT_READ
+        if not drained:
+            events |= selectors.EVENT_WRITE
+        if events != conn.events:
+            conn.events = events
+            selector.modify(conn.sock, events, conn)
+
+    def _close_connection(self, selector, connections, conn):
+        """Unregisters and closes a connection owned by the event loop."""
+        if connections.pop(conn.sock.fileno(), None) is None:
+            return
+        selector.unregister(conn.sock)
+        self.reaper.unregister(conn)
+        if conn.upload is not None:
+            conn.upload.abort()
+        if conn.trace is not None:
+            self._finish_trace(conn)
+        conn.writer.close()
+        if isinstance(conn.sock, ssl.SSLSocket) and not conn.handshaking:
+            close_notify(conn.sock)
+        conn.sock.close()
+        with self.connections_lock:
+            self.active_connections -= 1
+        self.log(f"Connection closed for client {conn.addr}. Active connections: {self.active_connections}")
+
+    def serve(self):
+        """Runs the engine selected by the server mode on the listening socket."""
+        if self.access_log is not None:
+            self.access_log.start()
+        self.durability.start()
+        if self.profiler is not None:
+            self.profiler.start()
+        if self.stats_interval > 0:
+            threading.Thread(target=self._report_stats, daemon=True).start()
+        if self.mode != "selectors":
+            threading.Thread(target=self._reap_blocking, daemon=True).start()
+        try:
+            if self.mode == "selectors":
+                self.run_event_loop()
+            elif self.mode == "pool":
+                self.run_pool()
+            else:
+                self.run_threaded()
+        finally:
+            if self.access_log is not None:
+                self.access_log.close()
+
+    def bind(self, reuse_port=False):
+        """
+        Binds the listening socket to the configured address and starts listening.
+
+        Args:
+            reuse_port (bool): Set SO_REUSEPORT first so several processes can bind
+                the same address and let the kernel balance connections between them.
+        """
+        if reuse_port:
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        # Bind the socket to the host and port
+        self.server_socket.bind((self.host, self.port))
+        # Listen for incoming connections
+        self.server_socket.listen(self.backlog)
+        scheme = "https" if self.tls_context is not None else "http"
+        print(f"Listening on {scheme}://{self.host}:{self.port} ({self.mode} mode, pid {os.getpid()})")
+
+    def run_server(self):
+        """
+        Starts the server to accept incoming client connections.
+        Binds and listens on the configured address, then hands the listening
+        socket to the engine selected by the server mode.
+        """
+        try:
+            self.bind()
+            self.serve()
         except Exception as e:
             print(f"Error: {e}")
         finally:
             self.server_socket.close()  # Ensure socket is closed on server shutdown
 
+    def run_prefork(self, workers):
+        """
+        Runs the server as a supervisor process with several forked worker processes.
+
+        Args:
+            workers (int): Number of worker processes to keep running.
+
+        Each worker binds its own listening socket with SO_REUSEPORT, so the kernel
+        spreads connections across processes and each has its own GIL. Where
+        SO_REUSEPORT is missing the supervisor binds once and the workers share the
+        inherited socket. Workers that die are restarted; SIGINT or SIGTERM stops
+        them all and waits for them to exit.
+        """
+        if not hasattr(os, "fork"):
+            print("Prefork is not supported on this platform, running a single process.")
+            self.run_server()
+            return
+        shared = not hasattr(socket, "SO_REUSEPORT")
+        if shared:
+            self.bind()
+        else:
+            self.server_socket.close()
+        children = {}
+        stopping = False
+
+        def spawn():
+            sys.stdout.flush()  # Don't let the worker inherit unwritten output
+            pid = os.fork()
+            if pid == 0:
+                # Worker: shutdown is coordinated by the supervisor's SIGTERM
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                status = 1
+                try:
+                    if self.access_log is not None and self.access_log.path is not None:
+                        # One log per worker; rotation can't be shared between processes
+                        self.access_log.path += f".{os.getpid()}"
+                    if not shared:
+                        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        self.bind(reuse_port=True)
+                    self.serve()
+                except Exception as e:
+                    print(f"Error: {e}")
+                finally:
+                    self.server_socket.close()
+                    sys.stdout.flush()
+                    os._exit(status)
+            children[pid] = time.monotonic()
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        for _ in range(workers):
+            spawn()
+        print(f"Supervisor {os.getpid()} started {workers} workers")
+        try:
+            while children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                started = children.pop(pid, None)
+                if started is None or stopping:
+                    continue
+                print(f"Worker {pid} exited with status {status}, restarting")
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # Avoid a tight restart loop when workers crash at startup
+                if not stopping:
+                    spawn()
+        finally:
+            if shared:
+                self.server_socket.close()
+            print("All workers stopped")
+
+
+def parse_args(argv=None):
+    """Parses the server's command-line options."""
+    parser = argparse.ArgumentParser(description="Simple HTTP file server.")
+    parser.add_argument("port", nargs="?", type=int, default=80,
+                        help="port to listen on (default: 80)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind to")
+    parser.add_argument("--mode", choices=SERVER_MODES, default="threaded",
+                        help="serving engine: thread per connection, bounded worker pool "
+                             "or a single event loop")
+    parser.add_argument("--backlog", type=int, default=128, help="listen backlog")
+    parser.add_argument("--pool-size", type=int, default=32,
+                        help="worker threads in pool mode")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="connections waiting for a worker before 503s are sent")
+    parser.add_argument("--retry-after", type=int, default=1,
+                        help="Retry-After seconds sent with 503 responses")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="seconds between pool/cache/compression statistics printouts "
+                             "(0 disables)")
+    parser.add_argument("--cache-size", type=int, default=64,
+                        help="response cache budget in MB (0 disables the cache)")
+    parser.add_argument("--cache-max-object", type=int, default=1024,
+                        help="largest file in KB kept in the response cache")
+    parser.add_argument("--max-upload-size", type=int, default=1024,
+                        help="largest accepted POST body in MB (larger ones get 413)")
+    parser.add_argument("--compress-min-size", type=int, default=1024,
+                        help="smallest text file in bytes sent gzip/deflate encoded "
+                             "(-1 disables compression)")
+    parser.add_argument("--idle-timeout", type=float, default=20,
+                        help="keep-alive idle timeout in seconds while the server is quiet")
+    parser.add_argument("--min-idle-timeout", type=float, default=5,
+                        help="idle timeout in seconds once --busy-connections are open")
+    parser.add_argument("--busy-connections", type=int, default=15,
+                        help="open connections at which the idle timeout bottoms out")
+    parser.add_argument("--max-requests-per-connection", type=int, default=0,
+                        help="requests served before a connection is closed (0: no limit)")
+    parser.add_argument("--max-connection-age", type=float, default=0,
+                        help="seconds after which a connection is closed between requests (0: no limit)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="store uploads once per distinct content, hard-linked from their paths")
+    parser.add_argument("--dedup-dir", default=".blobs",
+                        help="blob store directory for --dedup, on the same file system as the files")
+    parser.add_argument("--durability", choices=DURABILITY_MODES, default="fsync-per-request",
+                        help="how uploads reach the disk before they are acknowledged: synced "
+                             "one by one, synced in batches by a background syncer, or not synced")
+    parser.add_argument("--group-commit-window", type=float, default=0, metavar="MS",
+                        help="milliseconds the group-commit syncer waits to gather more uploads")
+    parser.add_argument("--profiling", action="store_true",
+                        help="allow request instrumentation, switched on and off at runtime "
+                             "through GET /__profile")
+    parser.add_argument("--profile-phases", action="store_true",
+                        help="trace the phases of every request from the start")
+    parser.add_argument("--slow-request-ms", type=float, default=-1, metavar="MS",
+                        help="log requests slower than this with their phase breakdown "
+                             "(implies --profiling; -1 disables)")
+    parser.add_argument("--profile-requests", type=int, default=0, metavar="N",
+                        help="run the first N requests under cProfile (implies --profiling)")
+    parser.add_argument("--tracemalloc-interval", type=float, default=0, metavar="SECONDS",
+                        help="seconds between tracemalloc snapshots (implies --profiling; "
+                             "0 disables)")
+    parser.add_argument("--profile-dir", default=".",
+                        help="directory for cProfile output and tracemalloc snapshots")
+    parser.add_argument("--listings", action="store_true",
+                        help="answer GETs for directories with a generated HTML listing")
+    parser.add_argument("--tls-cert", metavar="PEM",
+                        help="certificate chain to serve HTTPS with instead of HTTP")
+    parser.add_argument("--tls-key", metavar="PEM",
+                        help="private key for --tls-cert, if not included in the certificate file")
+    parser.add_argument("--tls-tickets", type=int, default=2,
+                        help="TLS 1.3 session tickets issued per handshake (0 disables TLS 1.3 resumption)")
+    parser.add_argument("--tls-session-cache", action="store_true",
+                        help="keep TLS sessions in a per-process server cache instead of "
+                             "stateless tickets")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes to prefork (1 runs a single process)")
+    parser.add_argument("--access-log", default="-",
+                        help="access log file, '-' for standard output or 'off' to disable logging")
+    parser.add_argument("--log-connections", action="store_true",
+                        help="also log connection accept/close/timeout events")
+    parser.add_argument("--log-flush-interval", type=float, default=1.0,
+                        help="seconds between access log writes")
+    parser.add_argument("--log-queue-size", type=int, default=10000,
+                        help="access log entries buffered before new ones are dropped")
+    parser.add_argument("--log-max-bytes", type=int, default=100,
+                        help="access log size in MB that triggers rotation")
+    parser.add_argument("--log-backups", type=int, default=5,
+                        help="rotated access log files to keep")
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
-    try:
-        port = int(sys.argv[1])  # Optional port argument
-    except Exception as e:
-        print("No port found, using default port 80")
-        port = 80
-    server = Server(port=port)
-    server.run_server()  # Run the server
+    args = parse_args()
+    access_log = None
+    if args.access_log != "off":
+        access_log = AccessLog(None if args.access_log == "-" else args.access_log,
+                               flush_interval=args.log_flush_interval,
+                               queue_size=args.log_queue_size,
+                               max_bytes=args.log_max_bytes * 1024 * 1024,
+                               backups=args.log_backups,
+                               log_connections=args.log_connections)
+    profiler = None
+    if (args.profiling or args.profile_phases or args.slow_request_ms >= 0
+            or args.profile_requests > 0 or args.tracemalloc_interval > 0):
+        profiler = Profiler(args.profile_dir)
+        profiler.configure(phases=args.profile_phases, slow_ms=args.slow_request_ms,
+                           profile_requests=args.profile_requests,
+                           tracemalloc_interval=args.tracemalloc_interval)
+    server = Server(host=args.host, port=args.port, mode=args.mode, backlog=args.backlog,
+                    pool_size=args.pool_size, queue_size=args.queue_size,
+                    retry_after=args.retry_after, stats_interval=args.stats_interval,
+                    cache_size=args.cache_size * 1024 * 1024,
+                    cache_max_object=args.cache_max_object * 1024,
+                    max_upload_size=args.max_upload_size * 1024 * 1024,
+                    compress_min_size=args.compress_min_size, access_log=access_log,
+                    listings=args.listings, idle_timeout=args.idle_timeout,
+                    min_idle_timeout=args.min_idle_timeout,
+                    busy_connections=args.busy_connections,
+                    max_requests_per_connection=args.max_requests_per_connection,
+                    max_connection_age=args.max_connection_age,
+                    tls_cert=args.tls_cert, tls_key=args.tls_key, tls_tickets=args.tls_tickets,
+                    tls_session_cache=args.tls_session_cache,
+                    dedup_dir=args.dedup_dir if args.dedup else None,
+                    durability=args.durability,
+                    group_commit_window=args.group_commit_window / 1000, profiler=profiler)
+    if args.workers > 1:
+        server.run_prefork(args.workers)
+    else:
+        server.run_server()  # Run the server
@@ -0,0 +1,69 @@
+import ssl
+
+SESSION_STAT_NAMES = ("accept", "accept_good", "hits", "misses", "timeouts", "cache_full", "number")
+
+
+def create_server_context(certfile, keyfile=None, tickets=2, session_cache=False,
+                          session_timeout=None):
+    """
+    Builds the TLS context shared by every connection of the server.
+
+    Args:
+        certfile (str): PEM certificate chain.
+        keyfile (str): PEM private key, if not included in certfile.
+        tickets (int): TLS 1.3 session tickets sent after each handshake; 0
+            disables TLS 1.3 resumption.
+        session_cache (bool): Keep session state in the server's session cache
+            (TLS 1.2 session IDs, stateful TLS 1.3 tickets) instead of handing it
+            to the client in encrypted stateless tickets.
+        session_timeout (int): Seconds a session can be resumed; None keeps the
+            OpenSSL default.
+
+    Returns:
+        ssl.SSLContext: The server context.
+
+    Stateless ticket keys belong to the context, so creating it before prefork
+    workers are forked lets a ticket issued by one worker be accepted by any
+    other. The session cache is per process: with several workers a client only
+    resumes when the kernel hands its connection to the same worker again.
+    """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_cert_chain(certfile, keyfile)
+    context.num_tickets = tickets
+    if session_cache:
+        context.options |= ssl.OP_NO_TICKET
+    # Requests are framed by HTTP, so a client closing without close_notify isn't
+    # a truncation; OpenSSL 3 would otherwise fail it and evict its cached session
+    context.options |= getattr(ssl, "OP_IGNORE_UNEXPECTED_EOF", 0)
+    if session_timeout is not None:
+        context.session_timeout = session_timeout
+    return context
+
+
+def close_notify(sock):
+    """
+    Sends the TLS close_notify alert on a connection about to be closed.
+
+    OpenSSL drops a session from the server's session cache when its connection
+    ends without close_notify, which a plain close() never sends. The peer's
+    close_notify is not waited for.
+    """
+    try:
+        sock.setblocking(False)
+        sock.unwrap()
+    except (ssl.SSLError, OSError, ValueError):
+        pass  # Sent, or the connection is already gone
+
+
+def session_stats(context):
+    """
+    Returns the handshake and session cache counters of a server context.
+
+    Returns:
+        dict: Handshakes started and completed, sessions resumed (hits), resumption
+        attempts that found no session (misses), expired sessions, sessions
+        refused because the cache was full and sessions currently cached.
+    """
+    stats = context.session_stats()
+    return {name: stats.get(name, 0) for name in SESSION_STAT_NAMES}
@@ -0,0 +1,437 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(TEST_DIR, "..", "Server")
+sys.path.insert(0, TEST_DIR)
+from file_generator import generate_payload
+
+MODES = ("threaded", "pool", "selectors")
+SCENARIOS = ("get", "post", "mixed", "new-connection")
+DEFAULT_SIZES = ("1K", "64K", "1M", "16M", "256M", "1G")
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+MIXED_POST_RATIO = 0.2
+RECV_SIZE = 1024 * 1024
+
+
+def parse_size(text):
+    """Parses a size such as "64K" or "1G" into bytes."""
+    text = text.strip().upper()
+    if text[-1:] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return str(size)
+
+
+def percentile(sorted_values, p):
+    """Returns the p-th percentile of an already sorted list, interpolating linearly."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not start listening on port {port}")
+            time.sleep(0.05)
+
+
+class ServerProcess:
+    """Runs the server on an ephemeral port as a subprocess or on a thread of this process."""
+
+    def __init__(self, mode, root, max_upload_size, in_process=False, server_args=()):
+        """
+        Attributes:
+            root (str): Directory the server serves files from and uploads into.
+            max_upload_size (int): Upload limit in bytes, at least the largest payload.
+            server_args (list): Extra command-line options of the server subprocess.
+            port (int): Port the server listens on once started.
+        """
+        self.mode = mode
+        self.root = root
+        self.max_upload_size = max_upload_size
+        self.in_process = in_process
+        self.server_args = list(server_args)
+        self.port = None
+        self.process = None
+        self.server = None
+
+    def __enter__(self):
+        upload_mb = -(-self.max_upload_size // (1024 * 1024))
+        if self.in_process:
+            # The server resolves paths against the working directory of this process
+            os.chdir(self.root)
+            if SERVER_DIR not in sys.path:
+                sys.path.insert(0, SERVER_DIR)
+            from server import Server
+            self.server = Server("127.0.0.1", 0, self.mode,
+                                 max_upload_size=upload_mb * 1024 * 1024)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.server.bind()
+            self.port = self.server.server_socket.getsockname()[1]
+            # Daemon thread: the server has no shutdown hook and exits with the suite
+            threading.Thread(target=self.server.serve, daemon=True).start()
+        else:
+            self.port = free_port()
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.join(SERVER_DIR, "server.py"), str(self.port),
+                 "--mode", self.mode, "--access-log", "off",
+                 "--max-upload-size", str(upload_mb)] + self.server_args,
+                cwd=self.root, stdout=subprocess.DEVNULL)
+        wait_for_port(self.port)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+def read_response(sock, buffer):
+    """
+    Reads one response and discards its body.
+
+    Returns:
+        tuple: (status code, body bytes received, True if the connection stays open).
+    """
+    head = b""
+    while b"\r\n\r\n" not in head:
+        count = sock.recv_into(buffer)
+        if not count:
+            raise ConnectionError("Connection closed while reading headers")
+        head += buffer[:count]
+    head, _, body = head.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    content_length = 0
+    keep_alive = True
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            content_length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    received = len(body)
+    while received < content_length:
+        count = sock.recv_into(buffer, min(len(buffer), content_length - received))
+        if not count:
+            raise ConnectionError("Connection closed while reading body")
+        received += count
+    return status, received, keep_alive
+
+
+class Workload:
+    """One benchmark case: a scenario run against one payload size."""
+
+    def __init__(self, port, scenario, size, payload, requests, concurrency, seed):
+        """
+        Attributes:
+            payload (str): Name of the payload file, both GET target and POST body.
+            requests (int): Requests sent in total.
+            concurrency (int): Client threads, each with its own connection.
+        """
+        self.port = port
+        self.scenario = scenario
+        self.size = size
+        self.payload = payload
+        self.requests = requests
+        self.concurrency = concurrency
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.latencies = []
+        self.errors = {}
+
+    def take(self):
+        """Claims the next request number, or returns None once all are issued."""
+        with self.lock:
+            if self.issued == self.requests:
+                return None
+            self.issued += 1
+            return self.issued
+
+    def send(self, sock, method, index, keep_alive, buffer):
+        connection = "keep-alive" if keep_alive else "close"
+        if method == "GET":
+            sock.sendall(f"GET {self.payload} HTTP/1.1\r\nConnection: {connection}\r\n\r\n".encode())
+        else:
+            path = f"upload_{self.size}_{index % self.concurrency}.bin"
+            sock.sendall(f"POST {path} HTTP/1.1\r\nConnection: {connection}\r\n"
+                         f"Content-Length: {self.size}\r\n\r\n".encode())
+            with open(self.payload, "rb") as f:
+                sock.sendfile(f)
+        status, received, open_after = read_response(sock, buffer)
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+        if method == "GET" and received != self.size:
+            raise RuntimeError("short body")
+        return keep_alive and open_after
+
+    def client(self, worker):
+        rng = random.Random(f"{self.seed}:{self.scenario}:{self.size}:{worker}")
+        buffer = bytearray(RECV_SIZE)
+        keep_alive = self.scenario != "new-connection"
+        sock = None
+        latencies = []
+        errors = {}
+        while (index := self.take()) is not None:
+            if self.scenario == "post":
+                method = "POST"
+            elif self.scenario == "mixed":
+                method = "POST" if rng.random() < MIXED_POST_RATIO else "GET"
+            else:
+                method = "GET"
+            start = time.perf_counter()
+            try:
+                if sock is None:
+                    sock = socket.create_connection(("127.0.0.1", self.port))
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if not self.send(sock, method, index, keep_alive, buffer):
+                    sock.close()
+                    sock = None
+                latencies.append(time.perf_counter() - start)
+            except (OSError, RuntimeError, ValueError, IndexError) as e:
+                kind = str(e) if isinstance(e, RuntimeError) else type(e).__name__
+                errors[kind] = errors.get(kind, 0) + 1
+                if sock is not None:
+                    sock.close()
+                    sock = None
+        if sock is not None:
+            sock.close()
+        with self.lock:
+            self.latencies += latencies
+            for kind, count in errors.items():
+                self.errors[kind] = self.errors.get(kind, 0) + count
+
+    def run(self):
+        """
+        Runs the case to completion.
+
+        Returns:
+            dict: Request and error counts, elapsed seconds, throughput in requests
+            and megabytes per second, and mean, p50, p90 and p99 latency in seconds.
+        """
+        threads = [threading.Thread(target=self.client, args=(worker,))
+                   for worker in range(self.concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "elapsed": elapsed,
+            "rps": len(latencies) / elapsed,
+            "mb_per_s": len(latencies) * self.size / elapsed / (1024 * 1024),
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+        }
+
+
+def prepare_payloads(directory, sizes, seed):
+    """Generates missing payload files, reusing ones left by earlier runs with the same seed."""
+    names = {}
+    for size in sizes:
+        name = f"payload_{format_size(size)}_{seed}.bin"
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            print(f"Generating {format_size(size)} payload...")
+            generate_payload(path, size, seed)
+        names[size] = name
+    return names
+
+
+def run_suite(args):
+    sizes = [parse_size(size) for size in args.sizes]
+    payload_dir = os.path.abspath(args.payload_dir)
+    os.makedirs(payload_dir, exist_ok=True)
+    payloads = prepare_payloads(payload_dir, sizes, args.seed)
+    output = os.path.abspath(args.output)
+    cwd = os.getcwd()
+    results = {}
+
+    print(f"{'Case':36s} | {'Req/s':>9s} | {'MB/s':>8s} | {'p50 ms':>8s} | {'p99 ms':>8s} | Errors")
+    print("-" * 90)
+    try:
+        for mode in args.modes:
+            with ServerProcess(mode, payload_dir, max(sizes), args.in_process,
+                               shlex.split(args.server_args)) as server:
+                os.chdir(payload_dir)
+                for scenario in args.scenarios:
+                    for size in sizes:
+                        requests = max(args.min_requests,
+                                       min(args.requests, args.max_bytes * 1024 * 1024 // size))
+                        workload = Workload(server.port, scenario, size, payloads[size],
+                                            requests, min(args.concurrency, requests), args.seed)
+                        result = workload.run()
+                        result.update(mode=mode, scenario=scenario, size=size,
+                                      concurrency=workload.concurrency)
+                        key = f"{mode}/{scenario}/{format_size(size)}"
+                        results[key] = result
+                        errors = sum(result["errors"].values())
+                        print(f"{key:36s} | {result['rps']:9.1f} | {result['mb_per_s']:8.1f} | "
+                              f"{_ms(result['p50'])} | {_ms(result['p99'])} | {errors}")
+                os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        for name in os.listdir(payload_dir):
+            if name.startswith(("upload_", ".upload-")):
+                os.remove(os.path.join(payload_dir, name))
+
+    baseline = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "in_process": args.in_process,
+            "concurrency": args.concurrency,
+            "server_args": args.server_args,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(baseline, f, indent=2)
+    print(f"\nResults saved as '{output}'")
+
+
+def _ms(seconds):
+    return "       -" if seconds is None else f"{seconds * 1000:8.2f}"
+
+
+def _change(baseline, current):
+    return (current - baseline) / baseline * 100 if baseline else 0.0
+
+
+def compare(args):
+    """
+    Compares a results file against a baseline.
+
+    Returns:
+        int: 1 if any case regressed by more than the threshold, else 0.
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+    floor = args.latency_floor / 1000
+
+    print(f"{'Case':36s} | {'Req/s':>8s} | {'p50':>8s} | {'p99':>8s} | Verdict")
+    print("-" * 80)
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[key], current[key]
+        problems = []
+        rps_change = _change(old["rps"], new["rps"])
+        if rps_change < -args.threshold:
+            problems.append("throughput")
+        latency_changes = []
+        for name in ("p50", "p99"):
+            if old[name] is None or new[name] is None:
+                latency_changes.append(0.0)
+                continue
+            change = _change(old[name], new[name])
+            latency_changes.append(change)
+            if change > args.threshold and new[name] - old[name] > floor:
+                problems.append(name)
+        if sum(new["errors"].values()) > sum(old["errors"].values()):
+            problems.append("errors")
+        verdict = f"REGRESSION ({', '.join(problems)})" if problems else "ok"
+        regressions += bool(problems)
+        print(f"{key:36s} | {rps_change:+7.1f}% | {latency_changes[0]:+7.1f}% | "
+              f"{latency_changes[1]:+7.1f}% | {verdict}")
+    missing = len(baseline.keys() - current.keys())
+    if missing:
+        print(f"{missing} baseline case(s) not in {args.current}")
+
+    print(f"\n{regressions} regression(s) beyond {args.threshold:g}%")
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the server across modes, scenarios and payload sizes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and save the results")
+    run.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    run.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                     help="get, post and mixed use keep-alive connections; new-connection "
+                          "opens a connection per GET")
+    run.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES),
+                     help="payload sizes, e.g. 1K 64K 1M 1G")
+    run.add_argument("--requests", type=int, default=200, help="requests per case")
+    run.add_argument("--max-bytes", type=int, default=2048,
+                     help="payload MB per case; fewer requests are sent for large payloads")
+    run.add_argument("--min-requests", type=int, default=2, help="requests per case at the least")
+    run.add_argument("--concurrency", type=int, default=8, help="client connections per case")
+    run.add_argument("--seed", type=int, default=0, help="seed of the payloads and request mix")
+    run.add_argument("--payload-dir", default=os.path.join(tempfile.gettempdir(), "socket-bench"),
+                     help="where payloads are generated and kept between runs")
+    run.add_argument("--in-process", action="store_true",
+                     help="run the server on a thread of the benchmark instead of a subprocess")
+    run.add_argument("--server-args", default="",
+                     help="extra server options, e.g. \"--profiling --stats-interval 1\" to "
+                          "measure instrumentation overhead (not with --in-process)")
+    run.add_argument("--output", default="bench_results.json", help="results file")
+
+    cmp = commands.add_parser("compare", help="flag regressions against a baseline")
+    cmp.add_argument("baseline", help="results file of the baseline run")
+    cmp.add_argument("current", help="results file of the run to judge")
+    cmp.add_argument("--threshold", type=float, default=10.0,
+                     help="percent change in throughput or latency counted as a regression")
+    cmp.add_argument("--latency-floor", type=float, default=0.5,
+                     help="latency increases below this many ms are never regressions")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        sys.exit(compare(args))
+    if args.in_process and args.server_args:
+        sys.exit("--server-args needs a server subprocess; drop --in-process")
+    run_suite(args)
+
+
+if __name__ == '__main__':
+    main()
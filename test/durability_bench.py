@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(TEST_DIR, "..", "Server")
+sys.path.insert(0, TEST_DIR)
+sys.path.insert(0, SERVER_DIR)
+from bench import format_size, free_port, parse_size, percentile, read_response, wait_for_port
+from durability import DURABILITY_MODES
+
+MODES = ("threaded", "pool", "selectors")
+
+
+def upload_loop(port, client, count, body, latencies, errors):
+    """
+    Sends count uploads of body over one keep-alive connection, each to its own file.
+
+    Ack latency runs from the last body byte being handed to the kernel to the
+    response, so it covers the commit but not the transfer of the body.
+    """
+    buffer = bytearray(65536)
+    try:
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            for i in range(count):
+                sock.sendall(b"POST up-%d-%d.bin HTTP/1.1\r\nContent-Length: %d\r\n\r\n"
+                             % (client, i, len(body)))
+                sock.sendall(body)
+                sent = time.perf_counter()
+                status, _, _ = read_response(sock, buffer)
+                if status != 200:
+                    errors.append(status)
+                    continue
+                latencies.append(time.perf_counter() - sent)
+    except OSError as e:
+        errors.append(type(e).__name__)
+
+
+def durability_metrics(port):
+    """Returns the durability_* metrics of the server."""
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(b"GET __metrics HTTP/1.1\r\nConnection: close\r\n\r\n")
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    metrics = {}
+    for line in data.decode("utf-8").split("\r\n\r\n", 1)[-1].splitlines():
+        if line.startswith("durability_"):
+            name, _, value = line.partition(" ")
+            metrics[name] = float(value)
+    return metrics
+
+
+def run_case(args, mode, durability, body):
+    """Starts a server and runs the concurrent upload clients against it."""
+    root = tempfile.mkdtemp(prefix="durability-bench-", dir=args.dir)
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "server.py"), str(port), "--mode", mode,
+         "--access-log", "off", "--durability", durability,
+         "--group-commit-window", str(args.window),
+         "--max-upload-size", str(-(-len(body) // (1024 * 1024)))] + (["--dedup"] if args.dedup else []),
+        cwd=root, stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        latencies, errors = [], []
+        threads = [threading.Thread(target=upload_loop,
+                                    args=(port, client, args.uploads, body, latencies, errors))
+                   for client in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        metrics = durability_metrics(port)
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(root, ignore_errors=True)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "durability": durability,
+        "uploads": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "uploads_per_second": len(latencies) / elapsed,
+        "mb_per_second": len(latencies) * len(body) / elapsed / (1024 * 1024),
+        "ack_p50_ms": (percentile(latencies, 50) or 0) * 1000,
+        "ack_p99_ms": (percentile(latencies, 99) or 0) * 1000,
+        "commits": int(metrics.get("durability_commits_total", 0)),
+        "largest_batch": int(metrics.get("durability_largest_batch", 0)),
+    }
+
+
+def run(args):
+    body = os.urandom(args.size)
+    results = []
+    print(f"{args.clients} clients x {args.uploads} uploads of {format_size(args.size)}, "
+          f"group commit window {args.window}ms")
+    print(f"{'mode':<10} {'durability':<18} {'uploads/s':>10} {'MB/s':>8} {'ack p50':>9} "
+          f"{'ack p99':>9} {'commits':>8} {'batch':>6} {'errors':>6}")
+    for mode in args.modes:
+        for durability in args.durability:
+            result = run_case(args, mode, durability, body)
+            results.append(result)
+            print(f"{mode:<10} {durability:<18} {result['uploads_per_second']:10.1f} "
+                  f"{result['mb_per_second']:8.2f} {result['ack_p50_ms']:7.2f}ms "
+                  f"{result['ack_p99_ms']:7.2f}ms {result['commits']:>8} "
+                  f"{result['largest_batch']:>6} {result['errors']:>6}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"clients": args.clients, "uploads": args.uploads, "size": args.size,
+                       "window_ms": args.window, "dedup": args.dedup, "results": results},
+                      file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measures upload throughput and ack latency for each durability mode.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["threaded", "selectors"],
+                        help="server engines to measure")
+    parser.add_argument("--durability", nargs="+", choices=DURABILITY_MODES,
+                        default=list(DURABILITY_MODES), help="durability modes to measure")
+    parser.add_argument("--clients", type=int, default=16,
+                        help="concurrent clients, each uploading over its own connection")
+    parser.add_argument("--uploads", type=int, default=50, help="uploads per client")
+    parser.add_argument("--size", type=parse_size, default=parse_size("16K"),
+                        help="body size of every upload, e.g. 16K or 1M")
+    parser.add_argument("--window", type=float, default=0,
+                        help="--group-commit-window of the server in milliseconds")
+    parser.add_argument("--dedup", action="store_true", help="run the server with --dedup")
+    parser.add_argument("--dir", default=".",
+                        help="directory to upload into; fsync costs depend on its file system, "
+                             "so avoid tmpfs")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -2,23 +2,48 @@ import os
 import random
 import string
 
-def generate_text_file(filename, size_kb):
+CHUNK_SIZE = 1024 * 1024  # Bytes of payload generated and written at a time
+
+
+def generate_text_file(filename, size_kb, rng=random):
     """Generates a text file with random content."""
-    content = ''.join(random.choices(string.ascii_letters + string.digits, k=1024))  # 1 KB chunk
+    content = ''.join(rng.choices(string.ascii_letters + string.digits, k=1024))  # 1 KB chunk
     with open(filename, 'w') as f:
         for _ in range(size_kb):
             f.write(content)
 
-def create_test_files(num_files=10, min_size_kb=1, max_size_kb=100):
-    """Creates a specified number of text files with random sizes."""
+
+def generate_payload(filename, size, seed=0):
+    """
+    Writes size bytes of seeded random binary data.
+
+    Args:
+        filename (str): File to create.
+        size (int): Payload size in bytes.
+        seed (int): The same seed and size always produce the same bytes.
+    """
+    rng = random.Random(f"{seed}:{size}")
+    with open(filename, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(CHUNK_SIZE, remaining)
+            f.write(rng.randbytes(chunk))
+            remaining -= chunk
+
+
+def create_test_files(num_files=10, min_size_kb=1, max_size_kb=100, seed=0):
+    """Creates a specified number of text files with random sizes, the same for every seed."""
+    rng = random.Random(seed)
     if not os.path.exists("test_files"):
         os.makedirs("test_files")
 
     for i in range(1, num_files + 1):
-        size_kb = random.randint(min_size_kb, max_size_kb)
+        size_kb = rng.randint(min_size_kb, max_size_kb)
         filename = f"test_files/file_{i}_{size_kb}KB.txt"
-        generate_text_file(filename, size_kb)
+        generate_text_file(filename, size_kb, rng)
         print(f"Generated {filename} with size {size_kb} KB")
 
-# Generate 10 test files with sizes ranging from 1 KB to 100 KB
-create_test_files(num_files=10, min_size_kb=1, max_size_kb=100)
+
+if __name__ == '__main__':
+    # Generate 10 test files with sizes ranging from 1 KB to 100 KB
+    create_test_files(num_files=10, min_size_kb=1, max_size_kb=100)
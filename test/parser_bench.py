@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Server"))
+from http_parser import RequestParser
+
+GET_REQUEST = (
+    b"GET test.txt HTTP/1.1\r\n"
+    b"Host: 127.0.0.1:8000\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Accept: */*\r\n\r\n"
+)
+POST_REQUEST = (
+    b"POST test.txt HTTP/1.1\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Content-Length: 12\r\n\r\n"
+    b"Test content"
+)
+
+
+def legacy_parse(data):
+    """The string-splitting approach the server used before the incremental parser."""
+    request_str = data.decode("utf-8", errors="ignore")
+    request_lines = request_str.split('\r\n')
+    method, path, _ = request_lines[0].split(' ')
+    return method, path
+
+
+def bench_legacy(requests):
+    start = time.perf_counter()
+    for data in requests:
+        legacy_parse(data)
+    return time.perf_counter() - start
+
+
+def bench_parser(segments, expected):
+    """Feeds the segments to one parser and pulls out every request (and body)."""
+    parser = RequestParser()
+    parsed = 0
+    start = time.perf_counter()
+    for segment in segments:
+        parser.feed(segment)
+        while True:
+            request = parser.next_request()
+            if request is None:
+                break
+            parser.take(request.content_length)
+            parsed += 1
+    elapsed = time.perf_counter() - start
+    assert parsed == expected, f"parsed {parsed} of {expected} requests"
+    return elapsed
+
+
+def report(name, elapsed, count):
+    print(f"{name:38s} | {elapsed / count * 1e6:10.2f} | {count / elapsed:14.0f}")
+
+
+def main():
+    count = 100000
+    print("Scenario                               | us/request | requests/s")
+    print("-" * 70)
+
+    report("legacy split, request line only", bench_legacy([GET_REQUEST] * count), count)
+    report("one GET per read", bench_parser([GET_REQUEST] * count, count), count)
+
+    mixed = (GET_REQUEST + POST_REQUEST) * (count // 2)
+    segments = [mixed[i:i + 1460] for i in range(0, len(mixed), 1460)]
+    report("mixed GET/POST in 1460-byte segments", bench_parser(segments, count), count)
+
+    pipeline = GET_REQUEST * 16
+    report("16 pipelined GETs per read", bench_parser([pipeline] * (count // 16), count // 16 * 16),
+           count // 16 * 16)
+
+    split = [GET_REQUEST[:10], GET_REQUEST[10:40], GET_REQUEST[40:]] * count
+    report("headers split over 3 reads", bench_parser(split, count), count)
+
+
+if __name__ == '__main__':
+    main()
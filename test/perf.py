@@ -1,176 +1,393 @@
-import threading
+import argparse
+import asyncio
+import json
+import random
 import time
-import socket
-import statistics
-from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentile(sorted_values, p):
+    """Returns the p-th percentile of an already sorted list, interpolating linearly."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def error_kind(error):
+    """Groups an exception raised by a request into a short error category."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, asyncio.IncompleteReadError):
+        return "connection closed"
+    if isinstance(error, ConnectionRefusedError):
+        return "connection refused"
+    if isinstance(error, ConnectionResetError):
+        return "connection reset"
+    return type(error).__name__
+
+
+def raise_open_file_limit():
+    """Lifts the soft open-file limit to the hard limit so thousands of sockets fit."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+class ConnectionPool:
+    """Keep-alive connections to one server, at most limit of them in use at once."""
+
+    def __init__(self, host, port, limit):
+        self.host = host
+        self.port = port
+        self.slots = asyncio.Semaphore(limit)
+        self.idle = []
+        self.opened = 0
+
+    async def acquire(self):
+        """Waits for a free slot and returns an idle or newly opened (reader, writer)."""
+        await self.slots.acquire()
+        if self.idle:
+            return self.idle.pop()
+        try:
+            connection = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.opened += 1
+        return connection
+
+    def release(self, connection, reusable):
+        """Returns a connection to the pool, or closes it if it cannot be reused."""
+        if reusable:
+            self.idle.append(connection)
+        else:
+            connection[1].close()
+        self.slots.release()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
 class LoadTester:
-    def __init__(self, host='127.0.0.1', port=8000):
+    """
+    Asyncio load generator holding thousands of keep-alive connections on one thread.
+
+    Closed-loop runs keep a fixed number of clients each sending its next request as
+    soon as the previous one is answered. Open-loop runs start requests on a fixed
+    schedule regardless of how fast the server answers, and measure latency from each
+    request's scheduled start, so time spent queued for a connection is included
+    rather than hidden.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000, get_paths=("test.txt",), post_sizes=(1024,),
+                 post_ratio=0.0, timeout=10.0, seed=0):
+        """
+        Attributes:
+            get_paths (list): Files fetched by GET requests, picked uniformly.
+            post_sizes (list): Body sizes in bytes of POST requests, picked uniformly.
+            post_ratio (float): Fraction of requests that are POSTs.
+            timeout (float): Seconds before an unanswered request counts as an error.
+        """
         self.host = host
         self.port = port
-        self.results = []
-        
-    # Connecting clients to only one socket
-    def create_persistent_connection(self):
+        self.get_paths = list(get_paths)
+        self.post_sizes = list(post_sizes)
+        self.post_ratio = post_ratio
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.bodies = {}  # size -> POST body
+
+    def next_request(self):
+        """Picks the next request of the mix and returns (method, path, raw request)."""
+        if self.random.random() < self.post_ratio:
+            size = self.random.choice(self.post_sizes)
+            body = self.bodies.get(size)
+            if body is None:
+                body = self.bodies[size] = b"x" * size
+            path = f"perf_post_{size}.bin"
+            head = (f"POST {path} HTTP/1.1\r\nConnection: keep-alive\r\n"
+                    f"Content-Length: {size}\r\n\r\n")
+            return "POST", path, head.encode() + body
+        path = self.random.choice(self.get_paths)
+        return "GET", path, f"GET {path} HTTP/1.1\r\nConnection: keep-alive\r\n\r\n".encode()
+
+    async def prepare(self, sizes):
+        """
+        Uploads one file per size for GET requests to fetch.
+
+        Returns:
+            list: The uploaded paths, to be used as get_paths.
+        """
+        paths = []
+        pool = ConnectionPool(self.host, self.port, 1)
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((self.host, self.port))
-            return sock
-        except Exception as e:
-            print(f"Error creating connection: {e}")
-            return None
-        
-    def make_request(self, sock, request_type='GET'):
+            for size in sizes:
+                path = f"perf_get_{size}.bin"
+                request = (f"POST {path} HTTP/1.1\r\nConnection: keep-alive\r\n"
+                           f"Content-Length: {size}\r\n\r\n").encode() + b"x" * size
+                result = await self.issue(pool, time.perf_counter(), "POST", path, request)
+                if result["status"] != 200:
+                    raise RuntimeError(f"Uploading {path} failed: {result['error']}")
+                paths.append(path)
+        finally:
+            pool.close()
+        return paths
+
+    async def exchange(self, reader, writer, request):
+        """
+        Sends one request and reads the whole response.
+
+        Returns:
+            tuple: (status code, True if the connection can be reused).
+        """
+        writer.write(request)
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        content_length = 0
+        keep_alive = True
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                content_length = int(value.strip())
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        remaining = content_length
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(chunk)
+        return status, keep_alive
+
+    async def issue(self, pool, scheduled, method, path, request):
+        """
+        Runs one request on a pooled connection.
+
+        Args:
+            scheduled (float): perf_counter() time the request was meant to start;
+                latency is measured from here.
+
+        Returns:
+            dict: The raw result of the request.
+        """
+        result = {"method": method, "path": path, "scheduled": scheduled, "wait": None,
+                  "latency": None, "status": None, "error": None}
+        connection = None
+        reusable = False
         try:
-            if request_type == 'GET':
-                request = "GET test.txt HTTP/1.1\r\nConnection: keep-alive\r\n\r\n"
-            else:  
-                content = "Test content"
-                request = (
-                    f"POST test.txt HTTP/1.1\r\n"
-                    f"Connection: keep-alive\r\n"
-                    f"Content-Length: {len(content)}\r\n\r\n"
-                    f"{content}"
-                )
-            
-            start_time = time.time()
-            
-            # Send request
-            sock.send(request.encode())
-            
-            # Read response headers first
-            response = b""
-            while b"\r\n\r\n" not in response:
-                chunk = sock.recv(1024)
-                if not chunk:
-                    raise Exception("Connection closed while reading headers")
-                response += chunk
-            
-            # Find Content-Length if present
-            headers = response.split(b"\r\n\r\n")[0].decode('utf-8')
-            content_length = None
-            for line in headers.split('\r\n'):
-                if line.lower().startswith('content-length:'):
-                    content_length = int(line.split(':')[1].strip())
-                    break
-            
-            # Read remaining body if Content-Length is known
-            if content_length:
-                body = response.split(b"\r\n\r\n", 1)[1]
-                remaining = content_length - len(body)
-                while remaining > 0:
-                    chunk = sock.recv(min(remaining, 1024))
-                    if not chunk:
-                        raise Exception("Connection closed while reading body")
-                    response += chunk
-                    remaining -= len(chunk)
-            
-            end_time = time.time()
-            
-            return {
-                'success': True,
-                'response_time': end_time - start_time
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'response_time': None,
-                'error': str(e)
-            }
-
-    def run_load_test(self, num_clients, requests_per_client):
-        """Run load test with persistent connections per client"""
-        client_results = []
-        
-        def client_session():
+            connection = await asyncio.wait_for(pool.acquire(), self.timeout)
+            sent = time.perf_counter()
+            result["wait"] = sent - scheduled
+            status, reusable = await asyncio.wait_for(
+                self.exchange(*connection, request), self.timeout)
+            result["latency"] = time.perf_counter() - scheduled
+            result["status"] = status
+            if status >= 400:
+                result["error"] = f"HTTP {status}"
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ValueError, IndexError) as e:
+            result["error"] = error_kind(e)
+        finally:
+            if connection is not None:
+                pool.release(connection, reusable)
+        return result
+
+    async def run_closed_loop(self, num_clients, requests_per_client):
+        """Runs num_clients clients, each sending requests_per_client requests back to back."""
+        pool = ConnectionPool(self.host, self.port, num_clients)
+
+        async def client_session():
             session_results = []
-            sock = self.create_persistent_connection()
-            if sock:
-                try:
-                    for _ in range(requests_per_client):
-                        result = self.make_request(sock)
-                        if result['success']:
-                            session_results.append(result['response_time'])
-                finally:
-                    sock.close()
+            for _ in range(requests_per_client):
+                session_results.append(
+                    await self.issue(pool, time.perf_counter(), *self.next_request()))
             return session_results
-        
-        with ThreadPoolExecutor(max_workers=num_clients) as executor:
-            futures = [executor.submit(client_session) for _ in range(num_clients)]
-            for future in futures:
-                try:
-                    results = future.result()
-                    client_results.extend(results)
-                except Exception as e:
-                    print(f"Error in client session: {e}")
-        
-        return client_results
-
-def main():
-    # Test parameters
-    client_counts = [1, 50, 100, 200, 300, 400, 500]
-    requests_per_client = 100
-    
-    # Results storage
-    avg_response_times = []
-    throughputs = []
-    success_rates = []
-    
-    tester = LoadTester()
-    
-    print("Starting load test with persistent connections...")
-    print("Clients | Avg Response Time (s) | Throughput (req/s) | Success Rate (%)")
-    print("-" * 70)
-    
-    for num_clients in client_counts:
-        start_time = time.time()
-        results = tester.run_load_test(num_clients, requests_per_client)
-        total_time = time.time() - start_time
-        
-        # Calculate metrics
-        if results:
-            avg_response_time = statistics.mean(results)
-            throughput = (num_clients * requests_per_client) / total_time
-            success_rate = (len(results) / (num_clients * requests_per_client)) * 100
-            
-            avg_response_times.append(avg_response_time)
-            throughputs.append(throughput)
-            success_rates.append(success_rate)
-            
-            print(f"{num_clients:7d} | {avg_response_time:18.3f} | {throughput:18.2f} | {success_rate:14.2f}")
-    
-    # Create visualization
+
+        try:
+            sessions = await asyncio.gather(*(client_session() for _ in range(num_clients)))
+        finally:
+            pool.close()
+        return [result for session in sessions for result in session], pool.opened
+
+    async def run_open_loop(self, rate, duration, max_connections):
+        """Starts rate requests per second for duration seconds over at most max_connections."""
+        pool = ConnectionPool(self.host, self.port, max_connections)
+        tasks = []
+        start = time.perf_counter()
+        try:
+            for index in range(int(rate * duration)):
+                scheduled = start + index / rate
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                tasks.append(asyncio.ensure_future(
+                    self.issue(pool, scheduled, *self.next_request())))
+            results = await asyncio.gather(*tasks)
+        finally:
+            pool.close()
+        return results, pool.opened
+
+
+def summarize(results, elapsed):
+    """
+    Reduces raw request results to the reported statistics.
+
+    Returns:
+        dict: Request and error counts, errors by kind, achieved requests per second
+        and mean and percentile latencies in seconds of the successful requests.
+    """
+    latencies = sorted(r["latency"] for r in results if r["error"] is None)
+    errors = {}
+    for r in results:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    summary = {
+        "requests": len(results),
+        "successes": len(latencies),
+        "success_rate": 100 * len(latencies) / len(results) if results else 0.0,
+        "errors": errors,
+        "elapsed": elapsed,
+        "achieved_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p:g}"] = percentile(latencies, p)
+    return summary
+
+
+def format_ms(seconds):
+    return "       -" if seconds is None else f"{seconds * 1000:8.2f}"
+
+
+def plot(levels, summaries, open_loop, output):
+    """Saves latency percentile, throughput and success rate plots next to the JSON results."""
+    xlabel = 'Target Rate (requests/second)' if open_loop else 'Number of Concurrent Clients'
     plt.figure(figsize=(15, 5))
-    
-    # Response Time Plot
+
+    # Latency percentile plot
     plt.subplot(1, 3, 1)
-    plt.plot(client_counts, avg_response_times, marker='o')
-    plt.title('Average Response Time vs Clients')
-    plt.xlabel('Number of Concurrent Clients')
-    plt.ylabel('Average Response Time (seconds)')
+    for p in PERCENTILES:
+        plt.plot(levels, [s[f"p{p:g}"] for s in summaries], marker='o', label=f'p{p:g}')
+    plt.title('Response Time Percentiles')
+    plt.xlabel(xlabel)
+    plt.ylabel('Response Time (seconds)')
+    plt.yscale('log')
+    plt.legend()
     plt.grid(True)
-    
-    # Throughput Plot
+
+    # Throughput plot
     plt.subplot(1, 3, 2)
-    plt.plot(client_counts, throughputs, marker='o', color='green')
-    plt.title('Throughput vs Clients')
-    plt.xlabel('Number of Concurrent Clients')
+    plt.plot(levels, [s["achieved_rps"] for s in summaries], marker='o', color='green', label='achieved')
+    if open_loop:
+        plt.plot(levels, levels, linestyle='--', color='gray', label='target')
+        plt.legend()
+    plt.title('Throughput')
+    plt.xlabel(xlabel)
     plt.ylabel('Throughput (requests/second)')
     plt.grid(True)
-    
-    # Success Rate Plot
+
+    # Success rate plot
     plt.subplot(1, 3, 3)
-    plt.plot(client_counts, success_rates, marker='o', color='red')
-    plt.title('Success Rate vs Clients')
-    plt.xlabel('Number of Concurrent Clients')
+    plt.plot(levels, [s["success_rate"] for s in summaries], marker='o', color='red')
+    plt.title('Success Rate')
+    plt.xlabel(xlabel)
     plt.ylabel('Success Rate (%)')
     plt.grid(True)
-    
+
     plt.tight_layout()
-    plt.savefig('server_performance.png')
-    print("\nPerformance plots saved as 'server_performance.png'")
+    plt.savefig(f'{output}.png')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the file server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--open-loop", action="store_true",
+                        help="drive fixed request rates instead of a fixed number of clients")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 50, 100, 200, 300, 400, 500],
+                        help="closed loop: concurrent clients of each run")
+    parser.add_argument("--requests-per-client", type=int, default=100,
+                        help="closed loop: requests sent by each client")
+    parser.add_argument("--rates", type=float, nargs="+", default=[500, 1000, 2000, 4000],
+                        help="open loop: target requests per second of each run")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="open loop: seconds each rate is held")
+    parser.add_argument("--max-connections", type=int, default=1000,
+                        help="open loop: connections requests may be spread over")
+    parser.add_argument("--post-ratio", type=float, default=0.0,
+                        help="fraction of requests that are POSTs")
+    parser.add_argument("--get-path", action="append", dest="get_paths",
+                        help="file fetched by GETs (repeatable, default test.txt)")
+    parser.add_argument("--file-sizes", type=int, nargs="+",
+                        help="file sizes in bytes: uploaded once for GETs to fetch, and used as POST body sizes")
+    parser.add_argument("--timeout", type=float, default=10.0,
+                        help="seconds before a request counts as timed out")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the request mix")
+    parser.add_argument("--output", default="server_performance",
+                        help="prefix of the .png plots and .json raw results")
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    tester = LoadTester(args.host, args.port, args.get_paths or ["test.txt"],
+                        args.file_sizes or [1024], args.post_ratio, args.timeout, args.seed)
+    if args.file_sizes and not args.get_paths:
+        tester.get_paths = await tester.prepare(args.file_sizes)
+
+    levels = args.rates if args.open_loop else args.clients
+    print(f"Starting {'open' if args.open_loop else 'closed'}-loop load test "
+          f"({args.post_ratio:.0%} POST)...")
+    print(f"{'Rate' if args.open_loop else 'Clients':>7s} | {'Achieved RPS':>12s} | {'p50 ms':>8s} | "
+          f"{'p90 ms':>8s} | {'p99 ms':>8s} | {'p99.9 ms':>8s} | Success (%) | Errors")
+    print("-" * 100)
+
+    runs = []
+    summaries = []
+    for level in levels:
+        start_time = time.perf_counter()
+        if args.open_loop:
+            results, opened = await tester.run_open_loop(level, args.duration, args.max_connections)
+        else:
+            results, opened = await tester.run_closed_loop(level, args.requests_per_client)
+        elapsed = time.perf_counter() - start_time
+        summary = summarize(results, elapsed)
+        summary["connections_opened"] = opened
+        summaries.append(summary)
+        for r in results:
+            r["scheduled"] -= start_time  # Offsets from the start of the run
+        runs.append({"level": level, "summary": summary, "results": results})
+
+        errors = ", ".join(f"{kind}: {count}" for kind, count in sorted(summary["errors"].items()))
+        print(f"{level:7g} | {summary['achieved_rps']:12.1f} | {format_ms(summary['p50'])} | "
+              f"{format_ms(summary['p90'])} | {format_ms(summary['p99'])} | "
+              f"{format_ms(summary['p99.9'])} | {summary['success_rate']:11.2f} | {errors or '-'}")
+
+    with open(f'{args.output}.json', 'w') as f:
+        json.dump({"config": vars(args), "runs": runs}, f)
+    plot(levels, summaries, args.open_loop, args.output)
+    print(f"\nRaw results saved as '{args.output}.json', plots as '{args.output}.png'")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    raise_open_file_limit()
+    asyncio.run(run(args))
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "Client"))
+from Client import Client
+
+
+class LatencyProxy:
+    """A TCP proxy that delays every chunk by a fixed one-way latency, in order."""
+
+    def __init__(self, target, delay, port=0):
+        self.target = target
+        self.delay = delay
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", port))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            client, _ = self.listener.accept()
+            server = socket.create_connection(self.target)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.relay(client, server)
+            self.relay(server, client)
+
+    def relay(self, source, destination):
+        """Forwards source to destination, each chunk released delay seconds after it arrived."""
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                chunks.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                due, data = chunks.get()
+                time.sleep(max(0.0, due - time.monotonic()))
+                if not data:
+                    with contextlib.suppress(OSError):
+                        destination.shutdown(socket.SHUT_WR)
+                    return
+                try:
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    delay = 0.025  # One-way latency, so every round trip costs 50 ms
+    files = 100
+    window = 16
+
+    server_port = free_port()
+    server = subprocess.Popen([sys.executable, "server.py", str(server_port), "--mode", "selectors"],
+                              cwd=os.path.join(ROOT, "Server"), stdout=subprocess.DEVNULL)
+    try:
+        time.sleep(1)
+        proxy = LatencyProxy(("127.0.0.1", server_port), delay)
+        workdir = tempfile.mkdtemp()
+        os.chdir(workdir)
+        names = ["test.txt", "test.html"]
+        with open("input.txt", "w") as f:
+            for i in range(files):
+                f.write(f"client_get {names[i % 2]} 127.0.0.1 {proxy.port}\n")
+
+        print(f"{files} GETs over a link with {delay * 2000:.0f} ms round-trip time")
+        print("Mode                  | Total time (s) | Throughput (req/s)")
+        print("-" * 60)
+
+        client = Client("127.0.0.1", proxy.port)
+        requests = client.load_requests("input.txt")
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for request_parts in requests:
+                client.send_request(request_parts)
+        sequential = time.perf_counter() - start_time
+        client.client_socket.close()
+        print(f"{'sequential':21s} | {sequential:14.3f} | {files / sequential:18.1f}")
+
+        for path in names + [".validators.json"]:
+            os.remove(path)  # Make the pipelined run download everything again
+        client = Client("127.0.0.1", proxy.port, connect=False)
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.run_pipelined("input.txt", window)
+        pipelined = time.perf_counter() - start_time
+        print(f"{f'pipelined (window {window})':21s} | {pipelined:14.3f} | {files / pipelined:18.1f}")
+        print(f"\nSpeedup: {sequential / pipelined:.1f}x")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
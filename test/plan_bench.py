@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Client"))
+from planner import load_plan
+
+
+def generate(path, count, servers, files, seed):
+    """
+    Writes a JSON Lines batch file of count requests.
+
+    Nine in ten are GETs of one of files paths, so many are duplicates; the rest
+    upload inline bodies, and one in twenty declares a large size.
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for _ in range(count):
+            request = {"method": "GET", "path": f"file{rng.randrange(files)}.bin",
+                       "server": f"127.0.0.1:{8000 + rng.randrange(servers)}"}
+            if rng.random() < 0.1:
+                request["method"] = "POST"
+                request["body"] = "x" * rng.randrange(1, 64)
+            elif rng.random() < 0.05:
+                request["size"] = rng.randrange(1, 100) * 1024 * 1024
+            file.write(json.dumps(request) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times planning of a generated batch file.")
+    parser.add_argument("--lines", type=int, default=100000, help="requests in the batch file")
+    parser.add_argument("--servers", type=int, default=4, help="distinct servers named")
+    parser.add_argument("--files", type=int, default=50000, help="distinct paths requested")
+    parser.add_argument("--runs", type=int, default=5, help="timed planning runs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        generate(path, args.lines, args.servers, args.files, args.seed)
+        times = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            plan = load_plan(path, ("127.0.0.1", 8000))
+            times.append(time.perf_counter() - started)
+        tracemalloc.start()
+        load_plan(path, ("127.0.0.1", 8000))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(plan.summary())
+        print(f"{os.path.getsize(path) / (1024 * 1024):.1f} MB file, best {min(times):.3f}s, "
+              f"median {sorted(times)[len(times) // 2]:.3f}s, "
+              f"{args.lines / min(times):.0f} lines/s, peak memory {peak / (1024 * 1024):.1f} MB")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
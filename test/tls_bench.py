@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(TEST_DIR, "..", "Server")
+sys.path.insert(0, TEST_DIR)
+from bench import free_port, percentile, wait_for_port
+
+MODES = ("threaded", "pool", "selectors")
+VERSIONS = {"1.2": ssl.TLSVersion.TLSv1_2, "1.3": ssl.TLSVersion.TLSv1_3}
+BODY = b"x" * 1024  # Small file fetched on every connection, so TLS 1.3 tickets arrive
+
+
+def generate_certificate(directory, openssl="openssl"):
+    """
+    Creates a self-signed certificate for 127.0.0.1 and localhost with the openssl CLI.
+
+    Returns:
+        tuple: (certificate path, private key path).
+    """
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def fetch(sock):
+    """Sends one GET on the connection and reads the response to its end."""
+    sock.sendall(b"GET bench.txt HTTP/1.1\r\n\r\n")
+    buffer = b""
+    while b"\r\n\r\n" not in buffer:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        buffer += data
+    head, _, body = buffer.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    while len(body) < length:
+        data = sock.recv(65536)
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        body += data
+
+
+def handshakes(context, port, count, resume):
+    """
+    Opens count connections, each timed from connect() to the end of the handshake.
+
+    Args:
+        context (ssl.SSLContext): Client context pinned to one TLS version.
+        port (int): The server's port.
+        count (int): Connections to open.
+        resume (bool): Offer the session of the previous connection, so every
+            handshake after the first can be abbreviated.
+
+    Returns:
+        tuple: (sorted handshake times in seconds, connections that resumed a session).
+    """
+    times = []
+    reused = 0
+    session = None
+    for _ in range(count):
+        started = time.perf_counter()
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        tls = context.wrap_socket(sock, server_hostname="127.0.0.1", session=session)
+        times.append(time.perf_counter() - started)
+        reused += tls.session_reused
+        fetch(tls)
+        if resume:
+            session = tls.session
+        tls.close()
+    times.sort()
+    return times, reused
+
+
+def summarize(times, reused):
+    return {
+        "connections": len(times),
+        "resumed": reused,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "p50_ms": percentile(times, 50) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+    }
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="tls-bench-")
+    process = None
+    try:
+        if args.cert:
+            cert, key = args.cert, args.key
+        else:
+            cert, key = generate_certificate(workdir, args.openssl)
+        with open(os.path.join(workdir, "bench.txt"), "wb") as file:
+            file.write(BODY)
+        port = free_port()
+        command = [sys.executable, os.path.join(SERVER_DIR, "server.py"), str(port),
+                   "--mode", args.mode, "--access-log", "off", "--tls-cert", cert,
+                   "--tls-tickets", str(args.tickets)]
+        if args.session_cache:
+            command.append("--tls-session-cache")
+        if key:
+            command += ["--tls-key", key]
+        process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL)
+        wait_for_port(port)
+
+        results = {}
+        for version in args.versions:
+            context = ssl.create_default_context(cafile=cert)
+            context.minimum_version = context.maximum_version = VERSIONS[version]
+            handshakes(context, port, 5, resume=True)  # Warm up both ends
+            full = summarize(*handshakes(context, port, args.connections, resume=False))
+            resumed = summarize(*handshakes(context, port, args.connections, resume=True))
+            results[f"TLSv{version}"] = {"full": full, "resumed": resumed}
+
+        print(f"{'version':<9} {'handshake':<9} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'resumed':>9}")
+        for version, kinds in results.items():
+            for kind, stats in kinds.items():
+                print(f"{version:<9} {kind:<9} {stats['mean_ms']:8.3f} {stats['p50_ms']:8.3f} "
+                      f"{stats['p99_ms']:8.3f} {stats['resumed']:>4}/{stats['connections']:<4}")
+            speedup = kinds["full"]["mean_ms"] / kinds["resumed"]["mean_ms"]
+            print(f"{version:<9} resumed handshakes are {speedup:.2f}x faster on average")
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump({"mode": args.mode, "tickets": args.tickets,
+                           "session_cache": args.session_cache,
+                           "openssl": ssl.OPENSSL_VERSION, "results": results}, file, indent=2)
+            print(f"Results written to {args.output}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compares full and resumed TLS handshakes against the server.")
+    parser.add_argument("--mode", choices=MODES, default="threaded", help="server engine")
+    parser.add_argument("--connections", type=int, default=200,
+                        help="connections opened per version and handshake kind")
+    parser.add_argument("--versions", nargs="+", choices=sorted(VERSIONS), default=["1.3", "1.2"],
+                        help="TLS versions to measure")
+    parser.add_argument("--tickets", type=int, default=2,
+                        help="TLS 1.3 tickets the server issues per handshake (--tls-tickets)")
+    parser.add_argument("--session-cache", action="store_true",
+                        help="resume from the server's session cache instead of stateless tickets")
+    parser.add_argument("--cert", help="certificate to use instead of a generated self-signed one")
+    parser.add_argument("--key", help="private key for --cert")
+    parser.add_argument("--openssl", default=shutil.which("openssl") or "openssl",
+                        help="openssl executable used to generate the certificate")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())